@@ -0,0 +1,160 @@
+"""
+メッセージ検索のベンチマーク（100万件のSQLiteデータベース）
+
+インデックスのない従来のmessageテーブルを作成して100万件のメッセージを登録し、
+マイグレーション（hour_key列とインデックスの追加）の前後で
+1時間分のメッセージの取得・ユーザー別の取得・ページングの速度を比較する
+
+使い方:
+    python benchmark_message_queries.py [件数]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import datetime
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import text
+
+from src.database import db
+
+USERS = 50
+DAYS = 365
+REPEAT = 20
+
+HOUR_SQL = (
+    "SELECT * FROM message WHERE message_type = 'text' "
+    "AND timestamp >= :start AND timestamp < :end ORDER BY timestamp"
+)
+USER_SQL = (
+    "SELECT * FROM message WHERE user_id = :user_id "
+    "AND timestamp >= :start AND timestamp < :end ORDER BY timestamp"
+)
+OFFSET_SQL = (
+    "SELECT * FROM message WHERE message_type = 'text' AND timestamp >= :start AND timestamp < :end "
+    "ORDER BY timestamp, message_id LIMIT 500 OFFSET :offset"
+)
+
+
+def create_legacy_database(path: str, count: int, start: datetime.datetime) -> None:
+    """インデックスのない従来のスキーマでメッセージを登録"""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE message (message_id VARCHAR(100) NOT NULL PRIMARY KEY, user_id VARCHAR(100) NOT NULL, "
+        "message_type VARCHAR(20) NOT NULL, content TEXT NOT NULL, timestamp DATETIME NOT NULL)"
+    )
+    step = DAYS * 86400 / count
+    rng = random.Random(0)
+
+    def rows():
+        for i in range(count):
+            timestamp = start + datetime.timedelta(seconds=i * step + rng.random() * step)
+            message_type = rng.choices(["text", "image", "video"], [8, 1.5, 0.5])[0]
+            yield (
+                f"msg_{i:08d}", f"user_{rng.randrange(USERS):02d}", message_type,
+                f"message {i}", timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")
+            )
+
+    conn.executemany("INSERT INTO message VALUES (?, ?, ?, ?, ?)", rows())
+    conn.commit()
+    conn.close()
+
+
+def timed(func, repeat: int = REPEAT) -> float:
+    """中央値（ミリ秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def plan(sql: str, params: dict) -> str:
+    with db.engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return " / ".join(row[-1] for row in rows)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = datetime.datetime(2024, 1, 1)
+    rng = random.Random(1)
+    hours = [start + datetime.timedelta(hours=rng.randrange(DAYS * 24)) for _ in range(REPEAT)]
+    hour_params = [{"start": h, "end": h + datetime.timedelta(hours=1)} for h in hours]
+    user_params = [
+        {"user_id": f"user_{rng.randrange(USERS):02d}", "start": h, "end": h + datetime.timedelta(days=1)}
+        for h in hours
+    ]
+    whole_range = {"start": start, "end": start + datetime.timedelta(days=DAYS)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        print(f"Creating {count:,} messages ...")
+        started = time.perf_counter()
+        create_legacy_database(path, count, start)
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+        db.init_app(app)
+
+        with app.app_context():
+            from src.migrations import run_migrations
+            from src.routes.line_webhook import MessageProcessor
+
+            def run_queries(label: str) -> dict:
+                params = iter(hour_params * 2)
+                hour_ms = timed(lambda: db.session.execute(text(HOUR_SQL), next(params)).all())
+                params = iter(user_params * 2)
+                user_ms = timed(lambda: db.session.execute(text(USER_SQL), next(params)).all())
+                offset_ms = timed(
+                    lambda: db.session.execute(text(OFFSET_SQL), {**whole_range, "offset": int(count * 0.7)}).all(),
+                    repeat=3
+                )
+                print(f"\n[{label}]")
+                print(f"  hourly text messages : {hour_ms:8.2f} ms   ({plan(HOUR_SQL, hour_params[0])})")
+                print(f"  one user, one day    : {user_ms:8.2f} ms   ({plan(USER_SQL, user_params[0])})")
+                print(f"  deep page via OFFSET : {offset_ms:8.2f} ms")
+                return {"hour": hour_ms, "user": user_ms}
+
+            before = run_queries("before migration (no indexes)")
+
+            started = time.perf_counter()
+            db.session.remove()
+            changes = run_migrations()
+            # マイグレーション前に準備したSQL（古い実行計画）を使わないよう接続を作り直す
+            db.engine.dispose()
+            print(f"\nMigration: {time.perf_counter() - started:.1f}s")
+            for change in changes:
+                print(f"  {change}")
+
+            after = run_queries("after migration")
+
+            # 同じ位置のページをキーセットで取得（カーソルはOFFSETの直前の行）
+            cursor_row = db.session.execute(
+                text(OFFSET_SQL.replace("LIMIT 500", "LIMIT 1")), {**whole_range, "offset": int(count * 0.7) - 1}
+            ).one()
+            cursor = (datetime.datetime.fromisoformat(cursor_row.timestamp), cursor_row.message_id)
+            keyset_ms = timed(lambda: MessageProcessor.get_messages_page(
+                whole_range["start"], whole_range["end"], message_type="text", after=cursor
+            ))
+            keys = iter(hours * 2)
+            orm_ms = timed(lambda: MessageProcessor.get_messages_for_hour(next(keys).strftime("%Y%m%d%H")))
+            print(f"  deep page via keyset : {keyset_ms:8.2f} ms")
+            print(f"  get_messages_for_hour: {orm_ms:8.2f} ms   (ORM, including object loading)")
+
+            print(f"\nhourly query speedup: {before['hour'] / after['hour']:.0f}x, "
+                  f"per-user query speedup: {before['user'] / after['user']:.0f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -38,12 +38,37 @@ LINE_WEBHOOK_URL = os.environ.get("LINE_WEBHOOK_URL", "http://localhost:8083/web
 RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 3))
 RETRY_DELAY_SECONDS = int(os.environ.get("RETRY_DELAY_SECONDS", 5))
 
+# ブログ記事の種の一括生成設定
+SEED_WORKER_COUNT = int(os.environ.get("SEED_WORKER_COUNT", 4))  # Geminiを同時に呼び出す数
+SEED_MAX_HOURS_PER_RUN = int(os.environ.get("SEED_MAX_HOURS_PER_RUN", 48))  # 1回の実行で処理する時間枠の上限
+SEED_MAX_ATTEMPTS = int(os.environ.get("SEED_MAX_ATTEMPTS", 3))  # 生成に失敗した組を再試行する回数
+
+# 組み立てたブログ記事の種をキャッシュする件数（プロセスごと）
+SEED_CACHE_MAX_ENTRIES = int(os.environ.get("SEED_CACHE_MAX_ENTRIES", 256))
+
+# 画像の説明文生成設定
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", 1024))  # Geminiに送る画像の長辺（ピクセル）
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 85))  # 再エンコードするJPEGの品質
+IMAGE_PREPARE_PROCESSES = int(os.environ.get("IMAGE_PREPARE_PROCESSES", 0))  # 画像を縮小するプロセス数（0ならCPU数）
+IMAGE_CAPTION_CONCURRENCY = int(os.environ.get("IMAGE_CAPTION_CONCURRENCY", 4))  # Gemini Visionを同時に呼び出す数
+IMAGE_CAPTION_RATE_PER_MINUTE = int(os.environ.get("IMAGE_CAPTION_RATE_PER_MINUTE", 60))  # 1分あたりの呼び出し上限（0なら無制限）
+IMAGE_HASH_DISTANCE = int(os.environ.get("IMAGE_HASH_DISTANCE", 4))  # 同じ画像とみなす知覚ハッシュの差（ビット数）
+IMAGE_CAPTION_CACHE_SIZE = int(os.environ.get("IMAGE_CAPTION_CACHE_SIZE", 512))  # 説明文をキャッシュする画像の数（プロセスごと）
+
+# バックグラウンドジョブ設定
+JOB_WORKER_ENABLED = os.environ.get("JOB_WORKER_ENABLED", "True").lower() in ("true", "1", "t")
+JOB_WORKER_COUNT = int(os.environ.get("JOB_WORKER_COUNT", 2))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))  # 秒
+JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", 300))  # 実行中のまま止まったジョブを戻すまでの秒数
+
 # Redmine連携設定
 REDMINE_API_URL = os.environ.get("REDMINE_API_URL", "https://test-api.redmine-agent.example.com")
 REDMINE_API_KEY = os.environ.get("REDMINE_API_KEY", "test_api_key_2025_05_17")
 REDMINE_TIMEOUT = int(os.environ.get("REDMINE_TIMEOUT", 30))  # 30秒
 REDMINE_MAX_RETRIES = int(os.environ.get("REDMINE_MAX_RETRIES", 3)) # Max retries for Redmine API calls
 REDMINE_RETRY_DELAY_SECONDS = int(os.environ.get("REDMINE_RETRY_DELAY_SECONDS", 5)) # Delay between retries in seconds
+REDMINE_POOL_SIZE = int(os.environ.get("REDMINE_POOL_SIZE", 10))  # プロセスごとのコネクションプールの上限
+REDMINE_KEEPALIVE = os.environ.get("REDMINE_KEEPALIVE", "True").lower() in ("true", "1", "t")
 REDMINE_INTEGRATION_ENABLED = os.environ.get("REDMINE_INTEGRATION_ENABLED", "True").lower() in ("true", "1", "t")
 
 # ログ設定
@@ -8,7 +8,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # 共通設定ファイルをインポート (.envファイルの読み込みはここで行われる)
 from src.config import (
-    DATABASE_URL, SECRET_KEY, PORT, DEBUG, LOG_LEVEL
+    DATABASE_URL, SECRET_KEY, PORT, DEBUG, LOG_LEVEL, JOB_WORKER_ENABLED
 )
 
 import logging
@@ -51,7 +51,7 @@ def create_app():
     with app.app_context():
         # Import models needed for db.create_all()
         # These imports should work now because sys.path was modified earlier
-        from src.models import Message, BlogSeed, BlogIntentAnalysis
+        from src.models import Message, BlogSeed, BlogSeedFragment, BlogIntentAnalysis, Job, DeadLetterJob, SeedGeneration, SeedWatermark
         main_logger.info("Models imported within app context.")
 
         # Import and register blueprints
@@ -59,13 +59,29 @@ def create_app():
         from src.routes.external_content import external_content_bp
         from src.routes.message_receiver import message_receiver_bp
         from src.routes.blog_intent import blog_intent_bp
+        from src.routes.jobs import jobs_bp
         
         app.register_blueprint(line_webhook_bp)
         app.register_blueprint(external_content_bp)
         app.register_blueprint(message_receiver_bp)
         app.register_blueprint(blog_intent_bp)
+        app.register_blueprint(jobs_bp)
         main_logger.info("Blueprints registered.")
 
+    # バックグラウンドジョブのワーカー（Redmineへの転送などを実行）
+    from src.services.job_queue import job_queue
+    job_queue.init_app(app, start_workers=JOB_WORKER_ENABLED)
+
+    # 外部サービスのセッション・モデルの再利用状況とキャッシュの状況
+    from src.services.service_registry import service_registry
+    from src.services.seed_store import document_cache
+    from src.services.image_captioner import caption_cache
+
+    @app.route("/api/services/stats", methods=["GET"])
+    def service_stats():
+        return jsonify({"status": "success", **service_registry.stats(), "seed_cache": document_cache.stats(),
+                        "image_caption_cache": caption_cache.stats()}), 200
+
     # --- Request Logging --- 
     @app.before_request
     def log_request_info():
@@ -117,5 +133,8 @@ if __name__ == "__main__":
         # Models should be implicitly loaded via imports in create_app
         db.create_all() 
         main_logger.info("Ensured database tables exist.")
+        # 既存のテーブルへの列・インデックスの追加
+        from src.migrations import run_migrations
+        run_migrations()
     app.run(host="0.0.0.0", port=PORT, debug=DEBUG)
 
@@ -0,0 +1,99 @@
+"""
+既存のデータベースを現在のモデルに合わせるマイグレーション
+db.create_all()は既存のテーブルに列やインデックスを追加しないため、ここで追加する
+
+使い方:
+    python -m src.migrations
+"""
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+
+from src.database import db
+from src.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# 受信時刻から時間枠のキー（YYYYMMDDHH）を作るSQL（hour_key_forと同じ形式）
+HOUR_KEY_SQL = {
+    "sqlite": "strftime('%Y%m%d%H', timestamp)",
+    "mysql": "DATE_FORMAT(timestamp, '%Y%m%d%H')",
+}
+
+
+def upgrade_message_table() -> List[str]:
+    """messageテーブルにhour_key列と検索用のインデックスを追加する
+
+    Returns:
+        List[str]: 実行した変更の一覧
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table(Message.__tablename__):
+        return []
+
+    applied = []
+    columns = {column["name"] for column in inspector.get_columns(Message.__tablename__)}
+    existing_indexes = {index["name"] for index in inspector.get_indexes(Message.__tablename__)}
+
+    with db.engine.begin() as conn:
+        if "hour_key" not in columns:
+            conn.execute(text("ALTER TABLE message ADD COLUMN hour_key VARCHAR(10)"))
+            applied.append("add column message.hour_key")
+
+        hour_key_sql = HOUR_KEY_SQL.get(db.engine.dialect.name)
+        if hour_key_sql:
+            filled = conn.execute(
+                text(f"UPDATE message SET hour_key = {hour_key_sql} WHERE hour_key IS NULL")
+            ).rowcount
+            if filled:
+                applied.append(f"fill message.hour_key ({filled} rows)")
+        else:
+            logger.warning(f"hour_key backfill is not supported for {db.engine.dialect.name}")
+
+        for index in Message.__table__.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
+                applied.append(f"create index {index.name}")
+
+    for change in applied:
+        logger.info(f"Migration applied: {change}")
+    return applied
+
+
+def initialize_seed_watermark() -> List[str]:
+    """ブログ記事の種の一括生成のウォーターマークを作成する（既存の履歴を未処理とみなさないため）
+
+    Returns:
+        List[str]: 実行した変更の一覧
+    """
+    inspector = inspect(db.engine)
+    if not (inspector.has_table("seed_watermark") and inspector.has_table("blog_seed")):
+        return []
+
+    from src.services.seed_batch import initialize_watermark
+
+    hour_key = initialize_watermark()
+    if hour_key is None:
+        return []
+    change = f"initialize seed watermark ({hour_key})"
+    logger.info(f"Migration applied: {change}")
+    return [change]
+
+
+def run_migrations() -> List[str]:
+    """すべてのマイグレーションを実行する（アプリケーションコンテキスト内で呼び出す）
+
+    Returns:
+        List[str]: 実行した変更の一覧
+    """
+    return upgrade_message_table() + initialize_seed_watermark()
+
+
+if __name__ == "__main__":
+    from src.main import app
+
+    with app.app_context():
+        db.create_all()
+        changes = run_migrations()
+    print("\n".join(changes) if changes else "Database is up to date")
@@ -3,9 +3,11 @@
 # Import models to make them easily accessible from the package
 from src.models.message import Message
 from src.models.user import User
-from src.models.blog_seed import BlogSeed
+from src.models.blog_seed import BlogSeed, BlogSeedFragment
 from src.models.blog_intent import BlogIntentAnalysis
+from src.models.job import Job, DeadLetterJob
+from src.models.seed_generation import SeedGeneration, SeedWatermark
 
 # You might also want to define __all__ if you prefer explicit exports
-__all__ = ['Message', 'User', 'BlogSeed', 'BlogIntentAnalysis']
+__all__ = ['Message', 'User', 'BlogSeed', 'BlogSeedFragment', 'BlogIntentAnalysis', 'Job', 'DeadLetterJob', 'SeedGeneration', 'SeedWatermark']
 
@@ -56,3 +56,41 @@ class BlogSeed(db.Model):
         self.markdown_content = content
         self.updated_at = datetime.now(timezone.utc)
 
+
+class BlogSeedFragment(db.Model):
+    """ブログ記事の種に追加された内容（1回の追加につき1行）を表すデータモデル
+
+    記事全体を書き換えずに追加できるよう、BlogSeed.markdown_contentには最初の内容だけを保存し、
+    以降の内容はこのテーブルに追加順に保存する
+
+    Attributes:
+        id: 断片ID
+        hour_key: 追加先の記事の時間枠を示すキー
+        position: 記事内での順番（1から始まる）
+        content: 追加された内容（Markdown形式）
+        created_at: 内容が追加された時刻
+    """
+
+    __tablename__ = "blog_seed_fragment"
+    __table_args__ = (
+        db.UniqueConstraint("hour_key", "position", name="uq_blog_seed_fragment_hour_key_position"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    hour_key = db.Column(db.String(12), db.ForeignKey('blog_seed.hour_key'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs: Any) -> None:
+        """モデルの初期化
+
+        Args:
+            **kwargs: モデルの属性と値
+        """
+        kwargs.setdefault('created_at', datetime.now(timezone.utc))
+        super().__init__(**kwargs)
+
+    def __repr__(self) -> str:
+        """モデルの文字列表現"""
+        return f"<BlogSeedFragment {self.hour_key}#{self.position}>"
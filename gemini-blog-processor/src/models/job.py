@@ -0,0 +1,132 @@
+"""バックグラウンドジョブとデッドレターを保存するデータモデル"""
+
+from src.database import db
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+
+class Job(db.Model):
+    """バックグラウンドで実行するジョブを表すデータモデル
+
+    Attributes:
+        id: ジョブID
+        job_type: ジョブの種類（実行するハンドラの名前）
+        payload: ジョブの引数（JSON文字列）
+        status: 状態（queued, running, succeeded, dead）
+        attempts: 実行した回数
+        max_attempts: 実行回数の上限
+        run_at: 次に実行できる時刻
+        locked_at: ワーカーが実行を開始した時刻
+        last_error: 最後に発生したエラー
+        result: 実行結果（JSON文字列）
+        created_at: ジョブが登録された時刻
+        updated_at: ジョブが最後に更新された時刻
+    """
+
+    __tablename__ = "job"
+    __table_args__ = (
+        db.Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs: Any) -> None:
+        """モデルの初期化
+
+        Args:
+            **kwargs: モデルの属性と値
+        """
+        now = datetime.now(timezone.utc)
+        kwargs.setdefault('status', "queued")
+        kwargs.setdefault('attempts', 0)
+        kwargs.setdefault('run_at', now)
+        kwargs.setdefault('created_at', now)
+        kwargs.setdefault('updated_at', now)
+        super().__init__(**kwargs)
+
+    def __repr__(self) -> str:
+        """モデルの文字列表現"""
+        return f"<Job {self.id} {self.job_type} {self.status}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """モデルを辞書形式に変換
+
+        Returns:
+            Dict[str, Any]: モデルの属性と値を含む辞書
+        """
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_at": self.run_at.isoformat() if self.run_at else None,
+            "last_error": self.last_error,
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+
+
+class DeadLetterJob(db.Model):
+    """リトライしても成功しなかったジョブを表すデータモデル
+
+    Attributes:
+        id: デッドレターID
+        job_id: 元のジョブID
+        job_type: ジョブの種類
+        payload: ジョブの引数（JSON文字列）
+        attempts: 実行した回数
+        last_error: 最後に発生したエラー
+        failed_at: デッドレターに移された時刻
+    """
+
+    __tablename__ = "dead_letter_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False, index=True)
+    job_type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    last_error = db.Column(db.Text)
+    failed_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs: Any) -> None:
+        """モデルの初期化
+
+        Args:
+            **kwargs: モデルの属性と値
+        """
+        kwargs.setdefault('failed_at', datetime.now(timezone.utc))
+        super().__init__(**kwargs)
+
+    def __repr__(self) -> str:
+        """モデルの文字列表現"""
+        return f"<DeadLetterJob {self.id} job={self.job_id}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """モデルを辞書形式に変換
+
+        Returns:
+            Dict[str, Any]: モデルの属性と値を含む辞書
+        """
+        return {
+            "id": self.id,
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "payload": self.payload,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "failed_at": self.failed_at.isoformat()
+        }
@@ -5,6 +5,21 @@ from src.database import db
 from datetime import datetime, timezone
 from typing import Dict, Any
 
+
+def hour_key_for(timestamp: datetime) -> str:
+    """受信時刻から時間枠のキー（YYYYMMDDHH形式、UTC）を作成
+
+    Args:
+        timestamp: 受信時刻（タイムゾーンなしの場合はUTCとみなす）
+
+    Returns:
+        str: 時間枠のキー
+    """
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime("%Y%m%d%H")
+
+
 class Message(db.Model):
     """LINEメッセージを表すデータモデル
     
@@ -14,13 +29,20 @@ class Message(db.Model):
         message_type: メッセージの種類（text, image, etc.）
         content: メッセージの内容
         timestamp: メッセージの受信時刻
+        hour_key: 受信時刻の時間枠（YYYYMMDDHH形式、UTC）。時間単位の集計用に保存時に設定
     """
     
+    __table_args__ = (
+        db.Index("ix_message_type_timestamp", "message_type", "timestamp"),
+        db.Index("ix_message_user_timestamp", "user_id", "timestamp"),
+    )
+
     message_id = db.Column(db.String(100), primary_key=True)
     user_id = db.Column(db.String(100), nullable=False)
     message_type = db.Column(db.String(20), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
+    hour_key = db.Column(db.String(10), index=True)
 
     def __init__(self, **kwargs: Any) -> None:
         """モデルの初期化
@@ -29,6 +51,7 @@ class Message(db.Model):
             **kwargs: モデルの属性と値
         """
         kwargs.setdefault('timestamp', datetime.now(timezone.utc))
+        kwargs.setdefault('hour_key', hour_key_for(kwargs['timestamp']))
         super().__init__(**kwargs)
 
     def __repr__(self) -> str:
@@ -46,6 +69,7 @@ class Message(db.Model):
             "user_id": self.user_id,
             "type": self.message_type,
             "content": self.content,
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp.isoformat(),
+            "hour_key": self.hour_key
         }
 
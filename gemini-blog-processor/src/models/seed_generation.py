@@ -0,0 +1,84 @@
+"""ブログ記事の種の一括生成の進捗を保存するデータモデル"""
+
+from src.database import db
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+
+class SeedGeneration(db.Model):
+    """ユーザー・時間枠ごとの記事の種の生成結果を表すデータモデル
+
+    Attributes:
+        hour_key: 時間枠（YYYYMMDDHH形式）
+        user_id: メッセージを送信したユーザーのID
+        message_count: 生成に使ったメッセージ数
+        last_message_at: 生成に使った最後のメッセージの受信時刻
+        status: 状態（done, failed）
+        attempts: 失敗した回数（成功すると0に戻る）
+        content: 生成された記事の種（Markdown形式）
+        error: 最後に発生したエラー
+        generated_at: 最後に生成を試みた時刻
+    """
+
+    __tablename__ = "seed_generation"
+
+    hour_key = db.Column(db.String(10), primary_key=True)
+    user_id = db.Column(db.String(100), primary_key=True)
+    message_count = db.Column(db.Integer, nullable=False)
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    content = db.Column(db.Text)
+    error = db.Column(db.Text)
+    generated_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs: Any) -> None:
+        """モデルの初期化
+
+        Args:
+            **kwargs: モデルの属性と値
+        """
+        kwargs.setdefault('attempts', 0)
+        kwargs.setdefault('generated_at', datetime.now(timezone.utc))
+        super().__init__(**kwargs)
+
+    def __repr__(self) -> str:
+        """モデルの文字列表現"""
+        return f"<SeedGeneration {self.hour_key} {self.user_id} {self.status}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """モデルを辞書形式に変換
+
+        Returns:
+            Dict[str, Any]: モデルの属性と値を含む辞書
+        """
+        return {
+            "hour_key": self.hour_key,
+            "user_id": self.user_id,
+            "message_count": self.message_count,
+            "last_message_at": self.last_message_at.isoformat(),
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "generated_at": self.generated_at.isoformat()
+        }
+
+
+class SeedWatermark(db.Model):
+    """一括生成がどの時間枠まで完了したかを表すデータモデル
+
+    Attributes:
+        name: 処理の名前
+        hour_key: この時間枠より前はすべて処理済み（YYYYMMDDHH形式）
+        updated_at: 最後に更新された時刻
+    """
+
+    __tablename__ = "seed_watermark"
+
+    name = db.Column(db.String(50), primary_key=True)
+    hour_key = db.Column(db.String(10), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        """モデルの文字列表現"""
+        return f"<SeedWatermark {self.name} {self.hour_key}>"
@@ -6,6 +6,7 @@ from src.routes.message_receiver import message_receiver_bp
 from src.routes.external_content import external_content_bp
 from src.routes.user import user_bp
 from src.routes.blog_intent import blog_intent_bp
+from src.routes.jobs import jobs_bp
 
 # Export these blueprints to be registered in the application
 __all__ = [
@@ -13,5 +14,6 @@ __all__ = [
     'message_receiver_bp', 
     'external_content_bp',
     'user_bp',
-    'blog_intent_bp'
+    'blog_intent_bp',
+    'jobs_bp'
 ]
@@ -0,0 +1,66 @@
+"""
+バックグラウンドジョブの状態を確認するエンドポイント
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from src.database import db
+from src.models import Job, DeadLetterJob
+from src.services.job_queue import job_queue, JOB_STATUSES
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint("jobs", __name__, url_prefix="/api/jobs")
+
+
+@jobs_bp.route("", methods=["GET"])
+def list_jobs():
+    """ジョブの一覧を取得するエンドポイント（?status=queued&limit=50）"""
+    status = request.args.get("status")
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    if status and status not in JOB_STATUSES:
+        return jsonify({"error": f"status must be one of: {', '.join(JOB_STATUSES)}"}), 400
+
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+    return jsonify({"status": "success", "jobs": [job.to_dict() for job in jobs]}), 200
+
+
+@jobs_bp.route("/stats", methods=["GET"])
+def get_job_stats():
+    """状態ごとのジョブ数を取得するエンドポイント"""
+    return jsonify({"status": "success", **job_queue.stats()}), 200
+
+
+@jobs_bp.route("/<int:job_id>", methods=["GET"])
+def get_job(job_id: int):
+    """ジョブの状態を取得するエンドポイント"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()}), 200
+
+
+@jobs_bp.route("/dead_letters", methods=["GET"])
+def list_dead_letters():
+    """デッドレターの一覧を取得するエンドポイント"""
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    dead_letters = DeadLetterJob.query.order_by(DeadLetterJob.id.desc()).limit(limit).all()
+    return jsonify({"status": "success", "dead_letters": [d.to_dict() for d in dead_letters]}), 200
+
+
+@jobs_bp.route("/dead_letters/<int:dead_letter_id>/retry", methods=["POST"])
+def retry_dead_letter(dead_letter_id: int):
+    """デッドレターのジョブを再実行するエンドポイント"""
+    try:
+        job = job_queue.retry_dead_letter(dead_letter_id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to retry dead letter {dead_letter_id}: {e}")
+        return jsonify({"error": "Database error"}), 500
+    if not job:
+        return jsonify({"error": "Dead letter not found"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()}), 202
@@ -12,15 +12,18 @@ from flask import Blueprint, request, jsonify
 import os
 import datetime
 from datetime import timezone
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
 import logging
+from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
-from typing import Dict, Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List, Iterator
 
 from src.database import db
 from src.models import Message, BlogSeed
 from src.services.redmine_integration import RedmineIntegrationService
+from src.services import seed_store
+from src.services.image_captioner import ImageCaptioner
+from src.services.service_registry import service_registry
+from src.services.job_queue import job_queue, job_handler, PermanentJobError
 import src.config as config
 
 # ロギング設定
@@ -100,16 +103,92 @@ class MessageProcessor:
 
     @staticmethod
     def get_messages_for_hour(hour_key: str) -> List[Message]:
-        """指定された時間のメッセージを取得"""
+        """指定された時間のメッセージを取得（ix_message_type_timestampを使用）"""
         hour_start = datetime.datetime.strptime(hour_key, "%Y%m%d%H")
         hour_end = hour_start + datetime.timedelta(hours=1)
 
         return Message.query.filter(
+            Message.message_type == "text",
             Message.timestamp >= hour_start,
-            Message.timestamp < hour_end,
-            Message.message_type == "text"
+            Message.timestamp < hour_end
         ).order_by(Message.timestamp).all()
 
+    @staticmethod
+    def get_messages_page(
+        start: datetime.datetime,
+        end: datetime.datetime,
+        message_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        after: Optional[Tuple[datetime.datetime, str]] = None,
+        limit: int = 500
+    ) -> Tuple[List[Message], Optional[Tuple[datetime.datetime, str]]]:
+        """
+        期間内のメッセージを受信順に1ページ取得（キーセットページネーション）
+
+        OFFSETを使わず前のページの最後の位置から読み始めるため、後ろのページでも速度が落ちない
+
+        Args:
+            start: 期間の開始（この時刻を含む）
+            end: 期間の終了（この時刻を含まない）
+            message_type: メッセージの種類で絞り込む場合に指定
+            user_id: ユーザーで絞り込む場合に指定
+            after: 前のページのカーソル（最後のメッセージの受信時刻とメッセージID）
+            limit: 1ページの件数
+
+        Returns:
+            メッセージのリストと次のページのカーソル（最後のページの場合はNone）
+        """
+        query = Message.query.filter(Message.timestamp < end)
+        if message_type:
+            query = query.filter(Message.message_type == message_type)
+        if user_id:
+            query = query.filter(Message.user_id == user_id)
+        if after:
+            # (timestamp, message_id) > after と同じ条件を、timestampのインデックスで範囲検索できる形で書く
+            # （下限が2つあるとSQLiteがstartの方で検索することがあるため、下限はカーソルだけにする）
+            last_timestamp, last_message_id = after
+            query = query.filter(
+                Message.timestamp >= last_timestamp,
+                or_(Message.timestamp > last_timestamp, Message.message_id > last_message_id)
+            )
+        else:
+            query = query.filter(Message.timestamp >= start)
+
+        messages = query.order_by(Message.timestamp, Message.message_id).limit(limit).all()
+        cursor = (messages[-1].timestamp, messages[-1].message_id) if len(messages) == limit else None
+        return messages, cursor
+
+    @staticmethod
+    def iter_messages(
+        start: datetime.datetime,
+        end: datetime.datetime,
+        message_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        batch_size: int = 500
+    ) -> Iterator[List[Message]]:
+        """
+        期間内のメッセージを受信順にbatch_size件ずつ取得
+
+        Args:
+            start: 期間の開始（この時刻を含む）
+            end: 期間の終了（この時刻を含まない）
+            message_type: メッセージの種類で絞り込む場合に指定
+            user_id: ユーザーで絞り込む場合に指定
+            batch_size: 1回に取得する件数
+
+        Yields:
+            メッセージのリスト
+        """
+        cursor = None
+        while True:
+            messages, cursor = MessageProcessor.get_messages_page(
+                start, end, message_type=message_type, user_id=user_id, after=cursor, limit=batch_size
+            )
+            if messages:
+                yield messages
+            if cursor is None:
+                return
+
 class ContentGenerator:
     """Gemini AIを使用してブログ記事の種を生成するクラス"""
 
@@ -118,16 +197,12 @@ class ContentGenerator:
 
     def _setup_gemini(self) -> None:
         """Gemini APIのセットアップ"""
-        if not GEMINI_API_KEY:
-            logger.error("Gemini API key not configured")
-            return
-
         try:
-            genai.configure(api_key=GEMINI_API_KEY)
+            # モデルはプロセス内で共有する（genai.configureも1回だけ行われる）
             # テキスト生成用モデル
-            self.text_model = genai.GenerativeModel("gemini-2.5-flash-preview-04-17")          # 画像処理用モデル
-            self.vision_model = genai.GenerativeModel("gemini-2.5-flash-preview-04-17")
-            logger.info("Gemini API configured")
+            self.text_model = service_registry.generative_model("gemini-2.5-flash-preview-04-17")
+            # 画像処理用モデル
+            self.vision_model = service_registry.generative_model("gemini-2.5-flash-preview-04-17")
         except Exception as e:
             logger.error(f"Gemini setup failed: {e}")
             self.text_model = None
@@ -137,11 +212,13 @@ class ContentGenerator:
         """メッセージリストからブログ記事の種を生成"""
         if not messages:
             return None
+        return self.generate_content_from_text(self._format_messages(messages))
 
+    def generate_content_from_text(self, text: str) -> Optional[str]:
+        """整形済みのメッセージからブログ記事の種を生成（DBに触れないためワーカースレッドから呼び出せる）"""
         if not hasattr(self, "text_model") or self.text_model is None:
             return "[Error: Gemini API not configured]"
 
-        text = self._format_messages(messages)
         try:
             response = self.text_model.generate_content(
                 self._create_prompt(text),
@@ -153,76 +230,40 @@ class ContentGenerator:
             logger.error(f"Content generation failed: {e}")
             return None
 
-    def image_to_text(self, image_path: str) -> Optional[str]:
+    def image_to_text(self, image_path: str, user_id: Optional[str] = None) -> Optional[str]:
         """画像からその内容を説明するテキストを生成
         
         Args:
             image_path: 画像ファイルのパス
+            user_id: 画像を送ったユーザーのID（説明文のキャッシュはユーザーごと）
             
         Returns:
             画像の説明文。エラー時はNoneまたはエラーメッセージ
         """
-        if not hasattr(self, "vision_model") or self.vision_model is None:
-            logger.error("Gemini Vision model not configured")
-            return "[Error: Gemini Vision API not configured]"
-        
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
-            return f"[Error: Image file not found: {image_path}]"
-            
-        try:
-            logger.info(f"Processing image with Gemini Vision API: {image_path}")
-            
-            # 画像を読み込むためにPIL (Pillow)を使用
-            try:
-                from PIL import Image
-                image = Image.open(image_path)
-                logger.info(f"Successfully loaded image with PIL: {image.format}, size={image.size}")
-                
-                # 日本語で画像を説明するようにプロンプト設定
-                prompt = """
-                この画像に何が写っているか詳細に説明してください。
-                できるだけ具体的に、以下の点に注目して分析してください：
-                
-                1. 主要な被写体
-                2. 背景や環境
-                3. 人物がいる場合はその様子
-                4. 風景や物体の特徴
-                5. 色彩や雰囲気
-                
-                日本語で回答してください。
-                """
-                
-                # Gemini Vision APIを呼び出し - PILオブジェクトを直接渡す
-                response = self.vision_model.generate_content(
-                    [prompt, image],
-                    request_options={"timeout": GEMINI_TIMEOUT * 2}
-                )
-                
-                if hasattr(response, "text") and response.text:
-                    logger.info(f"Successfully generated image description ({len(response.text)} chars)")
-                    return response.text
-                else:
-                    logger.warning("Empty response from Gemini Vision API")
-                    return "[画像からテキストを生成できませんでした]"
-                    
-            except ImportError:
-                logger.error("PIL (Pillow) is not installed. Please install it using: pip install pillow")
-                return "[エラー: PILライブラリがインストールされていません。'pip install pillow'を実行してください]"
-                
-        except google_exceptions.DeadlineExceeded:
-            logger.error("Gemini API timeout exceeded")
-            return "[エラー: API呼び出しがタイムアウトしました]"
-        except Exception as e:
-            logger.error(f"Image analysis failed: {str(e)}")
-            return f"[画像分析中にエラーが発生しました: {str(e)}]"
+        return self.images_to_text([image_path], user_id)[0]["text"]
+
+    def images_to_text(self, image_paths: List[str], user_id: Optional[str] = None) -> List[Dict]:
+        """複数の画像の説明文をまとめて生成（縮小・重複の除外・並列呼び出しはImageCaptionerが行う）
+
+        Args:
+            image_paths: 画像ファイルのパスのリスト
+            user_id: 画像を送ったユーザーのID（説明文のキャッシュはユーザーごと）
+
+        Returns:
+            画像ごとの説明文（text）、成功したかどうか（succeeded）と各段階の所要時間。順番はimage_pathsと同じ
+        """
+        logger.info(f"Processing {len(image_paths)} images with Gemini Vision API")
+        return ImageCaptioner(getattr(self, "vision_model", None)).describe(image_paths, scope=user_id)
 
     @staticmethod
-    def _format_messages(messages: List[Message]) -> str:
-        """メッセージをテキスト形式に整形"""
+    def _format_messages(messages: List[Message], captions: Optional[Dict[str, str]] = None) -> str:
+        """メッセージをテキスト形式に整形（画像メッセージはcaptionsの説明文に置き換える）"""
+        captions = captions or {}
         return "\n\n".join([
             f'[{m.timestamp.strftime("%Y-%m-%d %H:%M:%S UTC")}] '
-            f'User {m.user_id}: {m.content}'
+            f'User {m.user_id}: '
+            + (f'[画像] {captions.get(m.message_id) or "（説明文を生成できませんでした）"}'
+               if m.message_type == "image" else m.content)
             for m in messages
         ])
 
@@ -245,29 +286,14 @@ class BlogSeedManager:
     """生成されたブログ記事の種を管理するクラス"""
 
     @staticmethod
-    def save_seed(hour_key: str, content: str) -> Optional[str]:
-        """ブログ種をデータベースに保存（既存データがある場合は追加）"""
+    def save_seed(hour_key: str, content: str, append: bool = True) -> Optional[str]:
+        """ブログ種をデータベースに保存（既存データがある場合は追加、append=Falseの場合は置き換え）"""
         try:
-            seed = db.session.get(BlogSeed, hour_key)
-            now = datetime.datetime.now(timezone.utc)
-            
-            if seed:
-                # 既存の内容を維持しつつ、新しいコンテンツを追加
-                # 現在時刻と一意識別子を含むセパレータを使用
-                separator = f"\n\n## {now.strftime('%Y-%m-%d %H:%M:%S')} の追加コンテンツ\n\n"
-                seed.markdown_content = seed.markdown_content + separator + content
-                seed.updated_at = now
-                logger.info(f"Appended content to existing blog seed: {hour_key}")
+            if append:
+                # 追加分は断片として保存し、既存の記事の行は書き換えない
+                seed_store.append_fragments(hour_key, [content])
             else:
-                # 新規作成
-                seed = BlogSeed(
-                    hour_key=hour_key,
-                    markdown_content=content
-                )
-                db.session.add(seed)
-                logger.info(f"Created new blog seed: {hour_key}")
-
-            db.session.commit()
+                seed_store.replace_seed(hour_key, content)
             logger.info(f"Blog seed saved: {hour_key}")
             return None
 
@@ -281,6 +307,105 @@ class BlogSeedManager:
         """指定された時間のブログ種を取得"""
         return db.session.get(BlogSeed, hour_key)
 
+    @staticmethod
+    def get_document(hour_key: str) -> Optional[Dict]:
+        """指定された時間のブログ種を追加された内容と合わせて取得"""
+        return seed_store.get_document(hour_key)
+
+    @staticmethod
+    def get_markdown(hour_key: str) -> Optional[str]:
+        """指定された時間のブログ種の全体（追加された内容を含むMarkdown）を取得"""
+        return seed_store.get_markdown(hour_key)
+
+# --- Background Jobs ---
+
+FORWARD_MESSAGE_JOB = "redmine.forward_message"
+FORWARD_SEED_INTENT_JOB = "redmine.forward_seed_intent"
+
+# リトライしても結果が変わらないエラー
+PERMANENT_REDMINE_ERRORS = ("bad_request", "unauthorized")
+
+@job_handler(FORWARD_MESSAGE_JOB)
+def forward_message_to_redmine(payload: Dict) -> Dict:
+    """LINEメッセージをRedmineチケット管理エージェントに転送するジョブ
+
+    Args:
+        payload: user_id, message_text, reply_token
+
+    Returns:
+        Redmineチケット管理エージェントのレスポンス
+    """
+    redmine_service = RedmineIntegrationService()
+
+    message_text = payload["message_text"]
+    user_id = payload["user_id"]
+    reply_token = payload.get("reply_token")
+
+    # コマンドメッセージかどうかの判定
+    if redmine_service.is_command_message(message_text):
+        if redmine_service.is_redmine_command(message_text):
+            # Redmineコマンドの処理
+            response = redmine_service.handle_redmine_command(
+                user_id=user_id,
+                message_text=message_text,
+                reply_token=reply_token
+            )
+        elif not redmine_service.is_gemini_command(message_text):
+            # 不明なコマンドの場合はヘルプを表示するためRedmineに転送
+            response = redmine_service.forward_message(
+                user_id=user_id,
+                message_text="@help",  # ヘルプコマンドを送信
+                reply_token=reply_token
+            )
+        else:
+            return {"status": "skipped", "message": "Gemini command"}
+    else:
+        # 通常メッセージの転送
+        response = redmine_service.forward_message(
+            user_id=user_id,
+            message_text=message_text,
+            reply_token=reply_token
+        )
+
+    _raise_for_redmine_error(response)
+    logger.info(f"Message forwarded to Redmine: {response.get('status', 'unknown')}")
+    return response
+
+@job_handler(FORWARD_SEED_INTENT_JOB)
+def forward_seed_intent_to_redmine(payload: Dict) -> Dict:
+    """ブログ種の意図を分析してRedmineチケット管理エージェントに転送するジョブ
+
+    Args:
+        payload: hour_key, user_id（ブログ種の所有者）
+
+    Returns:
+        Redmineチケット管理エージェントのレスポンス
+    """
+    from src.services.intent_analyzer import IntentAnalysisManager
+
+    hour_key = payload["hour_key"]
+    intent_analysis = IntentAnalysisManager().analyze_intent(hour_key)
+    if not intent_analysis:
+        raise RuntimeError(f"Intent analysis failed for hour_key: {hour_key}")
+
+    response = RedmineIntegrationService().process_message_with_intent(
+        user_id=payload["user_id"],
+        message_text=f"[自動生成] ブログ記事の種: {hour_key}",
+        intent_type=intent_analysis.intent_category,
+        confidence_score=intent_analysis.confidence_score,
+        keywords=[intent_analysis.target_audience, intent_analysis.emotional_tone] if intent_analysis.target_audience and intent_analysis.emotional_tone else []
+    )
+    _raise_for_redmine_error(response)
+    logger.info(f"Forwarded blog seed and intent analysis to Redmine for hour_key: {hour_key}")
+    return response
+
+def _raise_for_redmine_error(response: Dict) -> None:
+    """RedmineIntegrationServiceはエラーを戻り値で返すため、ここで例外にしてリトライさせる"""
+    if response.get("status") == "error":
+        if response.get("error_code") in PERMANENT_REDMINE_ERRORS:
+            raise PermanentJobError(response.get("message"))
+        raise RuntimeError(response.get("message"))
+
 # --- Webhook Endpoints ---
 
 @line_webhook_bp.route("/line", methods=["POST"])
@@ -308,52 +433,28 @@ def handle_line_webhook():
         if error == "Duplicate message":
             return jsonify({"info": "Duplicate message ignored"}), 200
         return jsonify({"error": error}), 500
-      # Redmineチケット管理エージェントとの連携処理
+
+    # Redmineチケット管理エージェントへの転送はワーカーで実行する（Redmineの応答を待たない）
+    job_id = None
     if config.REDMINE_INTEGRATION_ENABLED:
         try:
-            # Redmine連携サービスのインスタンス化
-            redmine_service = RedmineIntegrationService()
-            
-            message_text = message.content
-            user_id = message.user_id
-            reply_token = data.get("replyToken")  # LINEからのリプライトークン
-            
-            # コマンドメッセージかどうかの判定
-            if redmine_service.is_command_message(message_text):
-                if redmine_service.is_redmine_command(message_text):
-                    # Redmineコマンドの処理
-                    response = redmine_service.handle_redmine_command(
-                        user_id=user_id,
-                        message_text=message_text,
-                        reply_token=reply_token
-                    )
-                    logger.info(f"Redmine command handled: {response.get('status', 'unknown')}")
-                    
-                elif not redmine_service.is_gemini_command(message_text):
-                    # 不明なコマンドの場合はヘルプを表示するためRedmineに転送
-                    redmine_service.forward_message(
-                        user_id=user_id,
-                        message_text="@help",  # ヘルプコマンドを送信
-                        reply_token=reply_token
-                    )
-                    logger.info("Unknown command forwarded to Redmine as help request")
-            else:
-                # 通常メッセージの転送
-                redmine_service.forward_message(
-                    user_id=user_id,
-                    message_text=message_text,
-                    reply_token=reply_token
-                )
-                logger.info("Message forwarded to Redmine")
-                
+            job = job_queue.enqueue(FORWARD_MESSAGE_JOB, {
+                "user_id": message.user_id,
+                "message_text": message.content,
+                "reply_token": data.get("replyToken")  # LINEからのリプライトークン
+            })
+            job_id = job.id
         except Exception as e:
-            logger.error(f"Redmine integration error: {e}")
+            db.session.rollback()
+            logger.error(f"Failed to enqueue Redmine forwarding: {e}")
             # Redmine連携のエラーはアプリケーションの正常動作を阻害しないようにする
 
     return jsonify({
         "status": "success",
         "message": "Message received",
-        "message_id": message.message_id    }), 200
+        "message_id": message.message_id,
+        "job_id": job_id
+    }), 200
 
 @line_webhook_bp.route("/intent_process", methods=["POST"])
 def forward_intent_to_redmine():
@@ -373,8 +474,8 @@ def forward_intent_to_redmine():
             return jsonify({"error": "hour_key and user_id are required"}), 400
             
         # BlogSeedとBlogIntentAnalysisの取得
-        blog_seed = BlogSeedManager.get_seed(hour_key)
-        if not blog_seed:
+        blog_content = BlogSeedManager.get_markdown(hour_key)
+        if blog_content is None:
             return jsonify({"error": f"Blog seed not found for hour_key: {hour_key}"}), 404
             
         # BlogIntentAnalysisの取得
@@ -394,7 +495,7 @@ def forward_intent_to_redmine():
             "target_audience": intent_analysis.target_audience,
             "emotional_tone": intent_analysis.emotional_tone,
             "call_to_action": intent_analysis.call_to_action,
-            "blog_content": blog_seed.markdown_content,
+            "blog_content": blog_content,
             "hour_key": hour_key
         }
         
@@ -419,64 +520,32 @@ def forward_intent_to_redmine():
         
 @line_webhook_bp.route("/trigger_process", methods=["POST"])
 def trigger_processing():
-    """ブログ種生成処理を手動でトリガーするエンドポイント"""
+    """未処理の時間枠のブログ種をユーザーごとにまとめて生成するエンドポイント
+
+    前回の実行以降に完了した時間枠をすべて処理するため、実行されなかった時間があっても次の実行で追いつく
+    """
     try:
-        # 処理対象の時間を決定
-        now = datetime.datetime.now(timezone.utc)
-        hour_key = (now - datetime.timedelta(hours=1)).strftime("%Y%m%d%H")
+        from src.services.seed_batch import BatchSeedGenerator
+        result = BatchSeedGenerator().run()
 
-        # メッセージの取得と処理
-        messages = MessageProcessor.get_messages_for_hour(hour_key)
-        if not messages:
+        if not result["generated"] and not result["failed"] and not result["hour_keys"]:
             return jsonify({
                 "status": "warning",
-                "message": "No messages to process"
+                "message": "No messages to process",
+                **result
             }), 200
 
-        # コンテンツの生成
-        generator = ContentGenerator()
-        content = generator.generate_content(messages)
-        if not content:
+        if not result["generated"] and result["failed"]:
             return jsonify({
                 "status": "error",
-                "message": "Content generation failed"
-            }), 500        # ブログ種の保存
-        manager = BlogSeedManager()
-        if error := manager.save_seed(hour_key, content):
-            return jsonify({"error": error}), 500        # Redmine連携が有効な場合、自動的に結果を転送
-        if config.REDMINE_INTEGRATION_ENABLED:
-            try:
-                # BlogSeedの所有者を特定（この時間帯の最初のメッセージの送信者）
-                first_message = messages[0] if messages else None
-                if first_message:
-                    user_id = first_message.user_id
-                    
-                    # 意図分析を実行
-                    from src.services.intent_analyzer import IntentAnalysisManager
-                    intent_manager = IntentAnalysisManager()
-                    intent_analysis = intent_manager.analyze_intent(hour_key)
-                    
-                    if intent_analysis:
-                        # Redmine連携サービスのインスタンス化
-                        redmine_service = RedmineIntegrationService()
-                        
-                        # 意図分析結果をRedmineに転送
-                        redmine_service.process_message_with_intent(
-                            user_id=user_id,
-                            message_text=f"[自動生成] ブログ記事の種: {hour_key}",
-                            intent_type=intent_analysis.intent_category,
-                            confidence_score=intent_analysis.confidence_score,
-                            keywords=[intent_analysis.target_audience, intent_analysis.emotional_tone] if intent_analysis.target_audience and intent_analysis.emotional_tone else []
-                        )
-                        logger.info(f"Automatically forwarded blog seed and intent analysis to Redmine for hour_key: {hour_key}")
-            except Exception as e:
-                logger.error(f"Failed to automatically forward to Redmine: {e}")
-                # 自動転送の失敗はブログ種生成の成功に影響しない
+                "message": "Content generation failed",
+                **result
+            }), 500
 
         return jsonify({
             "status": "success",
             "message": "Processing completed",
-            "hour_key": hour_key
+            **result
         }), 200
 
     except Exception as e:
@@ -488,16 +557,16 @@ def get_blog_seed(hour_key: str):
     """生成されたブログ種を取得するエンドポイント"""
     try:
         manager = BlogSeedManager()
-        seed = manager.get_seed(hour_key)
+        seed = manager.get_document(hour_key)
         if not seed:
             return jsonify({"error": "Blog seed not found"}), 404
 
         return jsonify({
             "status": "success",
             "hour_key": hour_key,
-            "content": seed.markdown_content,
-            "created_at": seed.created_at.isoformat(),
-            "updated_at": seed.updated_at.isoformat()
+            "content": seed["content"],
+            "created_at": seed["created_at"].isoformat(),
+            "updated_at": seed["updated_at"].isoformat()
         }), 200
 
     except Exception as e:
@@ -0,0 +1,321 @@
+"""
+画像の説明文の一括生成
+画像の縮小・再エンコードをプロセスプールで行い、知覚ハッシュで同じ画像をまとめ、
+説明文がキャッシュにない画像だけを流量制限しながら並列にGemini Visionへ送る
+"""
+import io
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+from src.config import (
+    GEMINI_TIMEOUT, IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY, IMAGE_PREPARE_PROCESSES,
+    IMAGE_CAPTION_CONCURRENCY, IMAGE_CAPTION_RATE_PER_MINUTE, IMAGE_HASH_DISTANCE,
+    IMAGE_CAPTION_CACHE_SIZE
+)
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 日本語で画像を説明するようにプロンプト設定
+CAPTION_PROMPT = """
+この画像に何が写っているか詳細に説明してください。
+できるだけ具体的に、以下の点に注目して分析してください：
+
+1. 主要な被写体
+2. 背景や環境
+3. 人物がいる場合はその様子
+4. 風景や物体の特徴
+5. 色彩や雰囲気
+
+日本語で回答してください。
+"""
+
+PIL_MISSING_MESSAGE = "[エラー: PILライブラリがインストールされていません。'pip install pillow'を実行してください]"
+
+
+def _difference_hash(image: Any) -> int:
+    """知覚ハッシュ（dHash, 64ビット）を計算する（縮小や再圧縮ではほとんど変わらない）"""
+    from PIL import Image
+
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def prepare_image(image_path: str, max_edge: int = IMAGE_MAX_EDGE, quality: int = IMAGE_JPEG_QUALITY) -> Dict[str, Any]:
+    """画像を長辺max_edgeまで縮小してJPEGに再エンコードする（プロセスプールから呼び出す）
+
+    Args:
+        image_path: 画像ファイルのパス
+        max_edge: 縮小後の長辺（ピクセル）
+        quality: JPEGの品質
+
+    Returns:
+        data（JPEGのバイト列）, hash（知覚ハッシュ）, original_size, size, prepare_seconds
+    """
+    from PIL import Image, ImageOps
+
+    started = time.perf_counter()
+    with Image.open(image_path) as source:
+        original_size = source.size
+        # JPEGは縮小した解像度で直接デコードする（フル解像度で展開しない）
+        source.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality, optimize=True)
+    return {
+        "data": buffer.getvalue(),
+        "hash": _difference_hash(image),
+        "original_size": original_size,
+        "size": image.size,
+        "prepare_seconds": time.perf_counter() - started
+    }
+
+
+class RateLimiter:
+    """Gemini Visionの呼び出しを一定間隔に制限する（スレッド間で共有）"""
+
+    def __init__(self, per_minute: int = IMAGE_CAPTION_RATE_PER_MINUTE):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> float:
+        """呼び出せる順番が来るまで待つ
+
+        Returns:
+            待った秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CaptionCache:
+    """知覚ハッシュをキーにした説明文のLRUキャッシュ
+
+    ユーザーなどの範囲（scope）ごとに分け、同じ範囲の中でハッシュの差がdistance以下なら同じ画像とみなす
+    （別のユーザーの似た画像の説明文は返さない）
+    """
+
+    def __init__(self, max_entries: int = IMAGE_CAPTION_CACHE_SIZE, distance: int = IMAGE_HASH_DISTANCE):
+        self.max_entries = max_entries
+        self.distance = distance
+        self._entries: "OrderedDict[Tuple[Optional[str], int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: Optional[str], image_hash: int) -> Optional[str]:
+        with self._lock:
+            key = (scope, image_hash)
+            if key not in self._entries:
+                key = next(
+                    (k for k in self._entries
+                     if k[0] == scope and bin(k[1] ^ image_hash).count("1") <= self.distance), None
+                )
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, scope: Optional[str], image_hash: int, caption: str) -> None:
+        with self._lock:
+            key = (scope, image_hash)
+            self._entries[key] = caption
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# プロセス内で共有する流量制限と説明文のキャッシュ
+rate_limiter = RateLimiter()
+caption_cache = CaptionCache()
+
+_pool_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    """画像の縮小に使うプロセスプール（プロセスごとに1回だけ作成する）"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_PREPARE_PROCESSES or None)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _shutdown_pool() -> None:
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown_pool)
+
+
+class ImageCaptioner:
+    """複数の画像の説明文をまとめて生成するクラス"""
+
+    def __init__(self, model: Any, concurrency: int = IMAGE_CAPTION_CONCURRENCY,
+                 limiter: Optional[RateLimiter] = None, cache: Optional[CaptionCache] = None):
+        self.model = model
+        self.concurrency = concurrency
+        self.limiter = limiter or rate_limiter
+        self.cache = cache or caption_cache
+
+    def describe(self, image_paths: List[str], scope: Optional[str] = None) -> List[Dict[str, Any]]:
+        """画像の説明文を生成する
+
+        Args:
+            image_paths: 画像ファイルのパスのリスト
+            scope: キャッシュを共有する範囲（画像を送ったユーザーのIDなど）
+
+        Returns:
+            画像ごとの結果（path, text, succeeded, cached, duplicate_of, 各段階の所要時間など）。順番はimage_pathsと同じ
+        """
+        results = [{
+            "path": path, "text": None, "succeeded": False, "cached": False, "duplicate_of": None,
+            "prepare_seconds": 0.0, "wait_seconds": 0.0, "caption_seconds": 0.0
+        } for path in image_paths]
+
+        if self.model is None:
+            logger.error("Gemini Vision model not configured")
+            for result in results:
+                result["text"] = "[Error: Gemini Vision API not configured]"
+            return results
+
+        prepared = self._prepare(results)
+
+        # キャッシュにある画像と、同じバッチ内で先に出てきた画像と同じものはGeminiに送らない
+        originals: List[int] = []
+        for index, image in prepared.items():
+            result = results[index]
+            cached = self.cache.get(scope, image["hash"])
+            if cached is not None:
+                result.update(text=cached, succeeded=True, cached=True)
+                continue
+            original = next(
+                (i for i in originals
+                 if bin(prepared[i]["hash"] ^ image["hash"]).count("1") <= self.cache.distance), None
+            )
+            if original is None:
+                originals.append(index)
+            else:
+                result["duplicate_of"] = original
+
+        if originals:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="caption") as pool:
+                for index, outcome in zip(originals, pool.map(lambda i: self._caption(prepared[i]), originals)):
+                    if outcome["succeeded"]:
+                        self.cache.put(scope, prepared[index]["hash"], outcome["text"])
+                    results[index].update(outcome)
+
+        for result in results:
+            if result["duplicate_of"] is not None:
+                original = results[result["duplicate_of"]]
+                result.update(text=original["text"], succeeded=original["succeeded"])
+            logger.info(
+                f"Image caption {result['path']}: prepare={result['prepare_seconds']:.3f}s "
+                f"wait={result['wait_seconds']:.3f}s caption={result['caption_seconds']:.3f}s "
+                f"cached={result['cached']} duplicate_of={result['duplicate_of']}"
+            )
+        return results
+
+    def _prepare(self, results: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """存在する画像を縮小する（2枚以上の場合はプロセスプールで並列に行う）"""
+        indexes = []
+        for index, result in enumerate(results):
+            if os.path.exists(result["path"]):
+                indexes.append(index)
+            else:
+                logger.error(f"Image file not found: {result['path']}")
+                result["text"] = f"[Error: Image file not found: {result['path']}]"
+
+        if len(indexes) > 1:
+            pool = _process_pool()
+            futures = {index: pool.submit(prepare_image, results[index]["path"]) for index in indexes}
+            outcomes = {}
+            for index, future in futures.items():
+                try:
+                    outcomes[index] = future.result()
+                except Exception as e:
+                    outcomes[index] = e
+        else:
+            outcomes = {}
+            for index in indexes:
+                try:
+                    outcomes[index] = prepare_image(results[index]["path"])
+                except Exception as e:
+                    outcomes[index] = e
+
+        prepared = {}
+        for index, outcome in outcomes.items():
+            result = results[index]
+            if isinstance(outcome, ImportError):
+                logger.error("PIL (Pillow) is not installed. Please install it using: pip install pillow")
+                result["text"] = PIL_MISSING_MESSAGE
+            elif isinstance(outcome, Exception):
+                logger.error(f"Image preparation failed for {result['path']}: {outcome}")
+                result["text"] = f"[画像分析中にエラーが発生しました: {outcome}]"
+            else:
+                result.update(
+                    prepare_seconds=outcome["prepare_seconds"],
+                    original_size=outcome["original_size"],
+                    size=outcome["size"],
+                    bytes=len(outcome["data"])
+                )
+                prepared[index] = outcome
+        return prepared
+
+    def _caption(self, image: Dict[str, Any]) -> Dict[str, Any]:
+        """縮小した画像1枚の説明文をGemini Visionで生成する（ワーカースレッドで実行する）"""
+        wait = self.limiter.acquire()
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            response = self.model.generate_content(
+                [CAPTION_PROMPT, {"mime_type": "image/jpeg", "data": image["data"]}],
+                request_options={"timeout": GEMINI_TIMEOUT}
+            )
+            if hasattr(response, "text") and response.text:
+                text = response.text
+                succeeded = True
+            else:
+                logger.warning("Empty response from Gemini Vision API")
+                text = "[画像からテキストを生成できませんでした]"
+        except google_exceptions.DeadlineExceeded:
+            logger.error("Gemini API timeout exceeded")
+            text = "[エラー: API呼び出しがタイムアウトしました]"
+        except Exception as e:
+            logger.error(f"Image analysis failed: {str(e)}")
+            text = f"[画像分析中にエラーが発生しました: {str(e)}]"
+        return {
+            "text": text, "succeeded": succeeded,
+            "wait_seconds": wait, "caption_seconds": time.perf_counter() - started
+        }
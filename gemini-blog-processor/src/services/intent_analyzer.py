@@ -5,13 +5,13 @@ import json
 import logging
 from typing import Dict, Optional, Any, Tuple
 
-import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 
 from src.database import db
-from src.models.blog_seed import BlogSeed
 from src.models.blog_intent import BlogIntentAnalysis
 from src.config import GEMINI_API_KEY, GEMINI_TIMEOUT
+from src.services.service_registry import service_registry
+from src.services import seed_store
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -29,11 +29,9 @@ class IntentAnalysisManager:
             return
 
         try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            
             # 意図分析用モデル (Gemini 2.5 Flash Preview)
-            # 提供された設定を反映
-            self.model = genai.GenerativeModel(
+            # 提供された設定を反映（モデルはプロセス内で共有する）
+            self.model = service_registry.generative_model(
                 "gemini-2.5-flash-preview-04-17",
                 generation_config={
                     "temperature": 1.0,  # 高温設定でクリエイティブな出力
@@ -55,9 +53,9 @@ class IntentAnalysisManager:
             分析結果のBlogIntentAnalysisオブジェクト、エラー時はNone
         """
         # self.current_hour_key = hour_key # Store hour_key for logging in _generate_intent_analysis <- 削除
-        # BlogSeedを取得
-        blog_seed = db.session.get(BlogSeed, hour_key)
-        if not blog_seed:
+        # BlogSeedを取得（追加された内容を含む全体）
+        blog_content = seed_store.get_markdown(hour_key)
+        if blog_content is None:
             logger.error(f"Blog seed not found for hour_key: {hour_key}")
             return None
 
@@ -69,7 +67,7 @@ class IntentAnalysisManager:
         
         # Gemini APIで意図を分析
         analysis_result, raw_response = self._generate_intent_analysis(
-            blog_seed.markdown_content,
+            blog_content,
             hour_key # hour_keyを引数として渡す
         )
         if not analysis_result:
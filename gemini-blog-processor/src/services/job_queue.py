@@ -0,0 +1,262 @@
+"""
+バックグラウンドジョブのキュー
+Webhookなどのリクエスト処理ではジョブをDBに登録するだけにし、
+Redmineへの転送などの時間のかかる処理はワーカースレッドで実行する
+"""
+import json
+import logging
+import datetime
+import threading
+from datetime import timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask
+from sqlalchemy import func, select, update
+
+from src.database import db
+from src.models.job import Job, DeadLetterJob
+from src.config import (
+    JOB_WORKER_COUNT, JOB_POLL_INTERVAL, JOB_LOCK_TIMEOUT,
+    RETRY_MAX_ATTEMPTS, RETRY_DELAY_SECONDS
+)
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ["queued", "running", "succeeded", "dead"]
+
+# ジョブの種類 → ハンドラ（引数はジョブのpayload、戻り値はJSONに変換できる実行結果）
+_handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+class PermanentJobError(Exception):
+    """リトライしても成功しないエラー（すぐにデッドレターに移す）"""
+
+
+def job_handler(job_type: str):
+    """ジョブのハンドラを登録するデコレータ
+
+    Args:
+        job_type: ジョブの種類
+    """
+    def decorator(func: Callable[[Dict[str, Any]], Any]):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """SQLiteのジョブテーブルとワーカースレッドによるジョブキュー"""
+
+    def __init__(self, worker_count: int = JOB_WORKER_COUNT, poll_interval: float = JOB_POLL_INTERVAL):
+        self.worker_count = worker_count
+        self.poll_interval = poll_interval
+        self.app: Optional[Flask] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app: Flask, start_workers: bool = True) -> None:
+        """アプリケーションに登録する
+
+        ワーカーは最初のリクエストを受けたプロセスで起動する
+        （デバッグ時のリローダーの親プロセスではワーカーを起動しないため）
+
+        Args:
+            app: Flaskアプリケーション
+            start_workers: このプロセスでワーカーを起動するかどうか
+        """
+        self.app = app
+        app.extensions["job_queue"] = self
+        if start_workers:
+            app.before_request(self.start)
+
+    def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> Job:
+        """ジョブを登録する
+
+        Args:
+            job_type: ジョブの種類
+            payload: ジョブの引数
+            max_attempts: 実行回数の上限（省略時はRETRY_MAX_ATTEMPTS）
+
+        Returns:
+            登録したジョブ
+        """
+        job = Job(
+            job_type=job_type,
+            payload=json.dumps(payload, ensure_ascii=False),
+            max_attempts=max_attempts or RETRY_MAX_ATTEMPTS
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def start(self) -> None:
+        """ワーカースレッドを起動する（起動済みの場合は何もしない）"""
+        if self._threads or self.app is None:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.worker_count):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.worker_count} job workers")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """ワーカースレッドを停止する
+
+        Args:
+            timeout: スレッドごとの待ち時間（秒）
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            with self.app.app_context():
+                try:
+                    job = self._claim()
+                    if job is None:
+                        self._requeue_stale()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Failed to claim job: {e}", exc_info=True)
+                    job = None
+                if job is not None:
+                    self._execute(job)
+                    continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self) -> Optional[Job]:
+        """実行できるジョブを1件取り出して実行中にする"""
+        # SQLiteにはSELECT ... FOR UPDATEがないため、条件付きUPDATEで他のワーカーと取り合う
+        for _ in range(3):
+            now = _now()
+            job_id = db.session.execute(
+                select(Job.id)
+                .where(Job.status == "queued", Job.run_at <= now)
+                .order_by(Job.run_at, Job.id)
+                .limit(1)
+            ).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(status="running", locked_at=now, attempts=Job.attempts + 1, updated_at=now)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def _requeue_stale(self) -> None:
+        """実行中のまま止まったジョブ（プロセスの異常終了など）を待機中に戻す"""
+        stale_before = _now() - datetime.timedelta(seconds=JOB_LOCK_TIMEOUT)
+        requeued = db.session.execute(
+            update(Job)
+            .where(Job.status == "running", Job.locked_at < stale_before)
+            .values(status="queued", locked_at=None)
+        ).rowcount
+        db.session.commit()
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale jobs")
+
+    def _execute(self, job: Job) -> None:
+        """ジョブを実行し、結果に応じて完了・リトライ・デッドレターにする"""
+        handler = _handlers.get(job.job_type)
+        try:
+            if handler is None:
+                raise PermanentJobError(f"Unknown job type: {job.job_type}")
+            result = handler(json.loads(job.payload))
+        except Exception as e:
+            db.session.rollback()
+            self._fail(job, e)
+            return
+
+        job.status = "succeeded"
+        job.result = json.dumps(result, ensure_ascii=False, default=str) if result is not None else None
+        job.last_error = None
+        job.locked_at = None
+        job.updated_at = _now()
+        db.session.commit()
+        logger.info(f"Job {job.id} ({job.job_type}) succeeded")
+
+    def _fail(self, job: Job, error: Exception) -> None:
+        now = _now()
+        job.last_error = f"{type(error).__name__}: {error}"
+        job.locked_at = None
+        job.updated_at = now
+        if isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = "dead"
+            db.session.add(DeadLetterJob(
+                job_id=job.id,
+                job_type=job.job_type,
+                payload=job.payload,
+                attempts=job.attempts,
+                last_error=job.last_error,
+                failed_at=now
+            ))
+            logger.error(f"Job {job.id} ({job.job_type}) moved to dead letter: {job.last_error}")
+        else:
+            # 指数バックオフ（RETRY_DELAY_SECONDS, 2倍, 4倍...）
+            delay = RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+            job.status = "queued"
+            job.run_at = now + datetime.timedelta(seconds=delay)
+            logger.warning(f"Job {job.id} ({job.job_type}) failed (attempt {job.attempts}), retrying in {delay}s: {job.last_error}")
+        db.session.commit()
+
+    def retry_dead_letter(self, dead_letter_id: int) -> Optional[Job]:
+        """デッドレターのジョブを再実行する
+
+        Args:
+            dead_letter_id: デッドレターID
+
+        Returns:
+            再登録したジョブ、デッドレターが見つからない場合はNone
+        """
+        dead_letter = db.session.get(DeadLetterJob, dead_letter_id)
+        if dead_letter is None:
+            return None
+        job = db.session.get(Job, dead_letter.job_id)
+        now = _now()
+        job.status = "queued"
+        job.attempts = 0
+        job.run_at = now
+        job.updated_at = now
+        db.session.delete(dead_letter)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """状態ごとのジョブ数とワーカーの状態を取得する
+
+        Returns:
+            統計情報
+        """
+        counts = dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+        return {
+            "jobs": {status: counts.get(status, 0) for status in JOB_STATUSES},
+            "dead_letters": db.session.execute(select(func.count()).select_from(DeadLetterJob)).scalar(),
+            "workers": sum(1 for thread in self._threads if thread.is_alive())
+        }
+
+
+# アプリケーション全体で共有するジョブキュー（main.pyでinit_appする）
+job_queue = JobQueue()
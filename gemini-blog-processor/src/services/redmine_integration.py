@@ -8,9 +8,8 @@ import time
 import logging
 import requests
 from typing import Dict, Any, Optional, Union, List
-from urllib3.util import Retry
-from requests.adapters import HTTPAdapter
 from .. import config
+from .service_registry import service_registry
 
 class RedmineIntegrationService:
     """Redmineチケット管理エージェントと連携するためのサービスクラス"""
@@ -21,17 +20,8 @@ class RedmineIntegrationService:
         self.api_key = config.REDMINE_API_KEY
         self.logger = logging.getLogger(__name__)
         
-        # セッションの設定（コネクション再利用のため）
-        self.session = requests.Session()
-        retry_strategy = Retry(
-            total=3,  # リトライ回数
-            backoff_factor=1,  # 指数バックオフ係数
-            status_forcelist=[429, 500, 502, 503, 504],  # リトライするステータスコード
-            allowed_methods=["POST", "GET"]  # リトライを許可するHTTPメソッド
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # プロセス内で共有するセッション（コネクションを使い回すため）
+        self.session = service_registry.redmine_session()
     
     def forward_message(self, user_id: str, message_text: str, 
                        intent_data: Optional[Dict[str, Any]] = None,
@@ -78,7 +68,7 @@ class RedmineIntegrationService:
                 f"{self.api_url}/api/receive_message",
                 headers=headers,
                 json=request_data,
-                timeout=30  # タイムアウト設定（30秒）
+                timeout=config.REDMINE_TIMEOUT
             )
             
             # レスポンスのステータスコードによる処理
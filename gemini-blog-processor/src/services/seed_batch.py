@@ -0,0 +1,329 @@
+"""
+ブログ記事の種の一括生成
+処理済みの位置（ウォーターマーク）以降の完了した時間枠について、メッセージとこれまでの生成結果を比べ、
+未処理またはメッセージが増えたユーザー・時間枠の組だけをGeminiで並列に生成する。
+画像メッセージは先にユーザーごとにまとめて説明文を生成し、テキストメッセージと合わせて記事の種にする。
+時間枠のブログ種はユーザーごとの生成結果から毎回作り直すため、何度実行しても同じ結果になる
+"""
+import logging
+import datetime
+import threading
+from datetime import timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from src.database import db
+from src.models import Message, BlogSeed, SeedGeneration, SeedWatermark
+from src.models.message import hour_key_for
+from src.routes.line_webhook import ContentGenerator, BlogSeedManager, FORWARD_SEED_INTENT_JOB
+from src.services.job_queue import job_queue
+from src.config import (
+    SEED_WORKER_COUNT, SEED_MAX_HOURS_PER_RUN, SEED_MAX_ATTEMPTS, REDMINE_INTEGRATION_ENABLED
+)
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "hourly_seed"
+
+# ブログ記事の種にするメッセージの種類
+SEED_MESSAGE_TYPES = ("text", "image")
+
+# (hour_key, user_id)
+GroupKey = Tuple[str, str]
+
+
+class KeyedLocks:
+    """キーごとの排他（同じ組を複数の実行で同時に生成しないため）"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._held: Set[Any] = set()
+
+    def try_acquire(self, key: Any) -> bool:
+        with self._guard:
+            if key in self._held:
+                return False
+            self._held.add(key)
+            return True
+
+    def release(self, key: Any) -> None:
+        with self._guard:
+            self._held.discard(key)
+
+
+# プロセス内で共有する組ごとのロック
+_group_locks = KeyedLocks()
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(timezone.utc)
+
+
+def _is_error(content: Optional[str]) -> bool:
+    return not content or content.startswith("[Error")
+
+
+def initialize_watermark() -> Optional[str]:
+    """ウォーターマークがなければ作成する（アプリケーションコンテキスト内で呼び出す）
+
+    既存の環境では以前のトリガーで処理済みのメッセージ履歴全体を未処理とみなさないよう、
+    既存のブログ種の最新の時間枠（ブログ種がなければ現在の時間枠）から始める
+
+    Returns:
+        作成したウォーターマークの時間枠、既にある場合はNone
+    """
+    if db.session.get(SeedWatermark, WATERMARK_NAME) is not None:
+        return None
+    latest = db.session.execute(select(func.max(BlogSeed.hour_key))).scalar()
+    hour_key = latest[:10] if latest else hour_key_for(_now())
+    db.session.add(SeedWatermark(name=WATERMARK_NAME, hour_key=hour_key, updated_at=_now()))
+    db.session.commit()
+    logger.info(f"Initialized seed watermark at {hour_key}")
+    return hour_key
+
+
+class BatchSeedGenerator:
+    """未処理の時間枠のブログ記事の種をユーザーごとにまとめて生成するクラス"""
+
+    def __init__(self, worker_count: int = SEED_WORKER_COUNT, max_hours: int = SEED_MAX_HOURS_PER_RUN,
+                 generator: Optional[ContentGenerator] = None):
+        self.worker_count = worker_count
+        self.max_hours = max_hours
+        self.generator = generator or ContentGenerator()
+
+    def find_pending(self, current_hour: str) -> Tuple[List[GroupKey], List[str], List[str]]:
+        """生成が必要な組と、ブログ種を作り直す時間枠を探す
+
+        Args:
+            current_hour: 現在の時間枠（この時間枠はまだ完了していないため対象外）
+
+        Returns:
+            (生成する組, ブログ種だけ作り直す時間枠, 今回は処理しない未処理の時間枠)
+        """
+        initialize_watermark()
+        watermark = db.session.get(SeedWatermark, WATERMARK_NAME)
+        query = select(
+            Message.hour_key, Message.user_id, func.count(), func.max(Message.timestamp)
+        ).where(
+            Message.message_type.in_(SEED_MESSAGE_TYPES),
+            Message.hour_key < current_hour
+        )
+        if watermark:
+            query = query.where(Message.hour_key >= watermark.hour_key)
+        groups = db.session.execute(query.group_by(Message.hour_key, Message.user_id)).all()
+        hours = sorted({group.hour_key for group in groups})
+        if not hours:
+            return [], [], []
+
+        generations = {
+            (generation.hour_key, generation.user_id): generation
+            for generation in SeedGeneration.query.filter(SeedGeneration.hour_key.in_(hours)).all()
+        }
+        seeded = set(db.session.execute(select(BlogSeed.hour_key).where(BlogSeed.hour_key.in_(hours))).scalars())
+        # 以前のトリガーで作成されたブログ種（生成結果の記録がない時間枠）は置き換えない
+        generated_hour_keys = {hour_key for hour_key, _ in generations}
+        legacy = set(db.session.execute(
+            select(func.substr(BlogSeed.hour_key, 1, 10)).where(func.substr(BlogSeed.hour_key, 1, 10).in_(hours))
+        ).scalars()) - generated_hour_keys
+
+        pending_by_hour: Dict[str, List[GroupKey]] = {}
+        for hour_key, user_id, count, _ in groups:
+            if hour_key in legacy:
+                continue
+            generation = generations.get((hour_key, user_id))
+            if (
+                generation is None
+                or (generation.status == "done" and generation.message_count != count)
+                or (generation.status == "failed" and generation.attempts < SEED_MAX_ATTEMPTS)
+            ):
+                pending_by_hour.setdefault(hour_key, []).append((hour_key, user_id))
+
+        # 生成は済んでいるがブログ種がない時間枠（削除された場合など）は作り直すだけにする
+        generated_hours = {hour_key for (hour_key, _), g in generations.items() if g.content is not None}
+        unseeded = [
+            hour_key for hour_key in hours
+            if hour_key in generated_hours and hour_key not in seeded and hour_key not in pending_by_hour
+        ]
+
+        pending_hours = sorted(pending_by_hour)
+        selected = pending_hours[:self.max_hours]
+        deferred = pending_hours[self.max_hours:]
+        pending = [key for hour_key in selected for key in sorted(pending_by_hour[hour_key])]
+        return pending, unseeded, deferred
+
+    def run(self) -> Dict[str, Any]:
+        """未処理の時間枠をまとめて処理する（アプリケーションコンテキスト内で呼び出す）
+
+        Returns:
+            処理結果（生成・失敗・スキップした組の数、ブログ種を保存した時間枠、ウォーターマーク）
+        """
+        current_hour = hour_key_for(_now())
+        pending, unseeded, deferred = self.find_pending(current_hour)
+
+        locked = [key for key in pending if _group_locks.try_acquire(key)]
+        skipped = len(pending) - len(locked)
+        generated, failed = 0, 0
+        try:
+            captions = self._caption_images(locked)
+            inputs = {key: self._load_messages(*key, captions) for key in locked}
+            with ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="seed") as pool:
+                futures = {
+                    pool.submit(self.generator.generate_content_from_text, text): key
+                    for key, (text, _, _) in inputs.items()
+                }
+                # Geminiの呼び出しだけをワーカーで行い、DBへの保存はこのスレッドで行う
+                for future in as_completed(futures):
+                    key = futures[future]
+                    _, count, last_message_at = inputs[key]
+                    try:
+                        content = future.result()
+                    except Exception as e:
+                        content = f"[Error: {e}]"
+                    if self._save_generation(key, count, last_message_at, content):
+                        generated += 1
+                    else:
+                        failed += 1
+        finally:
+            for key in locked:
+                _group_locks.release(key)
+
+        hour_keys = []
+        for hour_key in sorted({hour_key for hour_key, _ in locked} | set(unseeded)):
+            if self._compose(hour_key):
+                hour_keys.append(hour_key)
+
+        # 他の実行が生成中の組の時間枠は、その実行が終わるまでウォーターマークを進めない
+        busy_hours = [hour_key for hour_key, _ in set(pending) - set(locked)]
+        watermark = self._advance_watermark(current_hour, deferred + busy_hours)
+        result = {
+            "hour_keys": hour_keys,
+            "generated": generated,
+            "failed": failed,
+            "skipped_locked": skipped,
+            "remaining_hours": len(deferred),
+            "watermark": watermark
+        }
+        logger.info(f"Batch seed generation finished: {result}")
+        return result
+
+    def _caption_images(self, keys: List[GroupKey]) -> Dict[str, str]:
+        """組の画像メッセージの説明文をユーザーごとにまとめて生成する（キャッシュもユーザーごと）
+
+        Returns:
+            メッセージIDと説明文の対応（説明文を生成できなかった画像は含まない）
+        """
+        images_by_user: Dict[str, List[Tuple[str, str]]] = {}
+        for hour_key, user_id in keys:
+            images_by_user.setdefault(user_id, []).extend(db.session.execute(
+                select(Message.message_id, Message.content).where(
+                    Message.hour_key == hour_key,
+                    Message.user_id == user_id,
+                    Message.message_type == "image"
+                ).order_by(Message.timestamp)
+            ).all())
+
+        captions = {}
+        for user_id, images in images_by_user.items():
+            if not images:
+                continue
+            results = self.generator.images_to_text([path for _, path in images], user_id)
+            captions.update({
+                message_id: result["text"]
+                for (message_id, _), result in zip(images, results) if result["succeeded"]
+            })
+        return captions
+
+    def _load_messages(self, hour_key: str, user_id: str,
+                       captions: Dict[str, str]) -> Tuple[str, int, datetime.datetime]:
+        """組のメッセージをプロンプト用の文字列にする（ワーカーに渡すためORMオブジェクトは渡さない）"""
+        messages = Message.query.filter(
+            Message.hour_key == hour_key,
+            Message.user_id == user_id,
+            Message.message_type.in_(SEED_MESSAGE_TYPES)
+        ).order_by(Message.timestamp).all()
+        return ContentGenerator._format_messages(messages, captions), len(messages), messages[-1].timestamp
+
+    def _save_generation(self, key: GroupKey, count: int, last_message_at: datetime.datetime,
+                         content: Optional[str]) -> bool:
+        """組の生成結果を保存する（失敗した場合は前回の成功した内容を残す）"""
+        hour_key, user_id = key
+        generation = db.session.get(SeedGeneration, key) or SeedGeneration(
+            hour_key=hour_key, user_id=user_id, message_count=count,
+            last_message_at=last_message_at, status="failed"
+        )
+        generation.generated_at = _now()
+        generation.message_count = count
+        generation.last_message_at = last_message_at
+        if _is_error(content):
+            # 前回成功した内容は残し、SEED_MAX_ATTEMPTS回までは次の実行で再試行する
+            generation.status = "failed"
+            generation.attempts = (generation.attempts or 0) + 1
+            generation.error = content or "Empty response"
+            logger.error(f"Seed generation failed for {hour_key}/{user_id}: {generation.error}")
+        else:
+            generation.status = "done"
+            generation.attempts = 0
+            generation.error = None
+            generation.content = content
+        db.session.add(generation)
+        db.session.commit()
+        return generation.status == "done"
+
+    def _compose(self, hour_key: str) -> bool:
+        """ユーザーごとの生成結果から時間枠のブログ種を作り直す
+
+        Returns:
+            ブログ種の内容が変わった場合はTrue
+        """
+        generations = SeedGeneration.query.filter(
+            SeedGeneration.hour_key == hour_key,
+            SeedGeneration.content.isnot(None)
+        ).order_by(SeedGeneration.user_id).all()
+        if not generations:
+            return False
+
+        if len(generations) == 1:
+            content = generations[0].content
+        else:
+            content = "\n\n".join(f"# User {g.user_id}\n\n{g.content}" for g in generations)
+
+        if BlogSeedManager.get_markdown(hour_key) == content:
+            return False
+        if error := BlogSeedManager.save_seed(hour_key, content, append=False):
+            logger.error(f"Failed to save blog seed {hour_key}: {error}")
+            return False
+
+        if REDMINE_INTEGRATION_ENABLED:
+            # ブログ種の所有者はこの時間枠の最初のメッセージの送信者
+            owner = db.session.execute(
+                select(Message.user_id)
+                .where(Message.hour_key == hour_key, Message.message_type.in_(SEED_MESSAGE_TYPES))
+                .order_by(Message.timestamp)
+                .limit(1)
+            ).scalar()
+            job_queue.enqueue(FORWARD_SEED_INTENT_JOB, {"hour_key": hour_key, "user_id": owner})
+        return True
+
+    def _advance_watermark(self, current_hour: str, deferred: List[str]) -> str:
+        """今回処理しなかった時間枠や再試行が残っている組の時間枠の手前までウォーターマークを進める"""
+        retry_hours = db.session.execute(
+            select(SeedGeneration.hour_key).where(
+                SeedGeneration.status == "failed",
+                SeedGeneration.attempts < SEED_MAX_ATTEMPTS,
+                SeedGeneration.hour_key < current_hour
+            )
+        ).scalars().all()
+        hour_key = min([current_hour, *deferred, *retry_hours])
+
+        watermark = db.session.get(SeedWatermark, WATERMARK_NAME)
+        if watermark is None:
+            watermark = SeedWatermark(name=WATERMARK_NAME, hour_key=hour_key, updated_at=_now())
+            db.session.add(watermark)
+        else:
+            watermark.hour_key = hour_key
+            watermark.updated_at = _now()
+        db.session.commit()
+        return watermark.hour_key
@@ -0,0 +1,217 @@
+"""
+ブログ記事の種の保存と組み立て
+追加のたびに記事全体を書き換えないよう、追加分はblog_seed_fragmentに1行ずつ保存し、
+記事全体は読み出すときに1回のクエリで組み立ててキーごとにキャッシュする
+"""
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from src.database import db
+from src.models.blog_seed import BlogSeed, BlogSeedFragment
+from src.config import SEED_CACHE_MAX_ENTRIES
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 追加位置が他の書き込みと重なった場合に再試行する回数
+APPEND_RETRIES = 3
+
+# キャッシュの版（記事の更新時刻, 最後の断片ID）
+Version = Tuple[Optional[datetime.datetime], Optional[int]]
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(timezone.utc)
+
+
+def _separator(created_at: datetime.datetime) -> str:
+    """追加された内容の前に入れる見出し（以前の文字列連結と同じ形式）"""
+    return f"\n\n## {created_at.strftime('%Y-%m-%d %H:%M:%S')} の追加コンテンツ\n\n"
+
+
+class SeedDocumentCache:
+    """組み立てた記事のLRUキャッシュ（版が変わった記事は使わない）"""
+
+    def __init__(self, max_entries: int = SEED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Version, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hour_key: str, version: Version) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(hour_key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(hour_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, hour_key: str, version: Version, document: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[hour_key] = (version, document)
+            self._entries.move_to_end(hour_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, hour_key: str) -> None:
+        with self._lock:
+            self._entries.pop(hour_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# プロセス内で共有するキャッシュ
+document_cache = SeedDocumentCache()
+
+
+def append_fragments(hour_key: str, contents: List[str]) -> None:
+    """ブログ記事の種に内容を追加する（記事がなければ最初の内容で作成する）
+
+    追加分はまとめて1回のINSERTで保存し、既存の記事の行は書き換えない
+
+    Args:
+        hour_key: 時間枠を示すキー
+        contents: 追加する内容のリスト（追加順）
+    """
+    if not contents:
+        return
+
+    for attempt in range(APPEND_RETRIES):
+        try:
+            remaining = contents
+            if db.session.get(BlogSeed, hour_key) is None:
+                db.session.add(BlogSeed(hour_key=hour_key, markdown_content=contents[0]))
+                db.session.flush()
+                remaining = contents[1:]
+                logger.info(f"Created new blog seed: {hour_key}")
+
+            if remaining:
+                now = _now()
+                last_position = db.session.execute(
+                    select(func.coalesce(func.max(BlogSeedFragment.position), 0))
+                    .where(BlogSeedFragment.hour_key == hour_key)
+                ).scalar()
+                db.session.execute(insert(BlogSeedFragment), [
+                    {"hour_key": hour_key, "position": last_position + i, "content": content, "created_at": now}
+                    for i, content in enumerate(remaining, start=1)
+                ])
+                logger.info(f"Appended {len(remaining)} fragments to blog seed: {hour_key}")
+
+            db.session.commit()
+            document_cache.invalidate(hour_key)
+            return
+        except IntegrityError:
+            # 同時に同じ記事を作成した、または同じ位置に追加した場合はやり直す
+            db.session.rollback()
+            if attempt == APPEND_RETRIES - 1:
+                raise
+
+
+def replace_seed(hour_key: str, content: str) -> None:
+    """ブログ記事の種の内容を置き換える（追加された内容も削除する）
+
+    Args:
+        hour_key: 時間枠を示すキー
+        content: 新しい内容
+    """
+    seed = db.session.get(BlogSeed, hour_key)
+    if seed is None:
+        db.session.add(BlogSeed(hour_key=hour_key, markdown_content=content))
+        logger.info(f"Created new blog seed: {hour_key}")
+    else:
+        seed.update_content(content)
+        db.session.execute(delete(BlogSeedFragment).where(BlogSeedFragment.hour_key == hour_key))
+        logger.info(f"Replaced content of blog seed: {hour_key}")
+    db.session.commit()
+    document_cache.invalidate(hour_key)
+
+
+def _current_version(hour_key: str) -> Optional[Version]:
+    """記事の版（記事がなければNone）"""
+    last_fragment_id = (
+        select(func.max(BlogSeedFragment.id))
+        .where(BlogSeedFragment.hour_key == BlogSeed.hour_key)
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        select(BlogSeed.updated_at, last_fragment_id).where(BlogSeed.hour_key == hour_key)
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
+def get_document(hour_key: str) -> Optional[Dict[str, Any]]:
+    """ブログ記事の種の全体を取得する
+
+    キャッシュが最新であればそれを返し、そうでなければ記事と追加分を1回のクエリで読み出して組み立てる
+
+    Args:
+        hour_key: 時間枠を示すキー
+
+    Returns:
+        hour_key, content（Markdown全体）, created_at, updated_at, fragments、記事がなければNone
+    """
+    version = _current_version(hour_key)
+    if version is None:
+        document_cache.invalidate(hour_key)
+        return None
+    document = document_cache.get(hour_key, version)
+    if document is not None:
+        return document
+
+    rows = db.session.execute(
+        select(
+            BlogSeed.markdown_content, BlogSeed.created_at, BlogSeed.updated_at,
+            BlogSeedFragment.id, BlogSeedFragment.content,
+            BlogSeedFragment.created_at.label("fragment_created_at")
+        )
+        .outerjoin(BlogSeedFragment, BlogSeedFragment.hour_key == BlogSeed.hour_key)
+        .where(BlogSeed.hour_key == hour_key)
+        .order_by(BlogSeedFragment.position)
+    ).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    parts = [first.markdown_content]
+    updated_at = first.updated_at
+    last_fragment_id = None
+    fragments = [row for row in rows if row.id is not None]
+    for row in fragments:
+        parts.append(_separator(row.fragment_created_at) + row.content)
+        updated_at = max(updated_at, row.fragment_created_at)
+        last_fragment_id = max(last_fragment_id or 0, row.id)
+
+    document = {
+        "hour_key": hour_key,
+        "content": "".join(parts),
+        "created_at": first.created_at,
+        "updated_at": updated_at,
+        "fragments": len(fragments)
+    }
+    document_cache.put(hour_key, (first.updated_at, last_fragment_id), document)
+    return document
+
+
+def get_markdown(hour_key: str) -> Optional[str]:
+    """ブログ記事の種の全体（Markdown）を取得する
+
+    Args:
+        hour_key: 時間枠を示すキー
+
+    Returns:
+        Markdown、記事がなければNone
+    """
+    document = get_document(hour_key)
+    return document["content"] if document else None
@@ -0,0 +1,146 @@
+"""
+外部サービスのクライアントをプロセス内で共有するレジストリ
+RedmineへのHTTPセッション（コネクションプール）とGeminiのモデルを
+プロセスごとに1回だけ作成し、リクエストやジョブをまたいで使い回す
+"""
+import os
+import json
+import atexit
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+import google.generativeai as genai
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from src.config import (
+    GEMINI_API_KEY, REDMINE_MAX_RETRIES, REDMINE_POOL_SIZE, REDMINE_KEEPALIVE
+)
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """RedmineのセッションとGeminiのモデルを共有するレジストリ"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._redmine_session: Optional[requests.Session] = None
+        self._gemini_configured = False
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._model_lookups = 0
+
+    def _check_pid(self) -> None:
+        # fork（gunicornのワーカーなど）で引き継いだ接続は使わず、ワーカーごとに作り直す
+        if self._pid != os.getpid():
+            self._reset()
+
+    def redmine_session(self) -> requests.Session:
+        """Redmineチケット管理エージェント用のセッションを取得
+
+        Returns:
+            コネクションプールとリトライを設定したセッション
+        """
+        with self._lock:
+            self._check_pid()
+            if self._redmine_session is None:
+                session = requests.Session()
+                retry_strategy = Retry(
+                    total=REDMINE_MAX_RETRIES,  # リトライ回数
+                    backoff_factor=1,  # 指数バックオフ係数
+                    status_forcelist=[429, 500, 502, 503, 504],  # リトライするステータスコード
+                    allowed_methods=["POST", "GET"]  # リトライを許可するHTTPメソッド
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=REDMINE_POOL_SIZE,
+                    max_retries=retry_strategy
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if not REDMINE_KEEPALIVE:
+                    session.headers["Connection"] = "close"
+                self._redmine_session = session
+                logger.info(f"Created Redmine session (pool size: {REDMINE_POOL_SIZE}, keep-alive: {REDMINE_KEEPALIVE})")
+            return self._redmine_session
+
+    def generative_model(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """Geminiのモデルを取得（同じモデル名・設定のモデルは使い回す）
+
+        Args:
+            model_name: モデル名
+            generation_config: 生成の設定
+
+        Returns:
+            GenerativeModel、APIキーが設定されていない場合はNone
+        """
+        if not GEMINI_API_KEY:
+            logger.error("Gemini API key not configured")
+            return None
+
+        key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+        with self._lock:
+            self._check_pid()
+            self._model_lookups += 1
+            if key not in self._models:
+                if not self._gemini_configured:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    self._gemini_configured = True
+                    logger.info("Gemini API configured")
+                if generation_config:
+                    self._models[key] = genai.GenerativeModel(model_name, generation_config=generation_config)
+                else:
+                    self._models[key] = genai.GenerativeModel(model_name)
+            return self._models[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """コネクションの再利用状況を取得
+
+        Returns:
+            Redmineへのリクエスト数と新規接続数、Geminiのモデルの取得回数と作成数
+        """
+        requests_sent = 0
+        connections = 0
+        with self._lock:
+            self._check_pid()
+            if self._redmine_session is not None:
+                for adapter in set(self._redmine_session.adapters.values()):
+                    for key in adapter.poolmanager.pools.keys():
+                        pool = adapter.poolmanager.pools.get(key)
+                        if pool is not None:
+                            requests_sent += pool.num_requests
+                            connections += pool.num_connections
+            return {
+                "pid": self._pid,
+                "redmine": {
+                    "pool_size": REDMINE_POOL_SIZE,
+                    "keepalive": REDMINE_KEEPALIVE,
+                    "requests": requests_sent,
+                    "connections_opened": connections,
+                    "connections_reused": max(0, requests_sent - connections)
+                },
+                "gemini": {
+                    "models": len(self._models),
+                    "lookups": self._model_lookups,
+                    "reused": max(0, self._model_lookups - len(self._models))
+                }
+            }
+
+    def close(self) -> None:
+        """セッションを閉じ、モデルを破棄する（プロセス終了時に呼び出す）"""
+        with self._lock:
+            if self._redmine_session is not None and self._pid == os.getpid():
+                self._redmine_session.close()
+            self._reset()
+
+
+# アプリケーション全体で共有するレジストリ
+service_registry = ServiceRegistry()
+atexit.register(service_registry.close)
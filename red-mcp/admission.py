@@ -0,0 +1,166 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import (
+    CLIENT_MAX_CONCURRENCY, TOOL_MAX_CONCURRENCY, TOOL_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT
+)
+import metrics
+
+class Overloaded(Exception):
+    """Raised when a call cannot be admitted; the server answers 429 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Too many concurrent requests ({reason}); retry later.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class Limiter:
+    """FIFO concurrency limiter: at most `limit` holders, waiters are served in arrival order."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque = deque()
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, timeout: Optional[float] = None):
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next waiter so newcomers cannot jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+class Ticket:
+    """Slots held by one admitted call; release() is safe to call more than once."""
+
+    def __init__(self, controller: "AdmissionController", client_id: str, tool_name: str, limiters: List[Limiter]):
+        self.controller = controller
+        self.client_id = client_id
+        self.tool_name = tool_name
+        self.limiters = limiters
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+class AdmissionController:
+    """Per-client and per-tool concurrency limits with one bounded, time-limited wait queue shared by all calls."""
+
+    def __init__(self, client_limit: int = CLIENT_MAX_CONCURRENCY, tool_limit: int = TOOL_MAX_CONCURRENCY,
+                 tool_limits: Optional[Dict[str, int]] = None, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.client_limit = client_limit
+        self.tool_limit = tool_limit
+        self.tool_limits = TOOL_CONCURRENCY if tool_limits is None else tool_limits
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.queued = 0
+        self._clients: Dict[str, Limiter] = {}
+        self._tools: Dict[str, Limiter] = {}
+
+    def _tool(self, tool_name: str) -> Limiter:
+        if tool_name not in self._tools:
+            self._tools[tool_name] = Limiter(self.tool_limits.get(tool_name, self.tool_limit))
+        return self._tools[tool_name]
+
+    def _client(self, client_id: str) -> Limiter:
+        if client_id not in self._clients:
+            self._clients[client_id] = Limiter(self.client_limit)
+        return self._clients[client_id]
+
+    def _reject(self, tool_name: str, reason: str):
+        metrics.REJECTED.inc(tool_name, reason)
+        raise Overloaded(reason, max(1, math.ceil(self.queue_timeout)))
+
+    async def _wait(self, limiter: Limiter, tool_name: str, timeout: Optional[float], shared: bool):
+        if shared:
+            self.queued += 1
+        metrics.QUEUED.inc(tool_name)
+        try:
+            await limiter.acquire(timeout)
+        finally:
+            if shared:
+                self.queued -= 1
+            metrics.QUEUED.dec(tool_name)
+
+    async def acquire(self, client_id: str, tool_name: str, client_slot: bool = True) -> Ticket:
+        """Waits for a client slot (unless client_slot is False) and then a tool slot; raises Overloaded if the queue is full or the wait times out."""
+        limiters = [self._client(client_id), self._tool(tool_name)] if client_slot else [self._tool(tool_name)]
+        return await self._acquire(client_id, tool_name, limiters, shared=True)
+
+    async def acquire_batch_item(self, client_id: str, tool_name: str) -> Ticket:
+        """Client and tool slots for one item of an admitted batch.
+
+        Waits up to the queue timeout like any call, but outside the shared queue: a batch runs at most
+        client_limit items at a time, so its own waiting items are already bounded.
+        """
+        return await self._acquire(client_id, tool_name, [self._client(client_id), self._tool(tool_name)], shared=False)
+
+    async def _acquire(self, client_id: str, tool_name: str, limiters: List[Limiter], shared: bool) -> Ticket:
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        acquired: List[Limiter] = []
+        try:
+            for limiter in limiters:
+                if not limiter.try_acquire():
+                    if shared and self.queued >= self.max_queue:
+                        self._reject(tool_name, "queue_full")
+                    try:
+                        await self._wait(limiter, tool_name, max(0.0, deadline - time.monotonic()), shared)
+                    except asyncio.TimeoutError:
+                        self._reject(tool_name, "queue_timeout")
+                acquired.append(limiter)
+        except BaseException:
+            for limiter in reversed(acquired):
+                limiter.release()
+            self._drop_idle_client(client_id)
+            raise
+
+        metrics.QUEUE_WAIT.observe(time.monotonic() - started, tool_name)
+        metrics.IN_FLIGHT.inc(tool_name)
+        return Ticket(self, client_id, tool_name, acquired)
+
+    def _release(self, ticket: Ticket):
+        for limiter in reversed(ticket.limiters):
+            limiter.release()
+        metrics.IN_FLIGHT.dec(ticket.tool_name)
+        self._drop_idle_client(ticket.client_id)
+
+    def _drop_idle_client(self, client_id: str):
+        limiter = self._clients.get(client_id)
+        if limiter is not None and limiter.idle:
+            del self._clients[client_id]
@@ -0,0 +1,84 @@
+"""Time-to-first-result of /tool/search_issues (buffered JSON) vs /tool/search_issues/stream (SSE).
+
+Runs the server in-process against a simulated Redmine that answers each page after --latency seconds,
+or against the Redmine configured in config.py with --live.
+
+    python benchmark_stream.py --items 500 --latency 0.2
+"""
+import argparse
+import socket
+import statistics
+import threading
+import time
+from unittest import mock
+
+import requests
+import uvicorn
+
+import redmine_tool
+from server import app
+
+def fake_redmine(total: int, latency: float):
+    def get(url, params=None, headers=None, timeout=None):
+        time.sleep(latency)
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 25))
+        issues = [{"id": i, "subject": f"Issue {i}", "status": {"id": 1, "name": "New"}, "updated_on": "2025-01-01T00:00:00Z"}
+                  for i in range(offset + 1, min(offset + limit, total) + 1)]
+        response = mock.Mock(status_code=200, headers={})
+        response.json.return_value = {"issues": issues, "total_count": total, "offset": offset, "limit": limit}
+        return response
+    return get
+
+def start_server() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+def buffered(base: str, params: dict) -> tuple:
+    started = time.perf_counter()
+    response = requests.post(f"{base}/tool/search_issues", json={"params": params})
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, len(response.json()["data"]["issues"])
+
+def streamed(base: str, params: dict) -> tuple:
+    started = time.perf_counter()
+    first = None
+    response = requests.post(f"{base}/tool/search_issues/stream", json={"params": params}, stream=True)
+    for line in response.iter_lines(decode_unicode=True):
+        if line == "event: result" and first is None:
+            first = time.perf_counter() - started
+        if line == "event: done":
+            break
+    return first, time.perf_counter() - started, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500, help="issues to fetch (limit)")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated seconds per Redmine page")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="use the Redmine configured in config.py")
+    args = parser.parse_args()
+
+    if not args.live:
+        redmine_tool._session.get = fake_redmine(args.items, args.latency)
+    base = start_server()
+    params = {"status": "all", "limit": args.items}
+
+    print(f"{'mode':<10} {'first result (s)':>18} {'complete (s)':>14}")
+    for name, run in (("buffered", buffered), ("stream", streamed)):
+        firsts, totals = [], []
+        for _ in range(args.runs):
+            # Measure Redmine round-trips, not the response cache
+            redmine_tool.response_cache.invalidate(lambda key, value: True)
+            first, total, _ = run(base, params)
+            firsts.append(first)
+            totals.append(total)
+        print(f"{name:<10} {statistics.median(firsts):>18.3f} {statistics.median(totals):>14.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import CACHE_MAX_ENTRIES
+
+class CacheEntry:
+    def __init__(self, value: Any, expires: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.value = value
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+class ResponseCache:
+    """Shared TTL cache for Redmine GET responses.
+
+    Expired entries are kept (up to max_entries, least recently used first out) so the next
+    fetch can revalidate them with If-None-Match / If-Modified-Since instead of downloading again.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[str, Any], bool]) -> int:
+        """Drops entries for which predicate(key, value) is true; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def fetch(self, key: str, ttl: float, load: Callable[[Dict[str, str]], Tuple[int, Any, Dict[str, str]]]) -> Any:
+        """Returns the cached value while fresh; otherwise calls load(conditional_headers).
+
+        load returns (status_code, value, response_headers); a 304 keeps the cached value for another ttl.
+        """
+        entry = self.get(key)
+        now = time.monotonic()
+        if entry is not None and entry.expires > now:
+            self.stats["hits"] += 1
+            return entry.value
+
+        conditional = {}
+        if entry is not None and entry.etag:
+            conditional["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            conditional["If-Modified-Since"] = entry.last_modified
+
+        status_code, value, headers = load(conditional)
+        if status_code == 304 and entry is not None:
+            self.stats["revalidated"] += 1
+            entry.expires = time.monotonic() + ttl
+            return entry.value
+
+        self.stats["misses"] += 1
+        self.put(key, CacheEntry(value, time.monotonic() + ttl, headers.get("ETag"), headers.get("Last-Modified")))
+        return value
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), **self.stats}
@@ -1,5 +1,31 @@
 import os
+import json
 
 # Prefer environment variables if available, otherwise use defaults
 REDMINE_API_KEY = os.getenv("REDMINE_API_KEY", "YOUR_REDMINE_API_KEY_HERE")
 REDMINE_URL = os.getenv("REDMINE_URL", "https://YOUR_REDMINE_URL_HERE")
+
+# Connection pool size and max parallel Redmine requests
+REDMINE_POOL_SIZE = int(os.getenv("REDMINE_POOL_SIZE", "16"))
+REDMINE_MAX_CONCURRENCY = int(os.getenv("REDMINE_MAX_CONCURRENCY", "8"))
+REDMINE_TIMEOUT = float(os.getenv("REDMINE_TIMEOUT", "10"))
+
+# /tool/batch limits and how long idempotent results are remembered (seconds)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+
+# Read-tool cache: TTL for issues/time entries, TTL for projects/statuses, and max cached responses
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+
+# Largest page an agent may request from a read tool (fetched from Redmine 100 at a time)
+READ_MAX_LIMIT = int(os.getenv("READ_MAX_LIMIT", "500"))
+
+# Admission control: concurrent calls per client (X-Client-Id header or IP) and per tool,
+# how many calls may wait in total, and how long they wait before being rejected with 429
+CLIENT_MAX_CONCURRENCY = int(os.getenv("CLIENT_MAX_CONCURRENCY", "4"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))
+TOOL_CONCURRENCY = json.loads(os.getenv("TOOL_CONCURRENCY", '{"create_issue": 4}'))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
@@ -0,0 +1,43 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from config import IDEMPOTENCY_TTL
+
+class IdempotencyStore:
+    """Remembers successful tool results by key so retried calls return the first result instead of repeating it."""
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL):
+        self.ttl = ttl
+        self._results: Dict[str, Tuple[float, Any]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._results.items() if expires <= now]:
+            del self._results[key]
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Tuple[int, Dict[str, Any]]]]) -> Tuple[Tuple[int, Dict[str, Any]], bool]:
+        """Returns (result, replayed). Only results with a 2xx status are remembered, so failures can be retried."""
+        self._purge()
+        if key in self._results:
+            return self._results[key][1], True
+        if key in self._in_flight:
+            # Same key retried while the first call is still running: wait for it
+            return await asyncio.shield(self._in_flight[key]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+        if 200 <= result[0] < 300:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+        future.set_result(result)
+        return result, False
@@ -1,6 +1,15 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from typing import Dict, Any, Union
-from config import REDMINE_API_KEY, REDMINE_URL
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from config import (
+    REDMINE_API_KEY, REDMINE_URL, REDMINE_POOL_SIZE, REDMINE_MAX_CONCURRENCY, REDMINE_TIMEOUT,
+    CACHE_TTL, REFERENCE_CACHE_TTL
+)
+from cache import ResponseCache
 
 class RedmineError(Exception):
     def __init__(self, message: str, status_code: int = None, response_data: Dict[str, Any] = None):
@@ -8,9 +17,21 @@ class RedmineError(Exception):
         self.status_code = status_code
         self.response_data = response_data
 
+# One pooled session shared by all tool calls; keep-alive connections are reused across threads
+_session = requests.Session()
+_session.headers.update({"X-Redmine-API-Key": REDMINE_API_KEY, "Content-Type": "application/json"})
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=REDMINE_POOL_SIZE))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=REDMINE_POOL_SIZE))
+
+# Dedicated workers so Redmine parallelism does not depend on the default executor size
+_executor = ThreadPoolExecutor(max_workers=REDMINE_MAX_CONCURRENCY, thread_name_prefix="redmine")
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run a blocking Redmine call in a worker thread, at most REDMINE_MAX_CONCURRENCY at a time."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
 def create_issue(project_id: Union[int, str], subject: str, description: str, tracker_id: int = 1) -> Dict[str, Any]:
     url = f"{REDMINE_URL}/issues.json"
-    headers = {"X-Redmine-API-Key": REDMINE_API_KEY, "Content-Type": "application/json"}
     data = {
         "issue": {
             "project_id": project_id,
@@ -21,8 +42,10 @@ def create_issue(project_id: Union[int, str], subject: str, description: str, tr
     }
     
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=10)
+        response = _session.post(url, json=data, timeout=REDMINE_TIMEOUT)
         response.raise_for_status()
+        # New issue: cached searches are now incomplete
+        response_cache.invalidate(lambda key, value: key.startswith("issues.json"))
         return response.json()
     except requests.exceptions.HTTPError as http_err:
         raise RedmineError(f"Redmine API error: {http_err}", 
@@ -30,3 +53,180 @@ def create_issue(project_id: Union[int, str], subject: str, description: str, tr
                           response_data=response.text)
     except requests.exceptions.RequestException as req_err:
         raise RedmineError(f"Network error connecting to Redmine: {req_err}")
+
+# Redmine's maximum page size; read tools always fetch aligned pages so any offset/limit reuses the cache
+PAGE_SIZE = 100
+
+response_cache = ResponseCache()
+
+def _get_json(path: str, params: Optional[Dict[str, Any]] = None, ttl: float = CACHE_TTL) -> Dict[str, Any]:
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    url = f"{REDMINE_URL}/{path}"
+
+    def load(conditional: Dict[str, str]):
+        try:
+            response = _session.get(url, params=params, headers=conditional, timeout=REDMINE_TIMEOUT)
+        except requests.exceptions.RequestException as req_err:
+            raise RedmineError(f"Network error connecting to Redmine: {req_err}")
+        if response.status_code == 304:
+            return 304, None, response.headers
+        if response.status_code != 200:
+            raise RedmineError(f"Redmine API error: {response.status_code} {response.reason} for url: {url}",
+                               status_code=response.status_code,
+                               response_data=response.text)
+        return 200, response.json(), response.headers
+
+    key = f"{path}?{urlencode(sorted(params.items()))}"
+    return response_cache.fetch(key, ttl, load)
+
+def _iter_range(path: str, key: str, params: Dict[str, Any], offset: int, limit: int,
+                ttl: float = CACHE_TTL) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    """Yields (items, total_count) page by page for items [offset, offset + limit), fetching whole pages of PAGE_SIZE."""
+    page = offset // PAGE_SIZE
+    skip = offset - page * PAGE_SIZE
+    remaining = limit
+    while remaining > 0:
+        data = _get_json(path, {**params, "offset": page * PAGE_SIZE, "limit": PAGE_SIZE}, ttl)
+        page_items = data.get(key, [])
+        total = data.get("total_count", page * PAGE_SIZE + len(page_items))
+        items = page_items[skip:skip + remaining]
+        skip = 0
+        remaining -= len(items)
+        page += 1
+        yield items, total
+        if not page_items or page * PAGE_SIZE >= total:
+            break
+
+def _collect(chunks: Iterator[Dict[str, Any]], key: str) -> Dict[str, Any]:
+    """Merges the chunks of a streaming read into one result."""
+    result: Dict[str, Any] = {}
+    for chunk in chunks:
+        items = chunk.pop(key)
+        result.update(chunk)
+        result.setdefault(key, []).extend(items)
+    return result
+
+def _name(ref: Optional[Dict[str, Any]]) -> Optional[str]:
+    return ref.get("name") if isinstance(ref, dict) else None
+
+def _compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if v not in (None, "", [], {})}
+
+def trim_issue(issue: Dict[str, Any], detailed: bool = False) -> Dict[str, Any]:
+    """Keeps the fields an agent needs; nested references are flattened to their names."""
+    trimmed = {
+        "id": issue.get("id"),
+        "subject": issue.get("subject"),
+        "project": _name(issue.get("project")),
+        "tracker": _name(issue.get("tracker")),
+        "status": _name(issue.get("status")),
+        "priority": _name(issue.get("priority")),
+        "assigned_to": _name(issue.get("assigned_to")),
+        "start_date": issue.get("start_date"),
+        "due_date": issue.get("due_date"),
+        "done_ratio": issue.get("done_ratio"),
+        "estimated_hours": issue.get("estimated_hours"),
+        "updated_on": issue.get("updated_on"),
+    }
+    if detailed:
+        trimmed.update({
+            "description": issue.get("description"),
+            "author": _name(issue.get("author")),
+            "parent_id": (issue.get("parent") or {}).get("id"),
+            "created_on": issue.get("created_on"),
+            "closed_on": issue.get("closed_on"),
+            "spent_hours": issue.get("spent_hours"),
+            "custom_fields": {f["name"]: f.get("value") for f in issue.get("custom_fields", []) if f.get("value")},
+            "journals": [
+                _compact({"user": _name(j.get("user")), "created_on": j.get("created_on"), "notes": j.get("notes")})
+                for j in issue.get("journals", []) if j.get("notes")
+            ],
+        })
+    return _compact(trimmed)
+
+def trim_time_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return _compact({
+        "id": entry.get("id"),
+        "issue_id": (entry.get("issue") or {}).get("id"),
+        "project": _name(entry.get("project")),
+        "user": _name(entry.get("user")),
+        "activity": _name(entry.get("activity")),
+        "hours": entry.get("hours"),
+        "spent_on": entry.get("spent_on"),
+        "comments": entry.get("comments"),
+    })
+
+def _drop_outdated_issue(issue: Dict[str, Any]):
+    """A list result newer than a cached get_issue response makes that response stale."""
+    prefix = f"issues/{issue['id']}.json?"
+    updated_on = issue.get("updated_on") or ""
+    response_cache.invalidate(
+        lambda key, value: key.startswith(prefix) and value and (value.get("issue", {}).get("updated_on") or "") < updated_on
+    )
+
+def iter_search_issues(project_id: Union[int, str, None] = None, query: Optional[str] = None, status: str = "open",
+                       assigned_to_id: Union[int, str, None] = None, tracker_id: Optional[int] = None,
+                       sort: str = "updated_on:desc", offset: int = 0, limit: int = 25) -> Iterator[Dict[str, Any]]:
+    status_id = {"open": "open", "closed": "closed", "all": "*"}.get(str(status), status)
+    params = {
+        "project_id": project_id,
+        "subject": f"~{query}" if query else None,
+        "status_id": status_id,
+        "assigned_to_id": assigned_to_id,
+        "tracker_id": tracker_id,
+        "sort": sort,
+    }
+    for issues, total in _iter_range("issues.json", "issues", params, offset, limit):
+        for issue in issues:
+            _drop_outdated_issue(issue)
+        yield {"total_count": total, "offset": offset, "issues": [trim_issue(issue) for issue in issues]}
+
+def search_issues(**kwargs) -> Dict[str, Any]:
+    return _collect(iter_search_issues(**kwargs), "issues")
+
+def get_issue(issue_id: int, include_journals: bool = False) -> Dict[str, Any]:
+    include = "journals,children" if include_journals else None
+    data = _get_json(f"issues/{issue_id}.json", {"include": include})
+    return trim_issue(data["issue"], detailed=True)
+
+def iter_projects(offset: int = 0, limit: int = 100) -> Iterator[Dict[str, Any]]:
+    for projects, total in _iter_range("projects.json", "projects", {}, offset, limit, REFERENCE_CACHE_TTL):
+        yield {
+            "total_count": total,
+            "offset": offset,
+            "projects": [
+                _compact({
+                    "id": p.get("id"),
+                    "identifier": p.get("identifier"),
+                    "name": p.get("name"),
+                    "parent": _name(p.get("parent")),
+                    "status": p.get("status"),
+                })
+                for p in projects
+            ]
+        }
+
+def list_projects(**kwargs) -> Dict[str, Any]:
+    return _collect(iter_projects(**kwargs), "projects")
+
+def list_statuses() -> Dict[str, Any]:
+    data = _get_json("issue_statuses.json", ttl=REFERENCE_CACHE_TTL)
+    return {"statuses": [_compact({"id": s.get("id"), "name": s.get("name"), "is_closed": s.get("is_closed")})
+                         for s in data.get("issue_statuses", [])]}
+
+def iter_time_entries(project_id: Union[int, str, None] = None, issue_id: Optional[int] = None,
+                      user_id: Union[int, str, None] = None, from_date: Optional[str] = None,
+                      to_date: Optional[str] = None, offset: int = 0, limit: int = 100) -> Iterator[Dict[str, Any]]:
+    params = {"project_id": project_id, "issue_id": issue_id, "user_id": user_id, "from": from_date, "to": to_date}
+    for entries, total in _iter_range("time_entries.json", "time_entries", params, offset, limit):
+        yield {
+            "total_count": total,
+            "offset": offset,
+            "total_hours": round(sum(e.get("hours") or 0 for e in entries), 2),
+            "time_entries": [trim_time_entry(entry) for entry in entries]
+        }
+
+def list_time_entries(**kwargs) -> Dict[str, Any]:
+    result = _collect(iter_time_entries(**kwargs), "time_entries")
+    result["total_hours"] = round(sum(e.get("hours") or 0 for e in result["time_entries"]), 2)
+    return result
@@ -1,9 +1,19 @@
+import asyncio
+import json
+import time
+import uuid
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 
-from redmine_tool import create_issue, RedmineError
+from config import BATCH_MAX_ITEMS
+from redmine_tool import run_in_pool, response_cache, RedmineError
+from idempotency import IdempotencyStore
+from admission import AdmissionController, Overloaded
+import metrics
 from tool_manifests import TOOL_MANIFESTS
+from tools import TOOLS, Tool
 
 app = FastAPI(
     title="Redmine MCP Tool Server",
@@ -11,41 +21,273 @@ app = FastAPI(
     version="1.0.0"
 )
 
+idempotency_store = IdempotencyStore()
+admission = AdmissionController()
+
+metrics.register(metrics.Gauge(
+    "redmcp_cache_entries", "Redmine responses held in the read cache",
+    callback=lambda: {(): response_cache.status()["entries"]}
+))
+metrics.register(metrics.Counter(
+    "redmcp_cache_lookups_total", "Read cache lookups by result", ("result",),
+    callback=lambda: {(result,): response_cache.stats[result] for result in ("hits", "misses", "revalidated")}
+))
+
+def client_id_of(request: Request) -> str:
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "unknown")
+
+def overloaded_response(error: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"success": False, "error": str(error), "reason": error.reason},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def json_object(request: Request) -> Dict[str, Any]:
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object.")
+    return body
+
+def params_of(params: Any) -> Dict[str, Any]:
+    """A call's params as a dict: missing or null means no parameters; anything else but an object is rejected."""
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError("'params' must be an object.")
+    return params
+
+async def call_tool(tool_name: str, params: Any, idempotency_key: Optional[str] = None) -> Tuple[int, Dict[str, Any]]:
+    """Runs one tool call and returns (status_code, content); never raises."""
+    tool = TOOLS.get(tool_name)
+    if tool is None:
+        return 404, {"success": False, "error": f"Tool '{tool_name}' not found."}
+    try:
+        params = params_of(params)
+    except ValueError as e:
+        return 400, {"success": False, "error": str(e)}
+    missing = tool.missing(params)
+    if missing:
+        return 400, {"success": False, "error": f"Missing required parameters: {', '.join(missing)}"}
+
+    async def run() -> Tuple[int, Dict[str, Any]]:
+        try:
+            result = await run_in_pool(tool.func, **tool.arguments(params))
+            return 200, {"success": True, "data": result}
+        except RedmineError as e:
+            return e.status_code or 500, {"success": False, "error": str(e), "details": e.response_data}
+        except (TypeError, ValueError) as e:
+            return 400, {"success": False, "error": f"Invalid parameters: {str(e)}"}
+        except Exception as e:
+            return 500, {"success": False, "error": f"Internal server error: {str(e)}"}
+
+    # Reads are served by the response cache; idempotency keys only matter for writes
+    if not idempotency_key or tool.read_only:
+        return await run()
+    (status_code, content), replayed = await idempotency_store.run(f"{tool_name}:{idempotency_key}", run)
+    return status_code, {**content, "replayed": True} if replayed else content
+
 @app.get("/tool/manifests")
 async def get_tool_manifests():
     return JSONResponse(content=TOOL_MANIFESTS)
 
-@app.post("/tool/{tool_name}")
-async def handle_tool_call(tool_name: str, request: Request):
-    body = await request.json()
-    params = body.get("params", {})
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-    if tool_name == "create_issue":
+@app.post("/tool/batch")
+async def handle_tool_batch(request: Request):
+    body = await json_object(request)
+    calls = body.get("calls")
+    if not isinstance(calls, list) or not calls:
+        raise HTTPException(status_code=400, detail="'calls' must be a non-empty array of {tool, params}.")
+    if len(calls) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many calls in one batch (max {BATCH_MAX_ITEMS}).")
+
+    # A batch-level key gives every item a stable key, so resending the same batch does not create duplicates
+    batch_key = body.get("idempotency_key") or request.headers.get("Idempotency-Key")
+
+    # The batch takes a "batch" slot; its items then take the client's and the tool's slots one by one
+    started = time.monotonic()
+    client_id = client_id_of(request)
+    try:
+        ticket = await admission.acquire(client_id, "batch", client_slot=False)
+    except Overloaded as e:
+        metrics.DURATION.observe(time.monotonic() - started, "batch", "429")
+        return overloaded_response(e)
+
+    async def run_item(index: int, call: Any) -> Dict[str, Any]:
+        if not isinstance(call, dict) or not isinstance(call.get("tool"), str):
+            return {"index": index, "status_code": 400, "success": False, "error": "Each call needs a 'tool' name."}
+        key = call.get("idempotency_key") or (f"{batch_key}:{index}" if batch_key else None)
+        if call["tool"] not in TOOLS:
+            status_code, content = await call_tool(call["tool"], call.get("params"), key)
+        else:
+            try:
+                item_ticket = await admission.acquire_batch_item(client_id, call["tool"])
+            except Overloaded as e:
+                return {"index": index, "tool": call["tool"], "status_code": 429, "success": False,
+                        "error": str(e), "reason": e.reason}
+            try:
+                status_code, content = await call_tool(call["tool"], call.get("params"), key)
+            finally:
+                item_ticket.release()
+        return {"index": index, "tool": call["tool"], "status_code": status_code, **content}
+
+    async def run_item_safely(index: int, call: Any) -> Dict[str, Any]:
+        # One bad item must not fail the whole batch
         try:
-            if not all(k in params for k in ["project_id", "subject", "description"]):
-                raise HTTPException(status_code=400, 
-                                  detail="Missing required parameters: project_id, subject, description")
-
-            result = create_issue(
-                project_id=params["project_id"],
-                subject=params["subject"],
-                description=params["description"],
-                tracker_id=params.get("tracker_id", 1)
-            )
-            return JSONResponse(content={"success": True, "data": result})
-        except RedmineError as e:
-            return JSONResponse(
-                status_code=e.status_code or 500,
-                content={"success": False, "error": str(e), "details": e.response_data}
-            )
+            return await run_item(index, call)
         except Exception as e:
-            return JSONResponse(
-                status_code=500,
-                content={"success": False, "error": f"Internal server error: {str(e)}"}
-            )
-    else:
+            return {"index": index, "tool": call.get("tool") if isinstance(call, dict) else None,
+                    "status_code": 500, "success": False, "error": f"Internal server error: {str(e)}"}
+
+    # At most CLIENT_MAX_CONCURRENCY items run (or wait) at a time; the rest are not queued anywhere yet
+    results: List[Dict[str, Any]] = [{}] * len(calls)
+    pending = iter(enumerate(calls))
+
+    async def worker():
+        for index, call in pending:
+            results[index] = await run_item_safely(index, call)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(admission.client_limit, len(calls)))))
+    finally:
+        ticket.release()
+    metrics.DURATION.observe(time.monotonic() - started, "batch", "200")
+    succeeded = sum(1 for r in results if r["success"])
+    return JSONResponse(content={
+        "success": succeeded == len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    })
+
+# Cancellation flags of the streams currently open, by stream id
+active_streams: Dict[str, asyncio.Event] = {}
+
+async def stream_tool(tool: Tool, params: Dict[str, Any], cancelled: asyncio.Event) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (event, data): a result per Redmine page with progress after it, then done, error or cancelled."""
+    started = time.monotonic()
+    received = 0
+    chunks = None
+    try:
+        arguments = tool.arguments(params)
+        if tool.stream is None:
+            yield "result", await run_in_pool(tool.func, **arguments)
+        else:
+            chunks = tool.stream(**arguments)
+            while True:
+                chunk = await run_in_pool(next, chunks, None)
+                if chunk is None:
+                    break
+                received += len(chunk.get(tool.stream_key, []))
+                yield "result", chunk
+                yield "progress", {"received": received, "total_count": chunk.get("total_count")}
+                if cancelled.is_set():
+                    yield "cancelled", {"received": received}
+                    return
+        yield "done", {"success": True, "received": received, "elapsed_ms": round((time.monotonic() - started) * 1000)}
+    except RedmineError as e:
+        yield "error", {"success": False, "status_code": e.status_code or 500, "error": str(e), "details": e.response_data}
+    except (TypeError, ValueError) as e:
+        yield "error", {"success": False, "status_code": 400, "error": f"Invalid parameters: {str(e)}"}
+    except Exception as e:
+        yield "error", {"success": False, "status_code": 500, "error": f"Internal server error: {str(e)}"}
+    finally:
+        # Also runs when the client disconnects: no further pages are fetched
+        if chunks is not None:
+            try:
+                chunks.close()
+            except ValueError:
+                # A page fetch is still running in a worker thread; its result is discarded
+                pass
+
+@app.post("/tool/streams/{stream_id}/cancel")
+async def cancel_tool_stream(stream_id: str):
+    cancelled = active_streams.get(stream_id)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail=f"Stream '{stream_id}' not found.")
+    cancelled.set()
+    return {"success": True}
+
+@app.post("/tool/{tool_name}/stream")
+async def handle_tool_stream(tool_name: str, request: Request, format: str = "sse"):
+    tool = TOOLS.get(tool_name)
+    if tool is None:
+        raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found.")
+    if not tool.read_only:
+        raise HTTPException(status_code=400, detail=f"Tool '{tool_name}' cannot be streamed; use /tool/{tool_name}.")
+
+    body = await json_object(request)
+    try:
+        params = params_of(body.get("params"))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    missing = tool.missing(params)
+    if missing:
+        return JSONResponse(status_code=400, content={"success": False, "error": f"Missing required parameters: {', '.join(missing)}"})
+
+    started = time.monotonic()
+    try:
+        ticket = await admission.acquire(client_id_of(request), tool_name)
+    except Overloaded as e:
+        metrics.DURATION.observe(time.monotonic() - started, tool_name, "429")
+        return overloaded_response(e)
+
+    ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    stream_id = uuid.uuid4().hex
+    cancelled = asyncio.Event()
+    active_streams[stream_id] = cancelled
+
+    def encode(event: str, data: Dict[str, Any]) -> str:
+        if ndjson:
+            return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        try:
+            yield encode("start", {"stream_id": stream_id, "tool": tool_name})
+            async for event, data in stream_tool(tool, params, cancelled):
+                yield encode(event, data)
+        finally:
+            active_streams.pop(stream_id, None)
+            finish()
+
+    def finish():
+        # Runs from the generator, or from the background task if the client left before streaming began
+        if not ticket.released:
+            ticket.release()
+            metrics.DURATION.observe(time.monotonic() - started, tool_name, "200")
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Stream-Id": stream_id},
+        background=BackgroundTask(finish)
+    )
+
+@app.post("/tool/{tool_name}")
+async def handle_tool_call(tool_name: str, request: Request):
+    if tool_name not in TOOLS:
         raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found.")
 
+    body = await json_object(request)
+    started = time.monotonic()
+    try:
+        ticket = await admission.acquire(client_id_of(request), tool_name)
+    except Overloaded as e:
+        metrics.DURATION.observe(time.monotonic() - started, tool_name, "429")
+        return overloaded_response(e)
+    try:
+        status_code, content = await call_tool(
+            tool_name, body.get("params"), request.headers.get("Idempotency-Key")
+        )
+    finally:
+        ticket.release()
+    metrics.DURATION.observe(time.monotonic() - started, tool_name, str(status_code))
+    return JSONResponse(status_code=status_code, content=content)
+
 @app.get("/")
 async def read_root():
     return {"message": "Redmine MCP Tool Server is running. Visit /docs for API documentation."}
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Limiter, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_limiter_serves_waiters_in_arrival_order():
+    async def scenario():
+        limiter = Limiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name):
+            await limiter.acquire()
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.create_task(waiter(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        # A newcomer may not take the slot ahead of the waiters
+        assert not limiter.try_acquire()
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter.idle
+
+    order, idle = run(scenario())
+    assert order == ["a", "b", "c"]
+    assert idle
+
+
+def test_limiter_timeout_leaves_no_waiter_behind():
+    async def scenario():
+        limiter = Limiter(1)
+        await limiter.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.acquire(0.01)
+        limiter.release()
+        return limiter.idle
+
+    assert run(scenario())
+
+
+def test_client_limit_times_out_with_429_reason():
+    async def scenario():
+        admission = AdmissionController(client_limit=1, tool_limit=8, tool_limits={}, max_queue=8, queue_timeout=0.05)
+        ticket = await admission.acquire("alice", "get_issue")
+        with pytest.raises(Overloaded) as error:
+            await admission.acquire("alice", "get_issue")
+        # Other clients are not affected
+        other = await admission.acquire("bob", "get_issue")
+        other.release()
+        ticket.release()
+        return error.value, admission
+
+    error, admission = run(scenario())
+    assert error.reason == "queue_timeout"
+    assert error.retry_after >= 1
+    assert admission.queued == 0
+    assert admission._clients == {}
+
+
+def test_full_queue_is_rejected_immediately():
+    async def scenario():
+        admission = AdmissionController(client_limit=8, tool_limit=1, tool_limits={}, max_queue=1, queue_timeout=1)
+        ticket = await admission.acquire("alice", "get_issue")
+        waiting = asyncio.create_task(admission.acquire("bob", "get_issue"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as error:
+            await admission.acquire("carol", "get_issue")
+        ticket.release()
+        (await waiting).release()
+        return error.value
+
+    assert run(scenario()).reason == "queue_full"
+
+
+def test_batch_items_use_client_slots_outside_the_shared_queue():
+    async def scenario():
+        admission = AdmissionController(client_limit=2, tool_limit=8, tool_limits={}, max_queue=1, queue_timeout=1)
+        batch = await admission.acquire("alice", "batch", client_slot=False)
+        items = [await admission.acquire_batch_item("alice", "get_issue") for _ in range(2)]
+        waiting = asyncio.create_task(admission.acquire_batch_item("alice", "get_issue"))
+        await asyncio.sleep(0)
+        queued_while_waiting = admission.queued
+        # A waiting batch item does not use up the shared queue of other clients
+        other = await admission.acquire("bob", "get_issue")
+        other.release()
+        # The batch's items count toward its client's limit
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(admission.acquire("alice", "get_issue"), 0.05)
+        items[0].release()
+        (await waiting).release()
+        items[1].release()
+        batch.release()
+        return queued_while_waiting, admission
+
+    queued_while_waiting, admission = run(scenario())
+    assert queued_while_waiting == 0
+    assert admission.queued == 0
+    assert admission._clients == {}
@@ -0,0 +1,202 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import READ_MAX_LIMIT
+import redmine_tool
+
+class Tool:
+    """A registered tool: the Redmine function it runs and the JSON schema of its parameters.
+
+    Tools that page through Redmine can also register a stream function yielding partial results,
+    each holding a list under stream_key.
+    """
+
+    def __init__(self, name: str, description: str, func: Callable[..., Dict[str, Any]],
+                 properties: Dict[str, Dict[str, Any]], required: List[str], read_only: bool,
+                 stream: Optional[Callable[..., Iterator[Dict[str, Any]]]] = None, stream_key: Optional[str] = None):
+        self.name = name
+        self.description = description
+        self.func = func
+        self.properties = properties
+        self.required = required
+        self.read_only = read_only
+        self.stream = stream
+        self.stream_key = stream_key
+
+    def missing(self, params: Dict[str, Any]) -> List[str]:
+        return [name for name in self.required if name not in params]
+
+    def arguments(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Known parameters only, with limit clamped to READ_MAX_LIMIT."""
+        arguments = {name: params[name] for name in self.properties if name in params}
+        if "limit" in arguments:
+            arguments["limit"] = max(1, min(int(arguments["limit"]), READ_MAX_LIMIT))
+        if "offset" in arguments:
+            arguments["offset"] = max(0, int(arguments["offset"]))
+        return arguments
+
+    def manifest(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "input_schema": {
+                "type": "object",
+                "properties": self.properties,
+                "required": self.required
+            }
+        }
+
+TOOLS: Dict[str, Tool] = {}
+
+def register_tool(name: str, description: str, func: Callable[..., Dict[str, Any]],
+                  properties: Optional[Dict[str, Dict[str, Any]]] = None,
+                  required: Optional[List[str]] = None, read_only: bool = True,
+                  stream: Optional[Callable[..., Iterator[Dict[str, Any]]]] = None,
+                  stream_key: Optional[str] = None) -> Tool:
+    tool = Tool(name, description, func, properties or {}, required or [], read_only, stream, stream_key)
+    TOOLS[name] = tool
+    return tool
+
+def get_manifests() -> List[Dict[str, Any]]:
+    return [tool.manifest() for tool in TOOLS.values()]
+
+def _paging(default_limit: int) -> Dict[str, Dict[str, Any]]:
+    return {
+        "offset": {
+            "type": "integer",
+            "description": "Number of results to skip.",
+            "default": 0
+        },
+        "limit": {
+            "type": "integer",
+            "description": f"Maximum number of results to return (up to {READ_MAX_LIMIT}).",
+            "default": default_limit
+        }
+    }
+
+register_tool(
+    "create_issue",
+    "Creates a new issue in a specified Redmine project.",
+    redmine_tool.create_issue,
+    {
+        "project_id": {
+            "type": "integer",
+            "description": "The numeric ID or string identifier of the Redmine project."
+        },
+        "subject": {
+            "type": "string",
+            "description": "The subject line of the new issue."
+        },
+        "description": {
+            "type": "string",
+            "description": "The detailed description of the new issue."
+        },
+        "tracker_id": {
+            "type": "integer",
+            "description": "The numeric ID of the tracker (e.g., 1 for Bug, 2 for Feature).",
+            "default": 1
+        }
+    },
+    ["project_id", "subject", "description"],
+    read_only=False
+)
+
+register_tool(
+    "search_issues",
+    "Searches Redmine issues by project, subject text, status, assignee or tracker. Returns a compact summary of each issue.",
+    redmine_tool.search_issues,
+    {
+        "project_id": {
+            "type": "integer",
+            "description": "The numeric ID or string identifier of the Redmine project."
+        },
+        "query": {
+            "type": "string",
+            "description": "Text that the issue subject must contain."
+        },
+        "status": {
+            "type": "string",
+            "description": "'open', 'closed', 'all', or a numeric status ID.",
+            "default": "open"
+        },
+        "assigned_to_id": {
+            "type": "integer",
+            "description": "User ID of the assignee, or 'me' for the API key's user."
+        },
+        "tracker_id": {
+            "type": "integer",
+            "description": "The numeric ID of the tracker."
+        },
+        "sort": {
+            "type": "string",
+            "description": "Sort order, e.g. 'updated_on:desc' or 'priority:desc,due_date'.",
+            "default": "updated_on:desc"
+        },
+        **_paging(25)
+    },
+    stream=redmine_tool.iter_search_issues,
+    stream_key="issues"
+)
+
+register_tool(
+    "get_issue",
+    "Gets one Redmine issue with its description, and optionally the comment history.",
+    redmine_tool.get_issue,
+    {
+        "issue_id": {
+            "type": "integer",
+            "description": "The numeric ID of the issue."
+        },
+        "include_journals": {
+            "type": "boolean",
+            "description": "Whether to include comments (journals with notes).",
+            "default": False
+        }
+    },
+    ["issue_id"]
+)
+
+register_tool(
+    "list_projects",
+    "Lists Redmine projects visible to the API key, with their numeric IDs and identifiers.",
+    redmine_tool.list_projects,
+    _paging(100),
+    stream=redmine_tool.iter_projects,
+    stream_key="projects"
+)
+
+register_tool(
+    "list_statuses",
+    "Lists Redmine issue statuses and whether each one closes the issue.",
+    redmine_tool.list_statuses
+)
+
+register_tool(
+    "list_time_entries",
+    "Lists Redmine time entries filtered by project, issue, user or date range, with the total hours.",
+    redmine_tool.list_time_entries,
+    {
+        "project_id": {
+            "type": "integer",
+            "description": "The numeric ID or string identifier of the Redmine project."
+        },
+        "issue_id": {
+            "type": "integer",
+            "description": "The numeric ID of the issue."
+        },
+        "user_id": {
+            "type": "integer",
+            "description": "User ID, or 'me' for the API key's user."
+        },
+        "from_date": {
+            "type": "string",
+            "description": "First day to include (YYYY-MM-DD)."
+        },
+        "to_date": {
+            "type": "string",
+            "description": "Last day to include (YYYY-MM-DD)."
+        },
+        **_paging(100)
+    },
+    stream=redmine_tool.iter_time_entries,
+    stream_key="time_entries"
+)
@@ -2,34 +2,167 @@
 Redmineチケット管理エージェント - 設定モジュール
 
 設定の管理と永続化を担当するモジュール
+
+設定はスナップショット（変更のたびに作り直す辞書）として保持するため、読み取りはロック不要です。
+変更はまとめて遅延書き込みし、一時ファイルからの置き換えでファイルを更新します。
+ユーザーごとの設定は SQLite のキーバリューストアに保存します。
 """
 
 import os
+import copy
 import json
+import time
+import atexit
+import sqlite3
 import logging
+import tempfile
+import threading
 from typing import Dict, Any, Optional
 from pathlib import Path
 
 # 共通ロガー設定
 logger = logging.getLogger(__name__)
 
+# 変更から書き込みまでの待ち時間（秒）
+FLUSH_DELAY = 1.0
+# 設定ファイルの変更を確認する間隔（秒）
+WATCH_INTERVAL = 5.0
+
+
+class UserPreferenceStore:
+    """ユーザーごとの設定を保存するキーバリューストア"""
+
+    def __init__(self, db_path: Path):
+        """
+        初期化
+
+        Args:
+            db_path: SQLiteファイルのパス
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_preferences ("
+                "user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (user_id, key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_user_preferences_key ON user_preferences (key)")
+            self._conn.commit()
+
+    def get(self, user_id: str, key: str, default: Any = None) -> Any:
+        """
+        ユーザー設定の取得
+
+        Args:
+            user_id: ユーザーID
+            key: 設定キー
+            default: デフォルト値
+
+        Returns:
+            設定値またはデフォルト値
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM user_preferences WHERE user_id = ? AND key = ?", (user_id, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_all(self, user_id: str) -> Dict[str, Any]:
+        """
+        ユーザーの全設定を取得
+
+        Args:
+            user_id: ユーザーID
+
+        Returns:
+            設定キーと値の辞書
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM user_preferences WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def set_many(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """
+        複数ユーザーの設定をまとめて保存
+
+        Args:
+            items: ユーザーIDごとの設定キーと値の辞書
+        """
+        rows = [
+            (user_id, key, json.dumps(value, ensure_ascii=False))
+            for user_id, preferences in items.items()
+            for key, value in (preferences or {}).items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO user_preferences (user_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value",
+                rows
+            )
+            self._conn.commit()
+
+    def set(self, user_id: str, key: str, value: Any) -> None:
+        """
+        ユーザー設定の保存
+
+        Args:
+            user_id: ユーザーID
+            key: 設定キー
+            value: 設定値
+        """
+        self.set_many({user_id: {key: value}})
+
+    def delete(self, user_id: str, key: str) -> None:
+        """
+        ユーザー設定の削除
+
+        Args:
+            user_id: ユーザーID
+            key: 設定キー
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM user_preferences WHERE user_id = ? AND key = ?", (user_id, key))
+            self._conn.commit()
+
+    def users_with(self, key: str) -> Dict[str, Any]:
+        """
+        指定した設定キーを持つユーザーを取得
+
+        Args:
+            key: 設定キー
+
+        Returns:
+            ユーザーIDと設定値の辞書
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, value FROM user_preferences WHERE key = ?", (key,)).fetchall()
+        return {user_id: json.loads(value) for user_id, value in rows}
+
+
 class Config:
     """設定管理クラス"""
-    
-    def __init__(self, config_path: Optional[str] = None):
+
+    def __init__(self, config_path: Optional[str] = None, watch: bool = True):
         """
         初期化
-        
+
         Args:
             config_path: 設定ファイルのパス (Noneの場合はデフォルト位置)
+            watch: 設定ファイルの変更を監視して自動で再読み込みするかどうか
         """
         if config_path:
             self.config_path = Path(config_path)
         else:
             # デフォルトは data/config.json
             self.config_path = Path(__file__).parent.parent / "data" / "config.json"
-          # 初期設定
-        self.config = {
+        # 初期設定
+        self.defaults = {
             "llm": {
                 "enabled": True,
                 "model": "gemini-2.0-flash",
@@ -47,21 +180,47 @@ class Config:
                 "debug_mode": True,
                 "version": "1.0.0"
             },
-            "user_preferences": {}
         }
-        
+        self.config = copy.deepcopy(self.defaults)
+        # 設定が変わるたびに増える番号（再読み込みの要否の判定用）
+        self.version = 0
+
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._mtime: Optional[int] = None
+        self.preferences = UserPreferenceStore(self.config_path.with_name("user_preferences.db"))
+
         # 設定ファイルの読み込み
         self._load_config()
-    
+        atexit.register(self.flush)
+
+        if watch:
+            threading.Thread(target=self._watch, name="config-watcher", daemon=True).start()
+
     def _load_config(self) -> None:
         """設定ファイルの読み込み"""
         try:
             if self.config_path.exists():
+                mtime = self.config_path.stat().st_mtime_ns
                 with open(self.config_path, "r", encoding="utf-8") as f:
                     loaded_config = json.load(f)
-                    # 既存設定にマージ（深いマージはせず、トップレベルのみ）
-                    for key, value in loaded_config.items():
-                        self.config[key] = value
+                # 既存設定にマージ（深いマージはせず、トップレベルのみ）
+                config = copy.deepcopy(self.defaults)
+                config.update(loaded_config)
+
+                # 旧形式のユーザー設定はキーバリューストアへ移す
+                legacy_preferences = config.pop("user_preferences", None)
+                if legacy_preferences:
+                    self.preferences.set_many(legacy_preferences)
+                    logger.info(f"ユーザー設定を移行しました: {len(legacy_preferences)}人分")
+
+                with self._write_lock:
+                    self.config = config
+                    self.version += 1
+                    self._mtime = mtime
+                    if legacy_preferences:
+                        self._schedule_flush()
                 logger.info(f"設定を読み込みました: {self.config_path}")
             else:
                 # 設定ファイルが存在しない場合はデフォルトを保存
@@ -69,27 +228,67 @@ class Config:
                 logger.info(f"デフォルト設定を作成しました: {self.config_path}")
         except Exception as e:
             logger.error(f"設定ファイルの読み込み中にエラー: {str(e)}")
-    
+
     def _save_config(self) -> None:
-        """設定ファイルの保存"""
+        """設定ファイルの保存（一時ファイルに書き込んでから置き換える）"""
         try:
             # 親ディレクトリが存在することを確認
             self.config_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+
+            with self._write_lock:
+                snapshot = self.config
+                self._dirty = False
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.config_path.parent), prefix=".config.", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.config_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                self._mtime = self.config_path.stat().st_mtime_ns
             logger.info(f"設定を保存しました: {self.config_path}")
         except Exception as e:
             logger.error(f"設定ファイルの保存中にエラー: {str(e)}")
-    
+
+    def _schedule_flush(self) -> None:
+        """遅延書き込みを予約（_write_lock を保持した状態で呼び出す）"""
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """未保存の変更があればファイルに書き込む"""
+        with self._write_lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+        self._save_config()
+
+    def _watch(self) -> None:
+        """設定ファイルの変更を監視し、外部で変更されたら再読み込み"""
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                mtime = self.config_path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self._mtime and not self._dirty:
+                logger.info("設定ファイルの変更を検出しました")
+                self._load_config()
+
     def get(self, key: str, default: Any = None) -> Any:
         """
         設定値の取得
-        
+
         Args:
             key: 設定キー（ドット区切りで階層指定可）
             default: デフォルト値
-            
+
         Returns:
             設定値またはデフォルト値
         """
@@ -101,70 +300,117 @@ class Config:
             return value
         except (KeyError, TypeError):
             return default
-    
+
     def set(self, key: str, value: Any) -> None:
         """
-        設定値の設定
-        
+        設定値の設定（ファイルへの書き込みは遅延してまとめて行う）
+
         Args:
             key: 設定キー（ドット区切りで階層指定可）
             value: 設定値
         """
         try:
             parts = key.split(".")
-            target = self.config
-            
-            # 最後の部分以外をたどる
-            for part in parts[:-1]:
-                if part not in target:
-                    target[part] = {}
-                target = target[part]
-            
-            # 値を設定
-            target[parts[-1]] = value
-            
-            # 変更を保存
-            self._save_config()
-            
+            with self._write_lock:
+                # 現在のスナップショットを複製して変更し、差し替える
+                config = copy.deepcopy(self.config)
+                target = config
+
+                # 最後の部分以外をたどる
+                for part in parts[:-1]:
+                    if part not in target:
+                        target[part] = {}
+                    target = target[part]
+
+                # 値を設定
+                target[parts[-1]] = value
+
+                self.config = config
+                self.version += 1
+                self._schedule_flush()
+
         except Exception as e:
             logger.error(f"設定の更新中にエラー: {str(e)}")
-    
+
     def update_user_preference(self, user_id: str, key: str, value: Any) -> None:
         """
         ユーザー設定の更新
-        
+
         Args:
             user_id: ユーザーID
             key: 設定キー
             value: 設定値
         """
-        if "user_preferences" not in self.config:
-            self.config["user_preferences"] = {}
-            
-        if user_id not in self.config["user_preferences"]:
-            self.config["user_preferences"][user_id] = {}
-            
-        self.config["user_preferences"][user_id][key] = value
-        self._save_config()
-    
+        try:
+            self.preferences.set(user_id, key, value)
+        except Exception as e:
+            logger.error(f"ユーザー設定の更新中にエラー: {str(e)}")
+
     def get_user_preference(self, user_id: str, key: str, default: Any = None) -> Any:
         """
         ユーザー設定の取得
-        
+
         Args:
             user_id: ユーザーID
             key: 設定キー
             default: デフォルト値
-            
+
         Returns:
             設定値またはデフォルト値
         """
         try:
-            return self.config["user_preferences"][user_id][key]
-        except (KeyError, TypeError):
+            return self.preferences.get(user_id, key, default)
+        except Exception as e:
+            logger.error(f"ユーザー設定の取得中にエラー: {str(e)}")
             return default
 
 
+    def delete_user_preference(self, user_id: str, key: str) -> None:
+        """
+        ユーザー設定の削除
+
+        Args:
+            user_id: ユーザーID
+            key: 設定キー
+        """
+        try:
+            self.preferences.delete(user_id, key)
+        except Exception as e:
+            logger.error(f"ユーザー設定の削除中にエラー: {str(e)}")
+
+    def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
+        """
+        ユーザーの全設定を取得
+
+        Args:
+            user_id: ユーザーID
+
+        Returns:
+            設定キーと値の辞書
+        """
+        try:
+            return self.preferences.get_all(user_id)
+        except Exception as e:
+            logger.error(f"ユーザー設定の取得中にエラー: {str(e)}")
+            return {}
+
+    def find_users_with_preference(self, key: str) -> Dict[str, Any]:
+        """
+        指定した設定キーを持つユーザーを取得
+
+        Args:
+            key: 設定キー
+
+        Returns:
+            ユーザーIDと設定値の辞書
+        """
+        try:
+            return self.preferences.users_with(key)
+        except Exception as e:
+            logger.error(f"ユーザー設定の検索中にエラー: {str(e)}")
+            return {}
+
+
 # シングルトンインスタンスの作成
 config = Config()
 
@@ -173,3 +419,17 @@ get_config = config.get
 set_config = config.set
 update_user_preference = config.update_user_preference
 get_user_preference = config.get_user_preference
+delete_user_preference = config.delete_user_preference
+get_user_preferences = config.get_user_preferences
+find_users_with_preference = config.find_users_with_preference
+flush_config = config.flush
+
+
+def get_config_version() -> int:
+    """
+    設定のバージョン番号を取得（設定が変わるたびに増える）
+
+    Returns:
+        バージョン番号
+    """
+    return config.version
@@ -9,9 +9,15 @@ import requests
 import datetime
 import json
 import logging
+import concurrent.futures
 from typing import Dict, List, Any, Optional, Tuple
 import importlib.util
 
+from .config import get_config
+from .redmine_mirror import RedmineMirror
+from .priority_scorer import PriorityScorer
+from .telemetry import span, normalize_path
+
 # 共通ロガー設定
 logger = logging.getLogger(__name__)
 
@@ -33,13 +39,14 @@ else:
 class RedmineAgent:
     """Redmineチケット管理エージェント"""
     
-    def __init__(self, redmine_url: str, api_key: str):
+    def __init__(self, redmine_url: str, api_key: str, mirror: Optional[RedmineMirror] = None):
         """
         初期化
         
         Args:
             redmine_url: RedmineのベースURL
             api_key: RedmineのAPIキー
+            mirror: 読み取りに使うローカルミラー（省略時は常にRedmineに問い合わせる）
         """
         self.redmine_url = redmine_url
         self.api_key = api_key
@@ -47,45 +54,59 @@ class RedmineAgent:
             "X-Redmine-API-Key": api_key,
             "Content-Type": "application/json"
         }
+        self.mirror = mirror
     
-    def get_daily_tasks(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """
-        本日予定されているタスクの取得
-        
-        Args:
-            user_id: ユーザーID (省略時は自分のタスク)
-            
-        Returns:
-            本日のタスク一覧
-        """
+    def _read_from_mirror(self) -> bool:
+        """ミラーから読み取るかどうか（最後の同期が新しい場合）"""
+        return self.mirror is not None and self.mirror.fresh
+    
+    def _mirror_fallback(self, reason: str) -> bool:
+        """Redmineから取得できない場合にミラーの内容で代替するかどうか（読み取り専用モード）"""
+        if self.mirror is not None and self.mirror.ready:
+            logger.warning(f"{reason}: ローカルミラーの内容で代替します（読み取り専用モード）")
+            return True
+        return False
+    
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[requests.Response]:
+        """Redmine APIのGETリクエスト（接続エラー時はNone）"""
+        with span("redmine.request", method="GET", endpoint=normalize_path(path)) as request_span:
+            try:
+                response = requests.get(
+                    f"{self.redmine_url}/{path}",
+                    headers=self.headers,
+                    params=params,
+                    timeout=get_config("redmine.request_timeout", 30)
+                )
+            except requests.RequestException as e:
+                request_span.set(status="connection_error")
+                logger.error(f"Redmine APIへの接続に失敗しました ({path}): {str(e)}")
+                return None
+            request_span.set(status=response.status_code)
+            return response
+    
+    def _send(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """Redmine APIへの更新リクエスト（失敗時はエラーメッセージを返す）"""
+        with span("redmine.request", method=method, endpoint=normalize_path(path)) as request_span:
+            try:
+                response = requests.request(
+                    method,
+                    f"{self.redmine_url}/{path}",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=get_config("redmine.request_timeout", 30)
+                )
+            except requests.RequestException as e:
+                request_span.set(status="connection_error")
+                return None, f"Redmineに接続できません: {str(e)}"
+            request_span.set(status=response.status_code)
+        if response.status_code not in (200, 201, 204):
+            return response, f"HTTP {response.status_code}: {response.text[:200]}"
+        return response, None
+    
+    @staticmethod
+    def _select_daily_tasks(issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """未完了のチケットから「今日のタスク」を抽出"""
         today = datetime.date.today().isoformat()
-        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
-        
-        # 今日に関連するタスクを取得（より広い範囲でフィルタ）
-        params = {
-            "status_id": "open",
-            "sort": "priority:desc,due_date:asc",
-            "limit": 100
-        }
-        
-        # OR条件で「期限切れ」「今日が期限」「期限なし」「優先度高」のいずれかに該当するタスクを取得
-        # Redmine APIの制限のため、一旦すべて取得して後でフィルタリング
-        
-        if user_id:
-            params["assigned_to_id"] = user_id
-            
-        response = requests.get(
-            f"{self.redmine_url}/issues.json",
-            headers=self.headers,
-            params=params
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get daily tasks: {response.text}")
-            return []
-            
-        data = response.json()
-        issues = data.get("issues", [])
         
         # APIからの結果をさらにフィルタリング
         today_issues = []
@@ -127,6 +148,59 @@ class RedmineAgent:
         
         return today_issues
     
+    def get_daily_tasks(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        本日予定されているタスクの取得
+        
+        Args:
+            user_id: ユーザーID (省略時は自分のタスク)
+            
+        Returns:
+            本日のタスク一覧
+        """
+        if self._read_from_mirror():
+            return self._select_daily_tasks(self.mirror.open_issues(user_id))
+        
+        # 今日に関連するタスクを取得（より広い範囲でフィルタ）
+        params = {
+            "status_id": "open",
+            "sort": "priority:desc,due_date:asc",
+            "limit": 100
+        }
+        
+        # OR条件で「期限切れ」「今日が期限」「期限なし」「優先度高」のいずれかに該当するタスクを取得
+        # Redmine APIの制限のため、一旦すべて取得して後でフィルタリング
+        
+        if user_id:
+            params["assigned_to_id"] = user_id
+            
+        response = self._get("issues.json", params)
+        
+        if response is None or response.status_code != 200:
+            if response is not None:
+                logger.error(f"Failed to get daily tasks: {response.text}")
+            if self._mirror_fallback("今日のタスクを取得できません"):
+                return self._select_daily_tasks(self.mirror.open_issues(user_id))
+            return []
+            
+        data = response.json()
+        return self._select_daily_tasks(data.get("issues", []))
+    
+    def get_daily_tasks_for_users(self, user_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        複数ユーザーの今日のタスクを取得（ミラーが利用できれば1回のクエリで取得）
+        
+        Args:
+            user_ids: ユーザーIDのリスト
+            
+        Returns:
+            ユーザーIDと今日のタスク一覧の対応
+        """
+        if self._read_from_mirror():
+            issues_by_user = self.mirror.open_issues_by_user(user_ids)
+            return {user_id: self._select_daily_tasks(issues) for user_id, issues in issues_by_user.items()}
+        return {user_id: self.get_daily_tasks(user_id=user_id) for user_id in user_ids}
+    
     def get_upcoming_tasks(self, days: int = 7, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         今後予定されているタスクの取得
@@ -141,6 +215,9 @@ class RedmineAgent:
         today = datetime.date.today()
         future_date = (today + datetime.timedelta(days=days)).isoformat()
         
+        if self._read_from_mirror():
+            return self.mirror.upcoming_issues(today.isoformat(), future_date, user_id)
+        
         params = {
             "start_date": "<="+future_date,
             "due_date": ">="+today.isoformat(),
@@ -152,19 +229,54 @@ class RedmineAgent:
         if user_id:
             params["assigned_to_id"] = user_id
             
-        response = requests.get(
-            f"{self.redmine_url}/issues.json",
-            headers=self.headers,
-            params=params
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get upcoming tasks: {response.text}")
+        response = self._get("issues.json", params)
+        
+        if response is None or response.status_code != 200:
+            if response is not None:
+                logger.error(f"Failed to get upcoming tasks: {response.text}")
+            if self._mirror_fallback("今後のタスクを取得できません"):
+                return self.mirror.upcoming_issues(today.isoformat(), future_date, user_id)
             return []
             
         data = response.json()
         return data.get("issues", [])
     
+    def get_completed_issues(self, on_date: Optional[str] = None, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        指定日に完了したチケットの取得
+        
+        Args:
+            on_date: 完了日 (YYYY-MM-DD形式、省略時は本日)
+            user_id: 担当者のユーザーID (省略時はすべて)
+            
+        Returns:
+            完了したチケット一覧
+        """
+        on_date = on_date or datetime.date.today().isoformat()
+        
+        if self._read_from_mirror():
+            return self.mirror.closed_issues(on_date, user_id)
+        
+        params = {
+            "status_id": "closed",
+            "closed_on": f"><{on_date}|{on_date}",
+            "limit": 100
+        }
+        
+        if user_id:
+            params["assigned_to_id"] = user_id
+        
+        response = self._get("issues.json", params)
+        
+        if response is None or response.status_code != 200:
+            if response is not None:
+                logger.error(f"Failed to get completed issues: {response.text}")
+            if self._mirror_fallback("完了したチケットを取得できません"):
+                return self.mirror.closed_issues(on_date, user_id)
+            return []
+        
+        return response.json().get("issues", [])
+    
     def log_time_entry(self, issue_id: int, hours: float, comments: str, spent_on: Optional[str] = None) -> bool:
         """
         作業時間の登録
@@ -191,17 +303,15 @@ class RedmineAgent:
             }
         }
         
-        response = requests.post(
-            f"{self.redmine_url}/time_entries.json",
-            headers=self.headers,
-            json=data
-        )
+        _, error = self._send("POST", "time_entries.json", data)
         
-        if response.status_code in [201, 200]:
+        if not error:
             logger.info(f"Time entry logged successfully for issue {issue_id}")
+            if self.mirror:
+                self.mirror.refresh_time_entries(issue_id)
             return True
         else:
-            logger.error(f"Failed to log time entry: {response.text}")
+            logger.error(f"Failed to log time entry: {error}")
             return False
     
     def update_issue_status(self, issue_id: int, status_id: int, notes: Optional[str] = None) -> bool:
@@ -225,17 +335,15 @@ class RedmineAgent:
         if notes:
             data["issue"]["notes"] = notes
             
-        response = requests.put(
-            f"{self.redmine_url}/issues/{issue_id}.json",
-            headers=self.headers,
-            json=data
-        )
+        _, error = self._send("PUT", f"issues/{issue_id}.json", data)
         
-        if response.status_code == 200:
+        if not error:
             logger.info(f"Issue {issue_id} status updated to {status_id}")
+            if self.mirror:
+                self.mirror.refresh_issue(issue_id)
             return True
         else:
-            logger.error(f"Failed to update issue status: {response.text}")
+            logger.error(f"Failed to update issue status: {error}")
             return False
     
     def update_issue_progress(self, issue_id: int, done_ratio: int, notes: Optional[str] = None) -> bool:
@@ -259,19 +367,182 @@ class RedmineAgent:
         if notes:
             data["issue"]["notes"] = notes
             
-        response = requests.put(
-            f"{self.redmine_url}/issues/{issue_id}.json",
-            headers=self.headers,
-            json=data
-        )
+        _, error = self._send("PUT", f"issues/{issue_id}.json", data)
         
-        if response.status_code == 200:
+        if not error:
             logger.info(f"Issue {issue_id} progress updated to {done_ratio}%")
+            if self.mirror:
+                self.mirror.refresh_issue(issue_id)
             return True
         else:
-            logger.error(f"Failed to update issue progress: {response.text}")
+            logger.error(f"Failed to update issue progress: {error}")
             return False
     
+    def _bulk_log_time(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """一括処理: 作業時間を1件登録"""
+        result = {"type": "log_time", "issue_id": item.get("issue_id"), "success": False}
+        try:
+            issue_id = int(item["issue_id"])
+            hours = float(item["hours"])
+        except (KeyError, TypeError, ValueError):
+            result["error"] = "issue_id と hours は必須です"
+            return result
+        
+        response, error = self._send("POST", "time_entries.json", {
+            "time_entry": {
+                "issue_id": issue_id,
+                "hours": hours,
+                "comments": item.get("comments") or "",
+                "spent_on": item.get("spent_on") or datetime.date.today().isoformat(),
+                "activity_id": item.get("activity_id", 4)
+            }
+        })
+        if error:
+            result["error"] = error
+            return result
+        result["success"] = True
+        result["time_entry_id"] = (response.json().get("time_entry") or {}).get("id")
+        return result
+    
+    def _bulk_update_issues(self, items: List[Dict[str, Any]], atomic: bool) -> List[Dict[str, Any]]:
+        """一括処理: 同じチケットへの更新を順番に実行（atomic の場合は更新前の値を記録）"""
+        results = []
+        previous = None
+        for item in items:
+            result = {"type": "update_issue", "issue_id": item.get("issue_id"), "success": False}
+            results.append(result)
+            try:
+                issue_id = int(item["issue_id"])
+                fields = {key: int(item[key]) for key in ("status_id", "done_ratio") if item.get(key) is not None}
+            except (KeyError, TypeError, ValueError):
+                result["error"] = "issue_id・status_id・done_ratio は整数で指定してください"
+                continue
+            if not fields:
+                result["error"] = "status_id または done_ratio を指定してください"
+                continue
+            if not 0 <= fields.get("done_ratio", 0) <= 100:
+                result["error"] = "進捗率は0～100の間で指定してください"
+                continue
+            
+            if atomic and previous is None:
+                response, error = self._send("GET", f"issues/{issue_id}.json")
+                if error:
+                    result["error"] = error
+                    continue
+                issue = response.json().get("issue", {})
+                previous = {"status_id": (issue.get("status") or {}).get("id"), "done_ratio": issue.get("done_ratio")}
+            
+            payload = dict(fields)
+            if item.get("notes"):
+                payload["notes"] = item["notes"]
+            _, error = self._send("PUT", f"issues/{issue_id}.json", {"issue": payload})
+            if error:
+                result["error"] = error
+                continue
+            result["success"] = True
+            if previous is not None:
+                result["previous"] = {key: previous[key] for key in fields}
+        return results
+    
+    def _rollback_bulk(self, results: List[Dict[str, Any]]) -> None:
+        """一括処理: 成功した処理を取り消す"""
+        restore: Dict[int, Dict[str, Any]] = {}
+        deletes = []
+        for result in results:
+            if not result["success"]:
+                continue
+            if result["type"] == "log_time" and result.get("time_entry_id"):
+                deletes.append(result)
+            elif result["type"] == "update_issue":
+                fields = restore.setdefault(int(result["issue_id"]), {})
+                for key, value in (result.get("previous") or {}).items():
+                    fields.setdefault(key, value)
+        
+        for result in deletes:
+            _, error = self._send("DELETE", f"time_entries/{result['time_entry_id']}.json")
+            result["rolled_back"] = error is None
+        for issue_id, fields in restore.items():
+            _, error = self._send("PUT", f"issues/{issue_id}.json", {
+                "issue": {**fields, "notes": "一括更新の取り消し"}
+            })
+            for result in results:
+                if result["type"] == "update_issue" and result["success"] and int(result["issue_id"]) == issue_id:
+                    result["rolled_back"] = error is None
+            if error:
+                logger.error(f"チケット#{issue_id}の一括更新を取り消せませんでした: {error}")
+    
+    def bulk_update(self, time_entries: Optional[List[Dict[str, Any]]] = None,
+                    issue_updates: Optional[List[Dict[str, Any]]] = None,
+                    atomic: bool = False) -> Dict[str, Any]:
+        """
+        作業時間の登録とチケットの更新をまとめて実行
+        
+        Redmineへのリクエストは設定 `redmine.bulk_max_concurrency`（既定: 4）件まで並列に送信し、
+        同じチケットへの更新は指定順に実行します。atomic の場合は1件でも失敗すると、
+        成功した処理を取り消します（作業時間は削除し、チケットは更新前の値に戻します）。
+        
+        Args:
+            time_entries: 作業時間のリスト [{"issue_id", "hours", "comments", "spent_on"}]
+            issue_updates: チケット更新のリスト [{"issue_id", "status_id", "done_ratio", "notes"}]
+            atomic: 失敗時に成功した処理を取り消すかどうか
+            
+        Returns:
+            全体の結果（status: ok / partial / failed / rolled_back）と指定順の各処理の結果
+        """
+        time_entries = time_entries or []
+        issue_updates = issue_updates or []
+        
+        # 同じチケットへの更新は1つのジョブにまとめる
+        update_groups: Dict[Any, List[int]] = {}
+        for index, item in enumerate(issue_updates):
+            update_groups.setdefault(str(item.get("issue_id")), []).append(index)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * (len(time_entries) + len(issue_updates))
+        jobs = len(time_entries) + len(update_groups)
+        if jobs:
+            max_workers = max(1, min(get_config("redmine.bulk_max_concurrency", 4), jobs))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._bulk_log_time, item): [index] for index, item in enumerate(time_entries)}
+                for indexes in update_groups.values():
+                    future = executor.submit(self._bulk_update_issues, [issue_updates[i] for i in indexes], atomic)
+                    futures[future] = [len(time_entries) + i for i in indexes]
+                for future in concurrent.futures.as_completed(futures):
+                    outcome = future.result()
+                    for index, result in zip(futures[future], outcome if isinstance(outcome, list) else [outcome]):
+                        results[index] = result
+        
+        succeeded = sum(1 for result in results if result["success"])
+        failed = len(results) - succeeded
+        if not failed:
+            status = "ok"
+        elif not succeeded:
+            status = "failed"
+        elif atomic:
+            self._rollback_bulk(results)
+            status = "rolled_back"
+        else:
+            status = "partial"
+        
+        if self.mirror and succeeded:
+            self._refresh_mirror_after_bulk(results)
+        
+        for index, result in enumerate(results):
+            result.pop("previous", None)
+            result["index"] = index
+        logger.info(f"一括処理: {len(results)}件中{succeeded}件成功 ({status})")
+        return {"status": status, "succeeded": succeeded, "failed": failed, "results": results}
+    
+    def _refresh_mirror_after_bulk(self, results: List[Dict[str, Any]]) -> None:
+        """一括処理で変更したチケットと作業時間をミラーに反映"""
+        issue_ids = {int(r["issue_id"]) for r in results if r["success"] and r["type"] == "update_issue"}
+        entry_issue_ids = {int(r["issue_id"]) for r in results if r["success"] and r["type"] == "log_time"}
+        max_workers = max(1, get_config("redmine.bulk_max_concurrency", 4))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for issue_id in issue_ids:
+                executor.submit(self.mirror.refresh_issue, issue_id)
+            for issue_id in entry_issue_ids:
+                executor.submit(self.mirror.refresh_time_entries, issue_id)
+    
     def get_time_entries(self, issue_id: Optional[int] = None, 
                          from_date: Optional[str] = None, 
                          to_date: Optional[str] = None,
@@ -288,6 +559,10 @@ class RedmineAgent:
         Returns:
             作業時間記録リスト
         """
+        # ミラーは直近 `mirror.full_sync_days` 日分しか持たないため、それより前を含む場合はRedmineに問い合わせる
+        if self._read_from_mirror() and self.mirror.covers_time_entries(from_date):
+            return self.mirror.time_entries(issue_id, from_date, to_date, user_id)
+        
         params = {
             "limit": 100
         }
@@ -304,19 +579,154 @@ class RedmineAgent:
         if user_id:
             params["user_id"] = user_id
         
-        response = requests.get(
-            f"{self.redmine_url}/time_entries.json",
-            headers=self.headers,
-            params=params
-        )
+        response = self._get("time_entries.json", params)
         
-        if response.status_code != 200:
-            logger.error(f"Failed to get time entries: {response.text}")
+        if response is None or response.status_code != 200:
+            if response is not None:
+                logger.error(f"Failed to get time entries: {response.text}")
+            if self._mirror_fallback("作業時間記録を取得できません"):
+                return self.mirror.time_entries(issue_id, from_date, to_date, user_id)
             return []
             
         data = response.json()
         return data.get("time_entries", [])
     
+    def format_morning_report(self, tasks: List[Dict[str, Any]]) -> str:
+        """
+        朝の予定レポートを整形
+
+        Args:
+            tasks: タスク一覧
+
+        Returns:
+            整形されたレポート文字列
+        """
+        today = datetime.date.today().strftime("%Y年%m月%d日")
+        report = f"【{today} 本日の予定】\n\n"
+
+        if not tasks:
+            return report + "予定されているタスクはありません。"
+
+        for i, task in enumerate(tasks, 1):
+            priority = (task.get("priority") or {}).get("name", "中")
+            subject = task.get("subject", "無題")
+            estimated_hours = task.get("estimated_hours")
+            estimate = f"{estimated_hours}h" if estimated_hours else "未設定"
+            due_date = task.get("due_date")
+            due = f", 期日:{due_date}" if due_date else ""
+
+            report += f"{i}. #{task.get('id', '')} {subject} (優先度:{priority}, 見積:{estimate}{due})\n"
+
+        report += "\n今日も良い一日を！"
+        return report
+
+    def format_evening_report(self, completed_tasks: List[Dict[str, Any]],
+                              time_entries: List[Dict[str, Any]]) -> str:
+        """
+        夜の実績レポートを整形
+
+        Args:
+            completed_tasks: 完了したタスク一覧
+            time_entries: 作業時間エントリ一覧
+
+        Returns:
+            整形されたレポート文字列
+        """
+        today = datetime.date.today().strftime("%Y年%m月%d日")
+        report = f"【{today} 本日の実績】\n\n"
+
+        # 総作業時間
+        total_hours = round(sum(entry.get("hours", 0) for entry in time_entries), 2)
+        report += f"総作業時間: {total_hours}時間\n\n"
+
+        # 完了タスク
+        report += "■ 完了したタスク\n"
+        if completed_tasks:
+            for i, task in enumerate(completed_tasks, 1):
+                subject = task.get("subject", "無題")
+                report += f"{i}. #{task.get('id', '')} {subject}\n"
+        else:
+            report += "完了したタスクはありません。\n"
+
+        # 作業時間詳細
+        report += "\n■ 作業時間詳細\n"
+        if time_entries:
+            for entry in time_entries:
+                issue_id = (entry.get("issue") or {}).get("id", "不明")
+                hours = entry.get("hours", 0)
+                comments = entry.get("comments", "")
+                report += f"- チケット#{issue_id}: {hours}時間 ({comments})\n"
+        else:
+            report += "記録された作業時間はありません。\n"
+
+        report += "\nお疲れ様でした！"
+        return report
+
+    def suggest_task_consolidation(self, user_id: Optional[int] = None, days: int = 14) -> List[str]:
+        """
+        タスクの効率的な処理順序や統合の提案を作成
+
+        期限・優先度・進捗率のスコアと、同じプロジェクトで期限が近いタスクのまとまりから提案します。
+
+        Args:
+            user_id: ユーザーID (省略時は自分のタスク)
+            days: 何日先までのタスクを対象にするか
+
+        Returns:
+            提案のリスト（未完了のタスクがなければ空）
+        """
+        tasks = {task["id"]: task for task in self.get_daily_tasks(user_id=user_id)}
+        for task in self.get_upcoming_tasks(days=days, user_id=user_id):
+            tasks.setdefault(task["id"], task)
+        if not tasks:
+            return []
+
+        def labels(items: List[Dict[str, Any]], limit: int = 5) -> str:
+            text = "、".join(f"#{task['id']}" for task in items[:limit])
+            return text + (f" 他{len(items) - limit}件" if len(items) > limit else "")
+
+        today = datetime.date.today().isoformat()
+        ranked = [task for task, _ in PriorityScorer().load(list(tasks.values())).ranked(limit=3)]
+        suggestions = [
+            "優先して取り組むタスク: " + "、".join(f"#{task['id']} {task.get('subject', '無題')}" for task in ranked)
+        ]
+
+        overdue = [task for task in tasks.values() if task.get("due_date") and task["due_date"] < today]
+        if overdue:
+            suggestions.append(f"期限切れのタスクが{len(overdue)}件あります（{labels(overdue)}）。期限の見直しか担当の調整を検討してください")
+
+        near_done = [task for task in tasks.values() if (task.get("done_ratio") or 0) >= 80]
+        if near_done:
+            suggestions.append(f"進捗80%以上のタスク（{labels(near_done)}）を先に完了させると、並行して抱えるタスクを減らせます")
+
+        # 同じプロジェクトで期限が対象期間内にあるタスクは、まとめて進める候補
+        by_project: Dict[str, List[Dict[str, Any]]] = {}
+        for task in tasks.values():
+            if task.get("due_date") and task["due_date"] >= today:
+                by_project.setdefault((task.get("project") or {}).get("name", "不明"), []).append(task)
+        for project, project_tasks in sorted(by_project.items()):
+            if len(project_tasks) >= 2:
+                project_tasks.sort(key=lambda task: task["due_date"])
+                suggestions.append(
+                    f"プロジェクト「{project}」のタスク（{labels(project_tasks)}）は期限が近いため、まとめて進めることを検討してください"
+                )
+        return suggestions
+
+    def fetch_issue(self, issue_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Redmineからチケット（ジャーナル含む）を直接取得（ミラーは使わない）
+        
+        Args:
+            issue_id: チケットID
+            
+        Returns:
+            チケット情報（取得できない場合はNone）
+        """
+        response = self._get(f"issues/{issue_id}.json", {"include": "journals"})
+        if response is not None and response.status_code == 200:
+            return response.json().get("issue")
+        return None
+
     def summarize_ticket_history(self, issue_id: int) -> Dict[str, Any]:
         """
         チケット履歴の要約
@@ -328,17 +738,20 @@ class RedmineAgent:
             チケット履歴の要約情報
         """
         # チケット情報の取得
-        response = requests.get(
-            f"{self.redmine_url}/issues/{issue_id}.json?include=journals",
-            headers=self.headers
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get issue details: {response.text}")
-            return {"error": f"チケット #{issue_id} の取得に失敗しました"}
+        issue = self.mirror.get_issue(issue_id, with_journals=True) if self._read_from_mirror() else None
+        
+        if issue is None:
+            response = self._get(f"issues/{issue_id}.json", {"include": "journals"})
             
-        data = response.json()
-        issue = data.get("issue", {})
+            if response is not None and response.status_code == 200:
+                issue = response.json().get("issue", {})
+            elif self._mirror_fallback(f"チケット #{issue_id} を取得できません"):
+                issue = self.mirror.get_issue(issue_id, with_journals=True)
+            
+            if not issue:
+                if response is not None:
+                    logger.error(f"Failed to get issue details: {response.text}")
+                return {"error": f"チケット #{issue_id} の取得に失敗しました"}
         
         # 作業時間記録の取得
         time_entries = self.get_time_entries(issue_id=issue_id)
@@ -382,13 +795,10 @@ class RedmineAgent:
             提案されるタスクのリスト
         """
         # チケットの詳細情報を取得
-        response = requests.get(
-            f"{self.redmine_url}/issues/{issue_id}.json?include=children,relations",
-            headers=self.headers
-        )
+        response = self._get(f"issues/{issue_id}.json", {"include": "children,relations"})
         
-        if response.status_code != 200:
-            logger.error(f"Failed to get issue details: {response.text}")
+        if response is None or response.status_code != 200:
+            logger.error(f"Failed to get issue details: {response.text if response is not None else 'connection error'}")
             return []
             
         data = response.json()
@@ -399,9 +809,9 @@ class RedmineAgent:
         if LLM_AVAILABLE:
             try:
                 # 動的に読み込みして循環参照を避ける
-                from .llm_helper import RedmineAssistant
+                from .llm_helper import get_assistant
                 logger.info(f"LLMによる次のタスク提案を生成します（チケット #{issue_id}）")
-                llm_assistant = RedmineAssistant()
+                llm_assistant = get_assistant()
                 suggestions = llm_assistant.suggest_next_actions(issue)
                 
                 # RedmineAssistantからの結果をフォーマット変換
@@ -610,16 +1020,14 @@ class RedmineAgent:
 
         payload = {"issue": issue_data}
         
-        response = requests.post(
-            f"{self.redmine_url}/issues.json",
-            headers=self.headers,
-            json=payload
-        )
+        response, error = self._send("POST", "issues.json", payload)
 
-        if response.status_code == 201:  # Created
+        if not error:  # Created
             created_issue = response.json().get("issue")
             logger.info(f"Issue #{created_issue.get('id') if created_issue else 'Unknown ID'} created successfully: {subject[:50]}...")
+            if self.mirror and created_issue:
+                self.mirror.refresh_issue(created_issue["id"])
             return created_issue
         else:
-            logger.error(f"Failed to create issue: {response.status_code} - {response.text}")
+            logger.error(f"Failed to create issue: {error}")
             return None
@@ -0,0 +1,268 @@
+"""
+Redmineチケット管理エージェント - 日次レポートの事前生成
+
+朝・夕方のレポートを送信時刻に全ユーザー分まとめて作るのではなく、
+チケットの変更（Webhook）やミラーの同期・LINEやAPIからの更新をきっかけに該当ユーザーのレポートだけを
+定期ジョブで少しずつ作り直し、版番号と入力のフィンガープリントを付けてSQLiteに保存します。
+送信時は保存済みのレポートが最新かどうかを確認して送るだけなので、
+送信時刻の負荷とRedmineの応答速度に左右されません。
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import datetime
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from .config import get_config
+from .core import RedmineAgent
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# レポートの保存先
+DEFAULT_DB_PATH = Path(__file__).parent.parent / "data" / "daily_digest.db"
+
+# レポートの種類
+KINDS = ("morning", "evening")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    digest_date TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rendered TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, kind)
+);
+"""
+
+
+def _fingerprint(date: str, items: Iterable[Any]) -> str:
+    """レポートの入力（日付・チケットの更新日時など）のハッシュ"""
+    payload = json.dumps([date, list(items)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class DailyDigestPipeline:
+    """ユーザーごとの朝・夕方のレポートを事前生成して保存"""
+
+    def __init__(self, redmine_agent: RedmineAgent, user_id_mapping: Dict[str, str],
+                 db_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            redmine_agent: Redmineエージェント
+            user_id_mapping: RedmineユーザーIDとLINEユーザーIDの対応
+            db_path: SQLiteファイルのパス
+        """
+        self.agent = redmine_agent
+        self.user_ids = [str(user_id) for user_id in user_id_mapping]
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        # 変更がなくてもこの分数を過ぎたレポートは送信時に作り直す
+        self.max_age = get_config("digest.max_age_minutes", 60) * 60
+        self.stats = {"hits": 0, "misses": 0, "rendered": 0, "unchanged": 0}
+
+        self._lock = threading.RLock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def mark_dirty(self, user_ids: Optional[Iterable[str]] = None, kinds: Iterable[str] = KINDS) -> None:
+        """
+        レポートを作り直し対象にする
+
+        Args:
+            user_ids: RedmineユーザーID（省略時は全ユーザー）
+            kinds: レポートの種類
+        """
+        user_ids = self.user_ids if user_ids is None else [str(user_id) for user_id in user_ids]
+        rows = [(user_id, kind) for user_id in user_ids if user_id in self.user_ids for kind in kinds]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE digests SET dirty = 1 WHERE user_id = ? AND kind = ?", rows)
+            self._conn.commit()
+
+    def on_issue_changed(self, issue_id: int, issue: Optional[Dict[str, Any]], events: List[Dict[str, Any]]) -> None:
+        """
+        チケットの変更をレポートに反映（RedmineWebhookProcessor.listeners に登録して使う）
+
+        Args:
+            issue_id: チケットID
+            issue: 最新のチケット
+            events: Webhookのイベントのリスト
+        """
+        user_ids = set()
+        assignee = (issue or {}).get("assigned_to") or (issue or {}).get("assignee")
+        if assignee and assignee.get("id") is not None:
+            user_ids.add(str(assignee["id"]))
+        # 担当者が変わった場合は元の担当者のレポートも作り直す
+        for event in events:
+            for detail in (event.get("journal") or {}).get("details") or []:
+                if (detail.get("prop_key") or detail.get("name")) == "assigned_to_id":
+                    user_ids.update(str(value) for value in (detail.get("old_value"), detail.get("value")) if value)
+
+        # 担当者が分からない場合（削除されたチケットなど）は全員分を作り直す
+        self.mark_dirty(user_ids or None)
+
+    def on_mirror_synced(self, result: Dict[str, Any]) -> None:
+        """
+        ミラーの同期結果をレポートに反映（変更があったチケットの担当者と作業時間の記録者だけを作り直し対象にする）
+
+        Args:
+            result: 同期結果（user_ids に影響するRedmineユーザーID）
+        """
+        user_ids = result.get("user_ids")
+        if user_ids:
+            self.mark_dirty(user_ids)
+
+    def _render(self, kind: str, user_ids: List[str]) -> Dict[str, Tuple[str, str]]:
+        """レポートを生成（ユーザーID → (フィンガープリント, レポート)）"""
+        today = datetime.date.today().isoformat()
+        rendered = {}
+        if kind == "morning":
+            tasks_by_user = self.agent.get_daily_tasks_for_users([int(user_id) for user_id in user_ids])
+            for user_id in user_ids:
+                tasks = tasks_by_user.get(int(user_id), [])
+                fingerprint = _fingerprint(today, ((task.get("id"), task.get("updated_on")) for task in tasks))
+                rendered[user_id] = (fingerprint, self.agent.format_morning_report(tasks))
+        else:
+            for user_id in user_ids:
+                time_entries = self.agent.get_time_entries(user_id=int(user_id), from_date=today, to_date=today)
+                completed = self.agent.get_completed_issues(today, user_id=int(user_id))
+                fingerprint = _fingerprint(today, [
+                    [(entry.get("id"), entry.get("hours"), entry.get("updated_on")) for entry in time_entries],
+                    [(issue.get("id"), issue.get("updated_on")) for issue in completed]
+                ])
+                rendered[user_id] = (fingerprint, self.agent.format_evening_report(completed, time_entries))
+        return rendered
+
+    def _store(self, kind: str, rendered: Dict[str, Tuple[str, str]]) -> None:
+        """生成したレポートを保存（内容が変わった場合のみ版番号を上げる）"""
+        today = datetime.date.today().isoformat()
+        now = time.time()
+        with self._lock:
+            for user_id, (fingerprint, text) in rendered.items():
+                row = self._conn.execute(
+                    "SELECT version, fingerprint FROM digests WHERE user_id = ? AND kind = ?", (user_id, kind)
+                ).fetchone()
+                if row and row["fingerprint"] == fingerprint:
+                    self._conn.execute(
+                        "UPDATE digests SET computed_at = ?, dirty = 0 WHERE user_id = ? AND kind = ?",
+                        (now, user_id, kind)
+                    )
+                    self.stats["unchanged"] += 1
+                    continue
+                self._conn.execute(
+                    "INSERT INTO digests (user_id, kind, digest_date, version, fingerprint, rendered, computed_at, dirty) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0) "
+                    "ON CONFLICT(user_id, kind) DO UPDATE SET digest_date = excluded.digest_date, "
+                    "version = excluded.version, fingerprint = excluded.fingerprint, "
+                    "rendered = excluded.rendered, computed_at = excluded.computed_at, dirty = 0",
+                    (user_id, kind, today, (row["version"] if row else 0) + 1, fingerprint, text, now)
+                )
+                self.stats["rendered"] += 1
+            self._conn.commit()
+
+    def _is_fresh(self, row: Optional[sqlite3.Row]) -> bool:
+        return (
+            row is not None
+            and not row["dirty"]
+            and row["digest_date"] == datetime.date.today().isoformat()
+            and time.time() - row["computed_at"] <= self.max_age
+        )
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        最新でないレポートを作り直す（定期ジョブから呼び出す）
+
+        Args:
+            force: すべてのレポートを作り直すかどうか
+
+        Returns:
+            種類ごとの作り直した件数
+        """
+        refreshed = {}
+        for kind in KINDS:
+            with self._lock:
+                rows = {
+                    row["user_id"]: row
+                    for row in self._conn.execute("SELECT * FROM digests WHERE kind = ?", (kind,)).fetchall()
+                }
+            # 送信時に作り直さずに済むよう、期限の半分を過ぎたものも作り直す
+            stale = [
+                user_id for user_id in self.user_ids
+                if force or not self._is_fresh(rows.get(user_id))
+                or time.time() - rows[user_id]["computed_at"] > self.max_age / 2
+            ]
+            if stale:
+                try:
+                    self._store(kind, self._render(kind, stale))
+                except Exception as e:
+                    logger.error(f"{kind}レポートの事前生成中にエラー: {str(e)}", exc_info=True)
+                    continue
+            refreshed[kind] = len(stale)
+        if any(refreshed.values()):
+            logger.info(f"日次レポートを事前生成しました: {refreshed}")
+        return refreshed
+
+    def get_report(self, user_id: str, kind: str) -> str:
+        """
+        送信するレポートを取得（最新でなければその場で作り直す）
+
+        Args:
+            user_id: RedmineユーザーID
+            kind: レポートの種類（morning / evening）
+
+        Returns:
+            レポート
+        """
+        user_id = str(user_id)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM digests WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()
+        if self._is_fresh(row):
+            self.stats["hits"] += 1
+            return row["rendered"]
+
+        self.stats["misses"] += 1
+        logger.info(f"ユーザー {user_id} の{kind}レポートが最新でないため作り直します")
+        fingerprint, text = self._render(kind, [user_id])[user_id]
+        if user_id in self.user_ids:
+            self._store(kind, {user_id: (fingerprint, text)})
+        return text
+
+    def status(self) -> Dict[str, Any]:
+        """
+        保存済みレポートの状態と送信時の統計を取得
+
+        Returns:
+            状態
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, kind, digest_date, version, fingerprint, computed_at, dirty FROM digests "
+                "ORDER BY user_id, kind"
+            ).fetchall()
+        digests = []
+        for row in rows:
+            digest = dict(row)
+            digest["fresh"] = self._is_fresh(row)
+            digest["dirty"] = bool(row["dirty"])
+            digest["computed_at"] = datetime.datetime.fromtimestamp(row["computed_at"]).isoformat()
+            digests.append(digest)
+        return {"digests": digests, **self.stats}
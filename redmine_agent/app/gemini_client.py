@@ -0,0 +1,452 @@
+"""
+Redmineチケット管理エージェント - Gemini APIクライアント
+
+複数のAPIキーごとにトークンバケットと直近のレート制限（429）を管理し、
+余裕の最も大きいキーにリクエストを割り当てます。
+リクエストはバックグラウンドのイベントループ上で並行に処理され、
+Retry-After と指数バックオフによる待機はスレッドをブロックしません。
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+import datetime
+import email.utils
+import concurrent.futures
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+
+import requests
+
+from .telemetry import span, Span
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+
+def parse_stream_chunk(line: str) -> str:
+    """
+    ストリーミング応答（SSE）の1行から生成テキストを取り出す
+
+    Args:
+        line: SSEの行（"data: {...}"）
+
+    Returns:
+        テキスト（データ行でない場合は空文字列）
+    """
+    if not line or not line.startswith("data:"):
+        return ""
+    try:
+        data = json.loads(line[5:])
+    except ValueError:
+        return ""
+    candidates = data.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+class KeyState:
+    """APIキーごとのトークンバケットとレート制限の状態"""
+
+    def __init__(self, index: int, api_key: str, requests_per_minute: float):
+        """
+        初期化
+
+        Args:
+            index: キーの番号（ログ表示用）
+            api_key: GeminiのAPIキー
+            requests_per_minute: このキーで1分間に送信するリクエスト数の上限
+        """
+        self.index = index
+        self.api_key = api_key
+        self.capacity = max(1.0, float(requests_per_minute))
+        self.refill_rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.cooldown_until = 0.0
+        self.recent_rate_limits: deque = deque()
+        self.in_flight = 0
+        self.stats = {"requests": 0, "successes": 0, "rate_limited": 0, "auth_errors": 0, "errors": 0}
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+        while self.recent_rate_limits and now - self.recent_rate_limits[0] > 300:
+            self.recent_rate_limits.popleft()
+
+    def available(self, now: float) -> bool:
+        """現在送信可能かどうか"""
+        self._refill(now)
+        return now >= self.cooldown_until and self.tokens >= 1
+
+    def headroom(self) -> float:
+        """送信の余裕（残りトークンから実行中と直近のレート制限の分を差し引いた値）"""
+        return self.tokens - self.in_flight - 2 * len(self.recent_rate_limits)
+
+    def wait_time(self, now: float) -> float:
+        """次に送信可能になるまでの秒数"""
+        self._refill(now)
+        refill_wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.refill_rate
+        return max(self.cooldown_until - now, refill_wait, 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "index": self.index,
+            "key_suffix": self.api_key[-4:],
+            "tokens": round(min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate), 2),
+            "in_flight": self.in_flight,
+            "cooldown_seconds": round(max(0.0, self.cooldown_until - now), 1),
+            "recent_rate_limits": len(self.recent_rate_limits),
+            **self.stats
+        }
+
+
+def parse_retry_after(headers: Dict[str, str], body: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    レスポンスから再試行までの待機秒数を取得
+
+    Retry-After ヘッダー（秒数またはHTTP日付）と、
+    Gemini APIのエラー詳細（RetryInfo の retryDelay）に対応します。
+
+    Args:
+        headers: レスポンスヘッダー
+        body: レスポンスのJSON（解析できない場合はNone）
+
+    Returns:
+        待機秒数（指定がない場合はNone）
+    """
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(value)
+                return max(0.0, (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+
+    try:
+        for detail in body.get("error", {}).get("details", []):
+            match = re.match(r'^(\d+(?:\.\d+)?)s$', str(detail.get("retryDelay", "")))
+            if match:
+                return float(match.group(1))
+    except AttributeError:
+        pass
+    return None
+
+
+class AsyncGeminiClient:
+    """複数のAPIキーを使い分ける非同期Gemini APIクライアント"""
+
+    def __init__(self, api_keys: List[str], base_url: str, model: str,
+                 requests_per_minute: float = 15, max_retries: int = 3,
+                 retry_delay: float = 2.0, max_delay: float = 60.0,
+                 max_wait: float = 60.0, timeout: float = 30.0):
+        """
+        初期化
+
+        Args:
+            api_keys: GeminiのAPIキーのリスト
+            base_url: APIエンドポイント
+            model: モデル名
+            requests_per_minute: キーごとの1分間あたりのリクエスト数上限
+            max_retries: レート制限以外のエラーでの最大試行回数
+            retry_delay: 指数バックオフの初期待機秒数
+            max_delay: 指数バックオフの最大待機秒数
+            max_wait: 1リクエストあたりの待機時間の上限（秒）
+            timeout: HTTPリクエストのタイムアウト（秒）
+        """
+        self.keys = [KeyState(i, key, requests_per_minute) for i, key in enumerate(api_keys)]
+        self.base_url = base_url
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # HTTP送信用のスレッド（キー数に応じて並列度を増やす）
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(4, 4 * len(self.keys)), thread_name_prefix="gemini-http"
+        )
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """バックグラウンドのイベントループを起動"""
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _select_key(self) -> Tuple[Optional[KeyState], float]:
+        """余裕の最も大きいキーを選択（選べない場合は次に送信可能になるまでの秒数を返す）"""
+        now = time.monotonic()
+        available = [key for key in self.keys if key.available(now)]
+        if not available:
+            return None, min(key.wait_time(now) for key in self.keys)
+        best = max(available, key=lambda key: key.headroom())
+        best.tokens -= 1
+        best.in_flight += 1
+        return best, 0.0
+
+    async def _acquire_key(self, deadline: float, delay: float = 0.0) -> Optional[KeyState]:
+        if delay:
+            await asyncio.sleep(delay)
+        while True:
+            key, wait = self._select_key()
+            if key:
+                return key
+            if time.monotonic() + wait > deadline:
+                return None
+            await asyncio.sleep(wait + 0.01)
+
+    def _post(self, key: KeyState, prompt: str, temperature: float) -> requests.Response:
+        return requests.post(
+            f"{self.base_url}/{self.model}:generateContent?key={key.api_key}",
+            json={
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": {"temperature": temperature}
+            },
+            timeout=self.timeout
+        )
+
+    def _record_error_response(self, key: KeyState, response: requests.Response, attempt: int) -> Tuple[int, float]:
+        """エラー応答をキーの状態に反映し、(次の試行回数, 再試行までの待機秒数) を返す"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+
+        if response.status_code == 429:
+            # このキーだけを待機させ、他のキーで即座に再試行
+            now = time.monotonic()
+            key.recent_rate_limits.append(now)
+            key.stats["rate_limited"] += 1
+            retry_after = parse_retry_after(response.headers, body)
+            if retry_after is None:
+                retry_after = self._backoff(len(key.recent_rate_limits))
+            key.cooldown_until = max(key.cooldown_until, now + retry_after)
+            logger.warning(f"レート制限 (キー {key.index})。{retry_after:.1f}秒間このキーを休止します")
+            return attempt, 0.0
+        if response.status_code in [401, 403]:
+            key.stats["auth_errors"] += 1
+            key.cooldown_until = time.monotonic() + 600
+            logger.error(f"認証エラー ({response.status_code}, キー {key.index})。10分間このキーを休止します")
+            return attempt + 1, 0.0
+        logger.error(f"APIエラー: {response.status_code} - {response.text[:200]}")
+        key.stats["errors"] += 1
+        return attempt + 1, self._backoff(attempt + 1)
+
+    @staticmethod
+    def _release(key: KeyState) -> None:
+        key.in_flight -= 1
+
+    @staticmethod
+    def _count(key: KeyState, name: str) -> None:
+        key.stats[name] += 1
+
+    def _on_loop(self, func, *args):
+        """
+        キーの状態を更新する処理をバックグラウンドのイベントループ上で実行して結果を取得
+
+        キーの状態（トークン・休止時間・統計）はイベントループ上でのみ更新し、
+        ほかのスレッドから呼び出される stream() と非同期のリクエストが同時に変更しないようにする
+        """
+        async def call():
+            return func(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self._ensure_loop()).result()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.retry_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def generate(self, prompt: str, temperature: float = 0.7) -> Optional[Dict[str, Any]]:
+        """
+        Gemini APIにリクエストを送信（クライアントのイベントループ上で実行すること）
+
+        Args:
+            prompt: プロンプト
+            temperature: 生成温度
+
+        Returns:
+            Gemini APIのレスポンス（失敗時はNone）
+        """
+        if not self.keys:
+            return None
+        with span("gemini.generate") as request_span:
+            response = await self._generate(prompt, temperature, request_span)
+            if response is None:
+                request_span.set(status="failed")
+            return response
+
+    async def _generate(self, prompt: str, temperature: float, request_span: Span) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+        sent = 0
+
+        while attempt < self.max_retries:
+            key = await self._acquire_key(deadline)
+            if not key:
+                logger.error(f"利用可能なAPIキーが{self.max_wait:.0f}秒以内に見つかりませんでした")
+                return None
+
+            key.stats["requests"] += 1
+            request_span.set(key=key.index, retries=sent)
+            sent += 1
+            try:
+                logger.info(f"Gemini APIリクエスト実行 (キー {key.index}, 試行 {attempt+1}/{self.max_retries})")
+                with span("gemini.attempt", key=key.index) as attempt_span:
+                    response = await loop.run_in_executor(self._executor, self._post, key, prompt, temperature)
+                    attempt_span.set(status=response.status_code)
+            except Exception as e:
+                logger.error(f"APIリクエスト中に例外発生 (キー {key.index}): {str(e)}")
+                key.stats["errors"] += 1
+                attempt += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            finally:
+                key.in_flight -= 1
+
+            if response.status_code == 200:
+                key.stats["successes"] += 1
+                return response.json()
+
+            attempt, delay = self._record_error_response(key, response, attempt)
+            if delay:
+                await asyncio.sleep(delay)
+
+        logger.error(f"Gemini APIリクエストが{self.max_retries}回の再試行後に失敗")
+        return None
+
+    def stream(self, prompt: str, temperature: float = 0.7) -> Iterator[str]:
+        """
+        Gemini APIのストリーミング応答（streamGenerateContent）を受信（呼び出し元のスレッドで実行）
+
+        テキストを受信する前に失敗した場合は、ほかのキーで再試行します。
+        キーの選択・再試行までの待機・キーの状態の更新はバックグラウンドのイベントループ上で行います。
+        途中で切断された場合は、そこまでのテキストで終了します。
+
+        Args:
+            prompt: プロンプト
+            temperature: 生成温度
+
+        Yields:
+            生成されたテキストの断片
+        """
+        if not self.keys:
+            return
+        loop = self._ensure_loop()
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+        sent = 0
+
+        with span("gemini.stream") as stream_span:
+            delay = 0.0
+            while attempt < self.max_retries:
+                # 再試行までの待機もキーの選択と同じくイベントループ上で行う
+                key = asyncio.run_coroutine_threadsafe(self._acquire_key(deadline, delay), loop).result()
+                if not key:
+                    logger.error(f"利用可能なAPIキーが{self.max_wait:.0f}秒以内に見つかりませんでした")
+                    stream_span.set(status="failed")
+                    return
+
+                loop.call_soon_threadsafe(self._count, key, "requests")
+                stream_span.set(key=key.index, retries=sent)
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    logger.info(f"Gemini APIストリーミングリクエスト実行 (キー {key.index}, 試行 {attempt+1}/{self.max_retries})")
+                    response = requests.post(
+                        f"{self.base_url}/{self.model}:streamGenerateContent?alt=sse&key={key.api_key}",
+                        json={
+                            "contents": [{"parts": [{"text": prompt}]}],
+                            "generationConfig": {"temperature": temperature}
+                        },
+                        stream=True,
+                        timeout=self.timeout
+                    )
+                except Exception as e:
+                    logger.error(f"APIリクエスト中に例外発生 (キー {key.index}): {str(e)}")
+                    loop.call_soon_threadsafe(self._count, key, "errors")
+                    loop.call_soon_threadsafe(self._release, key)
+                    attempt += 1
+                    delay = self._backoff(attempt)
+                    continue
+
+                with response:
+                    try:
+                        if response.status_code != 200:
+                            # エラー応答の本文はこのスレッドで受信してから、キーの状態への反映をイベントループに渡す
+                            response.content
+                            attempt, delay = self._on_loop(self._record_error_response, key, response, attempt)
+                            continue
+
+                        loop.call_soon_threadsafe(self._count, key, "successes")
+                        received = False
+                        for line in response.iter_lines(decode_unicode=True):
+                            text = parse_stream_chunk(line)
+                            if not text:
+                                continue
+                            if not received:
+                                received = True
+                                stream_span.set(first_chunk_ms=round((time.perf_counter() - started) * 1000, 1))
+                            yield text
+                        return
+                    except requests.RequestException as e:
+                        logger.error(f"ストリーミング応答の受信中に切断されました (キー {key.index}): {str(e)}")
+                        stream_span.set(status="interrupted")
+                        return
+                    finally:
+                        loop.call_soon_threadsafe(self._release, key)
+
+            logger.error(f"Gemini APIストリーミングリクエストが{self.max_retries}回の再試行後に失敗")
+            stream_span.set(status="failed")
+
+    def submit(self, prompt: str, temperature: float = 0.7) -> "concurrent.futures.Future":
+        """
+        リクエストをバックグラウンドのイベントループに投入
+
+        Args:
+            prompt: プロンプト
+            temperature: 生成温度
+
+        Returns:
+            レスポンスを返すFuture（他のイベントループからは asyncio.wrap_future で待機可能）
+        """
+        return asyncio.run_coroutine_threadsafe(self.generate(prompt, temperature), self._ensure_loop())
+
+    def request(self, prompt: str, temperature: float = 0.7) -> Optional[Dict[str, Any]]:
+        """
+        リクエストを送信して結果を待つ（同期呼び出し用）
+
+        Args:
+            prompt: プロンプト
+            temperature: 生成温度
+
+        Returns:
+            Gemini APIのレスポンス（失敗時はNone）
+        """
+        return self.submit(prompt, temperature).result()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """キーごとの状態と統計情報を取得"""
+        return [key.to_dict() for key in self.keys]
+
+    def close(self) -> None:
+        """イベントループとスレッドを停止"""
+        with self._start_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+        self._executor.shutdown(wait=False)
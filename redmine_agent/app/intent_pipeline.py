@@ -0,0 +1,437 @@
+"""
+Redmineチケット管理エージェント - 意図判定パイプライン
+
+LINEメッセージの意図を段階的に判定します。
+
+1. キーワードオートマトン（nlp_helperのキーワードをAho-Corasickで一括照合し、
+   チケット番号・時間などの抽出器と組み合わせる）
+2. ローカル分類器（過去のLLM判定ログから学習したナイーブベイズ）
+3. LLM（ローカルの確信度が低い場合のみ）
+
+判定結果は RedmineAssistant.analyze_natural_language_command と同じ形式の辞書です。
+"""
+
+import re
+import json
+import math
+import time
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from . import nlp_helper
+from .config import get_config
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# LLMの判定結果を記録するファイル（ローカル分類器の学習データ）
+DEFAULT_DECISION_LOG = Path(__file__).parent.parent / "data" / "intent_log.jsonl"
+
+# パラメータが必須のコマンドタイプ
+REQUIRED_PARAMS = {
+    "log_time": ["ticket_id", "hours"],
+    "update_status": ["ticket_id", "status_id"],
+    "update_progress": ["ticket_id", "done_ratio"],
+    "summary": ["ticket_id"],
+}
+
+
+class KeywordAutomaton:
+    """Aho-Corasick法による複数キーワードの一括照合"""
+
+    def __init__(self, keywords: Dict[str, str]):
+        """
+        初期化
+
+        Args:
+            keywords: キーワードとラベルの対応
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+
+        for keyword, label in keywords.items():
+            node = 0
+            for char in keyword.lower():
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].append((keyword, label))
+
+        # 失敗遷移を幅優先で構築
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """
+        テキスト中に出現するキーワードをラベルごとに取得
+
+        Args:
+            text: 対象テキスト
+
+        Returns:
+            ラベルと出現したキーワードのリストの対応
+        """
+        matches: Dict[str, List[str]] = defaultdict(list)
+        node = 0
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for keyword, label in self._output[node]:
+                matches[label].append(keyword)
+        return matches
+
+
+# nlp_helper のキーワードを1つのオートマトンにまとめる
+_KEYWORD_LABELS = [
+    (nlp_helper.TODAY_KEYWORDS, "today"),
+    (nlp_helper.UPCOMING_KEYWORDS, "upcoming"),
+    (nlp_helper.LOG_KEYWORDS, "log"),
+    (nlp_helper.STATUS_KEYWORDS, "status"),
+    (nlp_helper.PROGRESS_KEYWORDS, "progress"),
+    (nlp_helper.SUMMARY_KEYWORDS, "summary"),
+    (nlp_helper.REPORT_KEYWORDS, "report"),
+    (nlp_helper.WEEKLY_KEYWORDS, "weekly"),
+    (nlp_helper.OPTIMIZE_KEYWORDS, "optimize"),
+    (nlp_helper.HELP_KEYWORDS, "help"),
+]
+KEYWORD_AUTOMATON = KeywordAutomaton({
+    keyword: label for keywords, label in _KEYWORD_LABELS for keyword in keywords
+})
+
+# 単独では意図を決めにくい（メモ文にも頻出する）キーワード
+_WEAK_KEYWORDS = {"予定", "スケジュール", "今後", "作業", "時間", "まとめ", "統合", "状態", "詳細"}
+
+# メッセージ先頭のチケット番号（「#12 作業 2時間」の「#12 」など）
+_LEADING_TICKET = re.compile(r'^\s*(?:チケット\s*#?\s*\d+|#\s*\d+)?\s*(?:番)?\s*[のをにはで、,:：]?\s*')
+
+
+def leading_labels(text: str) -> set:
+    """
+    メッセージの先頭（先頭のチケット番号の後）にあるキーワードのラベルを取得
+
+    キーワードがメモ文の途中に含まれているだけの場合はコマンドとみなさないために使う
+
+    Args:
+        text: 小文字にしたメッセージテキスト
+
+    Returns:
+        先頭のキーワードのラベルの集合
+    """
+    rest = text[_LEADING_TICKET.match(text).end():]
+    return {label for keywords, label in _KEYWORD_LABELS if any(rest.startswith(k.lower()) for k in keywords)}
+
+
+def classify_by_keywords(text: str) -> Dict[str, Any]:
+    """
+    キーワードと抽出器による意図判定（第1段）
+
+    キーワードで始まるメッセージだけを判定し、それ以外は後段（分類器・LLM）に任せる。
+    Redmineを更新するコマンドは、チケット番号が「#12」「チケット12」の形で明示され、
+    必要なパラメータがすべて抽出できた場合だけ返す（それ以外は時刻や日付を番号と取り違えないよう後段に任せる）
+
+    Args:
+        text: メッセージテキスト
+
+    Returns:
+        コマンド情報（analyze_natural_language_commandと同じ形式）
+    """
+    lowered = text.lower().strip()
+    matches = KEYWORD_AUTOMATON.find(lowered)
+    leading = leading_labels(lowered)
+    if not leading:
+        return {"command_type": "unknown", "confidence": 0.0}
+    ticket_id = nlp_helper.extract_ticket_id(lowered)
+    explicit_ticket_id = nlp_helper.extract_explicit_ticket_id(lowered)
+
+    def strength(label: str) -> float:
+        return 0.95 if any(k not in _WEAK_KEYWORDS for k in matches[label]) else 0.6
+
+    if "today" in leading:
+        return {"command_type": "task_list", "confidence": 0.95}
+
+    if "help" in leading and len(lowered) <= 20:
+        return {"command_type": "help", "confidence": 0.9}
+
+    if "log" in leading:
+        hours = nlp_helper.extract_hours(lowered)
+        if explicit_ticket_id and hours:
+            result = {"command_type": "log_time", "ticket_id": int(explicit_ticket_id),
+                      "hours": float(hours), "confidence": 0.9}
+            comment = nlp_helper.extract_comment(lowered)
+            if comment:
+                result["comment"] = comment
+            return result
+
+    if "progress" in leading and explicit_ticket_id:
+        progress = nlp_helper.extract_progress(lowered)
+        if progress:
+            result = {"command_type": "update_progress", "ticket_id": int(explicit_ticket_id),
+                      "done_ratio": int(progress), "confidence": 0.9}
+            comment = nlp_helper.extract_comment(lowered, nlp_helper.COMMENT_PATTERNS[:1])
+            if comment:
+                result["comment"] = comment
+            return result
+
+    if "status" in leading and explicit_ticket_id:
+        status_id = nlp_helper.extract_status_id(lowered)
+        if status_id:
+            return {"command_type": "update_status", "ticket_id": int(explicit_ticket_id),
+                    "status_id": int(status_id), "confidence": 0.9 * strength("status")}
+
+    if "summary" in leading and ticket_id:
+        return {"command_type": "summary", "ticket_id": int(ticket_id),
+                "confidence": 0.9 * strength("summary")}
+
+    if leading & {"report", "weekly"} and "report" in matches:
+        return {"command_type": "report", "report_type": "week" if "weekly" in matches else "today",
+                "confidence": 0.85}
+
+    if "upcoming" in leading:
+        result = {"command_type": "task_list", "confidence": strength("upcoming")}
+        days_match = re.search(r'(\d+)\s*(日|days)', lowered)
+        if days_match:
+            result["days"] = int(days_match.group(1))
+            result["confidence"] = 0.9
+        return result
+
+    if "optimize" in leading:
+        return {"command_type": "optimize", "confidence": 0.8 * strength("optimize")}
+
+    return {"command_type": "unknown", "confidence": 0.0}
+
+
+class NaiveBayesIntentClassifier:
+    """文字バイグラムによる多項ナイーブベイズ分類器（第2段）"""
+
+    def __init__(self):
+        self.class_counts: Counter = Counter()
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.class_totals: Counter = Counter()
+        self.vocabulary: set = set()
+        self.samples = 0
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        text = re.sub(r'\d+', '0', text.lower())
+        return [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+
+    def train(self, samples: List[Tuple[str, str]]) -> None:
+        """
+        学習データから分類器を構築
+
+        Args:
+            samples: (テキスト, コマンドタイプ)のリスト
+        """
+        self.__init__()
+        for text, label in samples:
+            tokens = self._tokens(text)
+            self.class_counts[label] += 1
+            self.token_counts[label].update(tokens)
+            self.class_totals[label] += len(tokens)
+            self.vocabulary.update(tokens)
+        self.samples = len(samples)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        コマンドタイプを予測
+
+        Args:
+            text: メッセージテキスト
+
+        Returns:
+            (予測したコマンドタイプ, 事後確率)
+        """
+        if not self.samples:
+            return None, 0.0
+        tokens = self._tokens(text)
+        vocab_size = len(self.vocabulary) + 1
+        scores = {}
+        for label, count in self.class_counts.items():
+            score = math.log(count / self.samples)
+            denominator = self.class_totals[label] + vocab_size
+            counts = self.token_counts[label]
+            for token in tokens:
+                score += math.log((counts[token] + 1) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+
+class IntentPipeline:
+    """キーワード → ローカル分類器 → LLM の段階的な意図判定"""
+
+    TIERS = ["keyword", "classifier", "llm"]
+
+    def __init__(self, llm_analyzer: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 decision_log: Optional[Path] = None):
+        """
+        初期化
+
+        Args:
+            llm_analyzer: LLMによる判定関数（Noneの場合はLLM段を使わない）
+            decision_log: LLM判定結果の記録ファイル
+        """
+        self.llm_analyzer = llm_analyzer
+        self.decision_log = Path(decision_log) if decision_log else DEFAULT_DECISION_LOG
+        self.keyword_threshold = get_config("nlp.keyword_confidence_threshold", 0.85)
+        self.classifier_threshold = get_config("nlp.classifier_confidence_threshold", 0.9)
+        self.classifier_min_samples = get_config("nlp.classifier_min_samples", 100)
+        self.retrain_interval = get_config("nlp.classifier_retrain_interval", 50)
+
+        self.classifier: Optional[NaiveBayesIntentClassifier] = None
+        self._new_samples = 0
+        self._lock = threading.Lock()
+        self.stats = {tier: {"calls": 0, "hits": 0, "total_ms": 0.0} for tier in self.TIERS}
+
+        self.train_classifier()
+
+    def _load_samples(self) -> List[Tuple[str, str]]:
+        """LLM判定ログから学習データを読み込む"""
+        samples = []
+        if not self.decision_log.exists():
+            return samples
+        try:
+            with open(self.decision_log, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        samples.append((record["text"], record["command_type"]))
+                    except (ValueError, KeyError):
+                        continue
+        except Exception as e:
+            logger.error(f"意図判定ログの読み込み中にエラー: {str(e)}")
+        return samples
+
+    def train_classifier(self) -> bool:
+        """
+        LLM判定ログからローカル分類器を学習
+
+        Returns:
+            分類器が利用可能になったかどうか
+        """
+        samples = self._load_samples()
+        if len(samples) < self.classifier_min_samples:
+            logger.info(f"ローカル意図分類器の学習データが不足しています ({len(samples)}/{self.classifier_min_samples})")
+            return False
+        classifier = NaiveBayesIntentClassifier()
+        classifier.train(samples)
+        with self._lock:
+            self.classifier = classifier
+            self._new_samples = 0
+        logger.info(f"ローカル意図分類器を学習しました ({len(samples)}件)")
+        return True
+
+    def _record_decision(self, text: str, command_data: Dict[str, Any]) -> None:
+        """信頼度の高いLLM判定を学習データとして記録"""
+        if command_data.get("confidence", 0) < 0.7 or "error" in command_data:
+            return
+        try:
+            self.decision_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.decision_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "text": text,
+                    "command_type": command_data.get("command_type", "unknown"),
+                    "confidence": command_data.get("confidence")
+                }, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.error(f"意図判定ログの記録中にエラー: {str(e)}")
+            return
+
+        with self._lock:
+            self._new_samples += 1
+            retrain = self._new_samples >= self.retrain_interval
+        if retrain:
+            self.train_classifier()
+
+    def _classify_locally(self, text: str) -> Dict[str, Any]:
+        """ローカル分類器で判定し、必要なパラメータを抽出器で補う"""
+        classifier = self.classifier
+        if not classifier:
+            return {"command_type": "unknown", "confidence": 0.0}
+        command_type, probability = classifier.predict(text)
+        result = {"command_type": command_type, "confidence": probability}
+
+        keyword_result = classify_by_keywords(text)
+        for key in ("ticket_id", "hours", "status_id", "done_ratio", "comment", "report_type", "days"):
+            if key in keyword_result:
+                result[key] = keyword_result[key]
+        if any(param not in result for param in REQUIRED_PARAMS.get(command_type, [])):
+            result["confidence"] = 0.0
+        return result
+
+    def _timed(self, tier: str, func: Callable[[], Dict[str, Any]], threshold: float) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        result = func()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self.stats[tier]
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            hit = result.get("confidence", 0) >= threshold and result.get("command_type") != "unknown"
+            if hit:
+                stats["hits"] += 1
+        return result if hit else None
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """
+        メッセージの意図を判定
+
+        Args:
+            text: メッセージテキスト
+
+        Returns:
+            コマンド情報（判定した段を "tier" に含む）
+        """
+        result = self._timed("keyword", lambda: classify_by_keywords(text), self.keyword_threshold)
+        if result:
+            result["tier"] = "keyword"
+            return result
+
+        result = self._timed("classifier", lambda: self._classify_locally(text), self.classifier_threshold)
+        if result:
+            result["tier"] = "classifier"
+            return result
+
+        if not self.llm_analyzer:
+            return {"command_type": "unknown", "confidence": 0.0, "tier": "none"}
+
+        result = self._timed("llm", lambda: self.llm_analyzer(text), 0.0) or {"command_type": "unknown", "confidence": 0.0}
+        self._record_decision(text, result)
+        result["tier"] = "llm"
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """段ごとの判定率と平均処理時間を取得"""
+        with self._lock:
+            total = self.stats["keyword"]["calls"]
+            tiers = {}
+            for tier, stats in self.stats.items():
+                tiers[tier] = {
+                    "calls": stats["calls"],
+                    "hits": stats["hits"],
+                    "hit_rate": round(stats["hits"] / total, 3) if total else 0.0,
+                    "avg_latency_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0
+                }
+            return {
+                "messages": total,
+                "local_rate": round((self.stats["keyword"]["hits"] + self.stats["classifier"]["hits"]) / total, 3) if total else 0.0,
+                "classifier_samples": self.classifier.samples if self.classifier else 0,
+                "tiers": tiers
+            }
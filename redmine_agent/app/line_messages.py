@@ -0,0 +1,118 @@
+"""
+Redmineチケット管理エージェント - LINEメッセージの分割
+
+LINEの1メッセージあたりの文字数上限に合わせて長いテキストを分割し、
+LLMのストリーミング応答を文の区切りでLINEメッセージ単位にまとめます。
+"""
+
+import logging
+from typing import Iterable, Iterator, List, Optional
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# LINEのテキストメッセージの文字数上限
+LINE_TEXT_LIMIT = 5000
+
+# 文の区切りとみなす文字
+SENTENCE_ENDS = "。！？!?\n"
+
+# 上限を超えて切り詰めた場合の末尾
+TRUNCATED_SUFFIX = "\n…（以下省略）"
+
+
+def find_sentence_cut(text: str, end: int, minimum: int = 1) -> Optional[int]:
+    """
+    text[:end] の中で最後の文の区切りの直後の位置を探す
+
+    Args:
+        text: 対象テキスト
+        end: 探索範囲の終端
+        minimum: 区切り位置の最小値（これより前の区切りは使わない）
+
+    Returns:
+        区切り位置（見つからない場合はNone）
+    """
+    for index in range(min(end, len(text)) - 1, max(0, minimum - 1) - 1, -1):
+        if text[index] in SENTENCE_ENDS:
+            return index + 1
+    return None
+
+
+def split_message(text: str, limit: int = LINE_TEXT_LIMIT, max_messages: Optional[int] = None) -> List[str]:
+    """
+    長いテキストを文の区切りで上限以下のメッセージに分割
+
+    Args:
+        text: 対象テキスト
+        limit: 1メッセージの文字数上限
+        max_messages: 最大メッセージ数（超える場合は最後のメッセージを切り詰める）
+
+    Returns:
+        メッセージのリスト
+    """
+    messages = []
+    rest = text
+    while len(rest) > limit:
+        if max_messages and len(messages) == max_messages - 1:
+            break
+        cut = find_sentence_cut(rest, limit, minimum=limit // 2) or limit
+        messages.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip("\n")
+    if len(rest) > limit:
+        rest = rest[:limit - len(TRUNCATED_SUFFIX)] + TRUNCATED_SUFFIX
+    if rest.strip():
+        messages.append(rest.rstrip())
+    return messages
+
+
+def iter_stream_messages(chunks: Iterable[str], first_chars: int = 80, chunk_chars: int = 1000,
+                         max_messages: int = 5, limit: int = LINE_TEXT_LIMIT) -> Iterator[str]:
+    """
+    ストリーミング応答の断片を文の区切りでLINEメッセージにまとめる
+
+    最初のメッセージは first_chars 文字を超えて文が区切れた時点で、
+    以降は chunk_chars 文字ごとに返します。max_messages 件目には残りをすべてまとめ、
+    上限を超える場合はそれ以上の受信をやめて切り詰めます。
+
+    Args:
+        chunks: テキストの断片（LLMのストリーミング応答）
+        first_chars: 最初のメッセージを返すまでの最小文字数
+        chunk_chars: 2件目以降のメッセージの目安の文字数
+        max_messages: 最大メッセージ数
+        limit: 1メッセージの文字数上限
+
+    Yields:
+        メッセージ
+    """
+    buffer = ""
+    sent = 0
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            buffer += chunk
+            target = first_chars if sent == 0 else chunk_chars
+            while sent < max_messages - 1 and len(buffer) >= target:
+                cut = find_sentence_cut(buffer, min(len(buffer), limit), minimum=target // 2)
+                if cut is None:
+                    if len(buffer) < limit:
+                        break
+                    cut = limit
+                message = buffer[:cut].strip()
+                buffer = buffer[cut:]
+                if message:
+                    yield message
+                    sent += 1
+                target = chunk_chars
+            if sent >= max_messages - 1 and len(buffer) > limit:
+                logger.info(f"応答がLINEメッセージ{max_messages}件の上限を超えたため、受信を打ち切ります")
+                break
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+    if len(buffer) > limit:
+        buffer = buffer[:limit - len(TRUNCATED_SUFFIX)] + TRUNCATED_SUFFIX
+    if buffer.strip():
+        yield buffer.strip()
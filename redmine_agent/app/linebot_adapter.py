@@ -9,12 +9,20 @@ import os
 import re
 import json
 import logging
+import time
 import datetime
 import requests
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterable
 
 from .core import RedmineAgent
 from .nlp_helper import extract_command_intent
+from .intent_pipeline import IntentPipeline
+from .priority_scorer import get_priority_scorer
+from .config import get_config, update_user_preference, delete_user_preference, get_user_preferences
+from .redmine_webhook import WATCH_KEY_PREFIX, watch_key
+from .telemetry import traced, span
+from .line_messages import split_message, iter_stream_messages
+from .prompt_compactor import render_issue_table, truncate_to_budget, OPTIMIZE_COLUMNS
 import importlib.util
 
 # LLM利用可能フラグをチェック
@@ -37,17 +45,22 @@ class LineBotAdapter:
         """
         self.line_token = line_token
         self.agent = redmine_agent
-        self.llm_assistant = None
+        self._llm_enabled = False
         
         # LLM機能が利用可能であればアシスタントを初期化
         if LLM_READY:
             try:
                 # 動的にインポート
-                from .llm_helper import RedmineAssistant
-                self.llm_assistant = RedmineAssistant()
+                from .llm_helper import get_assistant
+                get_assistant()
+                self._llm_enabled = True
                 logger.info("LLMアシスタントを初期化しました")
             except Exception as e:
                 logger.error(f"LLMアシスタント初期化中にエラーが発生しました: {str(e)}")
+        
+        self.intent_pipeline = IntentPipeline(
+            llm_analyzer=self._analyze_with_llm if self._llm_enabled else None
+        )
                 
         self.commands = {
             "today": self._handle_today_command,
@@ -55,12 +68,16 @@ class LineBotAdapter:
             "log": self._handle_log_command,
             "status": self._handle_status_command,
             "update": self._handle_update_command,
+            "bulk": self._handle_bulk_command,
             "summary": self._handle_summary_command,
+            "watch": self._handle_watch_command,
+            "unwatch": self._handle_unwatch_command,
             "report": self._handle_report_command,
             "optimize": self._handle_optimize_command,
             "mode": self._handle_mode_command,
             "help": self._handle_help_command,
         }
+    @traced("line.handle_message")
     def handle_message(self, message_text: str, user_id: str) -> str:
         """
         メッセージを処理
@@ -79,7 +96,7 @@ class LineBotAdapter:
                 command_char = message_text[0]
                 
                 content_after_prefix = message_text[prefix_length:].strip()
-                parts = content_after_prefix.split(' ', 1)
+                parts = content_after_prefix.split(None, 1)
                 command_name = parts[0].lower()
                 args = parts[1] if len(parts) > 1 else ""
 
@@ -98,55 +115,26 @@ class LineBotAdapter:
             elif message_text == "開発モードにして" or message_text == "開発にしたい":
                 return self._handle_mode_command("dev", user_id)
                 
-            # LLMによる自然言語解析を試行
-            if self.llm_assistant:
-                try:
-                    logger.info("LLMによるメッセージ解析を実行します")
-                    command_data = self.llm_assistant.analyze_natural_language_command(message_text)
-                    confidence = command_data.get("confidence", 0)
-                    command_type = command_data.get("command_type", "unknown")
-                    
-                    # 高信頼度で特定のコマンドタイプ（"comment"以外）と判断された場合
-                    if confidence >= 0.7 and command_type != "unknown" and command_type != "comment":
-                        logger.info(f"LLMがコマンド '{command_type}' を検出しました (信頼度: {confidence:.2f})")
-                        if command_type == "task_list":
-                            return self._handle_today_command("", user_id)
-                        elif command_type == "log_time":
-                            ticket_id = command_data.get("ticket_id")
-                            hours = command_data.get("hours")
-                            comment = command_data.get("comment", "")
-                            if ticket_id and hours:
-                                params = f"{ticket_id} {hours} {comment}"
-                                return self._handle_log_command(params, user_id)
-                            else:
-                                logger.warning(f"LLM parsed log_time but missing ticket_id or hours: {command_data}")
-                                # Fall through to ticket creation or a more specific error
-                        elif command_type == "update_status":
-                            ticket_id = command_data.get("ticket_id")
-                            status_id = command_data.get("status_id") # Ensure LLM returns this
-                            if ticket_id and status_id:
-                                params = f"{ticket_id} {status_id}"
-                                return self._handle_status_command(params, user_id)
-                            else:
-                                logger.warning(f"LLM parsed update_status but missing ticket_id or status_id: {command_data}")
-                                # Fall through to ticket creation
-                        elif command_type == "search":
-                            query = command_data.get("search_query", "")
-                            return f"「{query}」による検索機能は現在開発中です。"
-                        elif command_type == "help":
-                            return self._handle_help_command("", user_id)
-                        # If LLM handled it, return. Otherwise, it might be a comment or low confidence.
-                        # For other specific commands handled by LLM, ensure they return here.
-                        # If not, it will fall through.
-                    
-                    # LLMが "comment" と判断したか、信頼度が低い場合はチケット作成へ
-                    if command_type == "comment" or confidence < 0.7:
-                         logger.info(f"LLM解析結果がコメントまたは低信頼度 ({command_type}, {confidence:.2f})。チケット作成を試みます。")
-                    # No explicit return here, fall through to ticket creation logic
+            # キーワード → ローカル分類器 → LLM の順に意図を判定
+            try:
+                command_data = self.intent_pipeline.analyze(message_text)
+                confidence = command_data.get("confidence", 0)
+                command_type = command_data.get("command_type", "unknown")
+                
+                # 高信頼度で特定のコマンドタイプ（"comment"以外）と判断された場合
+                if confidence >= 0.7 and command_type != "unknown" and command_type != "comment":
+                    logger.info(f"コマンド '{command_type}' を検出しました (判定: {command_data.get('tier')}, 信頼度: {confidence:.2f})")
+                    response = self._dispatch_command_data(command_data, user_id)
+                    if response is not None:
+                        return response
+                
+                # "comment" と判断されたか、信頼度が低い場合はチケット作成へ
+                if command_type == "comment" or confidence < 0.7:
+                     logger.info(f"解析結果がコメントまたは低信頼度 ({command_type}, {confidence:.2f})。チケット作成を試みます。")
 
-                except Exception as e:
-                    logger.error(f"LLMによるメッセージ解析中にエラーが発生しました: {str(e)}")
-                    # エラー時は従来のロジック (チケット作成) にフォールバック
+            except Exception as e:
+                logger.error(f"メッセージの意図判定中にエラーが発生しました: {str(e)}")
+                # エラー時は従来のロジック (チケット作成) にフォールバック
             
             # コマンドでもなく、LLMが高信頼度で特定コマンドと解釈しなかった場合、
             # またはLLMが無効/エラーの場合、新しいチケットとして登録
@@ -187,6 +175,68 @@ class LineBotAdapter:
             logger.error(f"Error handling message: {e}", exc_info=True)
             return f"メッセージ処理中に予期せぬエラーが発生しました: {str(e)}"
     
+    @property
+    def llm_assistant(self):
+        """共有のLLMアシスタント（/api/llm/config で作り直された場合も最新のものを返す）"""
+        if not self._llm_enabled:
+            return None
+        from .llm_helper import get_assistant
+        return get_assistant()
+    
+    def _analyze_with_llm(self, message_text: str) -> Dict[str, Any]:
+        """LLMによる自然言語解析"""
+        logger.info("LLMによるメッセージ解析を実行します")
+        return self.llm_assistant.analyze_natural_language_command(message_text)
+    
+    def _dispatch_command_data(self, command_data: Dict[str, Any], user_id: str) -> Optional[str]:
+        """
+        意図判定の結果を各コマンドの処理に振り分け
+        
+        Args:
+            command_data: 意図判定の結果
+            user_id: ユーザーID
+            
+        Returns:
+            応答メッセージ（処理できない場合はNone）
+        """
+        command_type = command_data.get("command_type")
+        ticket_id = command_data.get("ticket_id")
+        
+        if command_type == "task_list":
+            days = command_data.get("days")
+            if days:
+                return self._handle_tasks_command(f"{days}日", user_id)
+            return self._handle_today_command("", user_id)
+        elif command_type == "log_time":
+            hours = command_data.get("hours")
+            comment = command_data.get("comment", "")
+            if ticket_id and hours:
+                return self._handle_log_command(f"{ticket_id} {hours} {comment}", user_id)
+        elif command_type == "update_status":
+            status_id = command_data.get("status_id")
+            if ticket_id and status_id:
+                return self._handle_status_command(f"{ticket_id} {status_id}", user_id)
+        elif command_type == "update_progress":
+            done_ratio = command_data.get("done_ratio")
+            comment = command_data.get("comment", "")
+            if ticket_id and done_ratio is not None:
+                return self._handle_update_command(f"{ticket_id} {done_ratio} {comment}".strip(), user_id)
+        elif command_type == "summary":
+            if ticket_id:
+                return self._handle_summary_command(str(ticket_id), user_id)
+        elif command_type == "report":
+            return self._handle_report_command(command_data.get("report_type", "today"), user_id)
+        elif command_type == "optimize":
+            return self._handle_optimize_command("", user_id)
+        elif command_type == "search":
+            query = command_data.get("search_query", "")
+            return f"「{query}」による検索機能は現在開発中です。"
+        elif command_type == "help":
+            return self._handle_help_command("", user_id)
+        
+        logger.warning(f"コマンド '{command_type}' に必要なパラメータが不足しています: {command_data}")
+        return None
+    
     def _handle_today_command(self, args: str, user_id: str) -> str:
         """今日のタスクを表示"""
         tasks = self.agent.get_daily_tasks()
@@ -210,20 +260,31 @@ class LineBotAdapter:
         if not tasks:
             return f"今後{days}日間の予定タスクはありません。"
         
+        # 期限・優先度・進捗率のスコア順に並べる
+        limit = get_config("line.max_listed_tasks", 20)
+        ranked = get_priority_scorer(f"{user_id}:tasks").rank(tasks, limit=limit)
+        
         result = f"今後{days}日間の予定タスク:\n\n"
         
-        for i, task in enumerate(tasks, 1):
+        for i, (task, _) in enumerate(ranked, 1):
             subject = task.get("subject", "無題")
             due_date = task.get("due_date", "期限なし")
             priority = task.get("priority", {}).get("name", "中")
             
             result += f"{i}. {subject} (期限:{due_date}, 優先度:{priority})\n"
         
+        if len(tasks) > len(ranked):
+            result += f"\n他 {len(tasks) - len(ranked)}件"
+        
         return result
     
     def _handle_log_command(self, args: str, user_id: str) -> str:
         """作業時間を記録"""
         # 構文: <チケットID> <時間> <コメント>
+        # 複数行の場合は1行1件として一括処理
+        if "\n" in args.strip():
+            return self._run_bulk_lines([f"log {line}" for line in args.strip().splitlines() if line.strip()])
+        
         parts = args.split(' ', 2)
         
         if len(parts) < 2:
@@ -271,6 +332,10 @@ class LineBotAdapter:
     def _handle_status_command(self, args: str, user_id: str) -> str:
         """チケットのステータスを更新"""
         # 構文: <チケットID> <ステータスID> [コメント]
+        # 複数行の場合は1行1件として一括処理
+        if "\n" in args.strip():
+            return self._run_bulk_lines([f"status {line}" for line in args.strip().splitlines() if line.strip()])
+        
         parts = args.split(' ', 2)
         
         if len(parts) < 2:
@@ -294,6 +359,10 @@ class LineBotAdapter:
     def _handle_update_command(self, args: str, user_id: str) -> str:
         """チケットの進捗率を更新"""
         # 構文: <チケットID> <進捗率> [コメント]
+        # 複数行の場合は1行1件として一括処理
+        if "\n" in args.strip():
+            return self._run_bulk_lines([f"update {line}" for line in args.strip().splitlines() if line.strip()])
+        
         parts = args.split(' ', 2)
         
         if len(parts) < 2:
@@ -317,6 +386,73 @@ class LineBotAdapter:
         except (ValueError, IndexError) as e:
             return f"入力形式が正しくありません: {str(e)}"
     
+    def _handle_bulk_command(self, args: str, user_id: str) -> str:
+        """作業時間の記録・ステータス更新・進捗率更新をまとめて実行"""
+        # 構文: 1行に1件ずつ log/status/update <引数>
+        lines = [line for line in args.strip().splitlines() if line.strip()]
+        if not lines:
+            return (
+                "使用方法: /bulk の後に1行1件で指定します\n"
+                "log <チケットID> <時間> <コメント>\n"
+                "status <チケットID> <ステータスID> [コメント]\n"
+                "update <チケットID> <進捗率> [コメント]"
+            )
+        return self._run_bulk_lines(lines)
+    
+    def _run_bulk_lines(self, lines: List[str]) -> str:
+        """1行1件の指定を解析して一括処理し、結果を整形"""
+        time_entries = []
+        issue_updates = []
+        errors = []
+        for number, line in enumerate(lines, 1):
+            parts = line.strip().split(None, 3)
+            kind = parts[0].lower().lstrip("/") if parts else ""
+            try:
+                if kind == "log":
+                    time_entries.append({
+                        "issue_id": int(parts[1].lstrip("#")),
+                        "hours": float(parts[2]),
+                        "comments": parts[3] if len(parts) > 3 else ""
+                    })
+                elif kind in ("status", "update"):
+                    field = "status_id" if kind == "status" else "done_ratio"
+                    issue_updates.append({
+                        "issue_id": int(parts[1].lstrip("#")),
+                        field: int(parts[2].rstrip("%")),
+                        "notes": parts[3] if len(parts) > 3 else None
+                    })
+                else:
+                    errors.append(f"{number}行目: 不明な操作「{kind}」です")
+            except (ValueError, IndexError):
+                errors.append(f"{number}行目: 入力形式が正しくありません")
+        
+        if errors:
+            return "一括処理を中止しました。\n" + "\n".join(errors)
+        
+        # 結果は作業時間 → チケット更新の順に返る
+        labels = [f"#{entry['issue_id']} {entry['hours']}時間を記録" for entry in time_entries]
+        for update in issue_updates:
+            if "status_id" in update:
+                labels.append(f"#{update['issue_id']} ステータスを {update['status_id']} に更新")
+            else:
+                labels.append(f"#{update['issue_id']} 進捗率を {update['done_ratio']}% に更新")
+        
+        outcome = self.agent.bulk_update(time_entries=time_entries, issue_updates=issue_updates)
+        lines = [f"一括処理: {len(outcome['results'])}件中{outcome['succeeded']}件成功"]
+        for label, result in zip(labels, outcome["results"]):
+            if result["success"]:
+                lines.append(f"✅ {label}")
+            else:
+                lines.append(f"❌ {label}: {result.get('error', '失敗')}")
+        
+        if time_entries and outcome["succeeded"]:
+            today = datetime.date.today().isoformat()
+            total_hours = sum(
+                entry["hours"] for entry, result in zip(time_entries, outcome["results"]) if result["success"]
+            )
+            lines.append(f"\n記録した作業時間の合計: {total_hours}時間 ({today})")
+        return "\n".join(lines)
+    
     def _handle_summary_command(self, args: str, user_id: str) -> str:
         """チケットの要約を表示"""
         # 構文: <チケットID>
@@ -335,6 +471,31 @@ class LineBotAdapter:
             result += f"見積時間: {summary['estimated_hours'] or '未設定'}\n"
             result += f"合計作業時間: {summary['total_time_spent']}時間\n\n"
             
+            comments = ""
+            if summary['recent_comments']:
+                comments += "\n■ 最近のコメント:\n"
+                for comment in summary['recent_comments']:
+                    date = datetime.datetime.fromisoformat(comment['date']).strftime("%m/%d")
+                    text = comment['text']
+                    if len(text) > 50:
+                        text = text[:50] + "..."
+                    comments += f"- {date} ({comment['user']}): {text}\n"
+            
+            # LLMが有効な場合は、要約と推奨アクションを生成しながら送信
+            if self.llm_assistant:
+                prompt = (
+                    "以下のRedmineチケットについて、これまでの経緯と現在の状況を3～5文で要約し、"
+                    "続けて次に取るべきアクションを最大3つ、箇条書きで提案してください。"
+                    "Markdownの記号は使わず、LINEでそのまま読める日本語のプレーンテキストで出力してください。\n\n"
+                    f"{result}{comments}"
+                )
+                self.push_stream(
+                    user_id,
+                    self.llm_assistant.stream_text(prompt, 0.4),
+                    header=result + comments.lstrip("\n") + "\n■ AIによる要約と推奨アクション:"
+                )
+                return ""
+            
             # 次のタスク
             next_tasks = self.agent.generate_next_tasks(issue_id)
             if next_tasks:
@@ -344,20 +505,53 @@ class LineBotAdapter:
                     priority = task.get("priority", "中")
                     result += f"{i}. {status} {task['title']} (優先度:{priority})\n"
             
-            if summary['recent_comments']:
-                result += "\n■ 最近のコメント:\n"
-                for comment in summary['recent_comments']:
-                    date = datetime.datetime.fromisoformat(comment['date']).strftime("%m/%d")
-                    text = comment['text']
-                    if len(text) > 50:
-                        text = text[:50] + "..."
-                    result += f"- {date} ({comment['user']}): {text}\n"
-            
-            return result
+            return result + comments
             
         except ValueError:
             return "チケットIDを正しく指定してください。例: /summary 123"
     
+    def _handle_watch_command(self, args: str, user_id: str) -> str:
+        """チケットの更新通知を購読（引数なしで購読中の一覧を表示）"""
+        # 構文: [チケットID]
+        if not args.strip():
+            watching = sorted(
+                ((int(key[len(WATCH_KEY_PREFIX):]), value)
+                 for key, value in get_user_preferences(user_id).items()
+                 if key.startswith(WATCH_KEY_PREFIX)),
+                key=lambda item: item[0]
+            )
+            if not watching:
+                return "購読中のチケットはありません。 /watch <チケットID> で購読できます。"
+            lines = ["購読中のチケット:"]
+            for issue_id, value in watching:
+                subject = value.get("subject", "") if isinstance(value, dict) else ""
+                lines.append(f"#{issue_id} {subject}".rstrip())
+            return "\n".join(lines)
+
+        try:
+            issue_id = int(args.strip().lstrip("#"))
+        except ValueError:
+            return "チケットIDを正しく指定してください。例: /watch 123"
+
+        issue = self.agent.mirror.get_issue(issue_id) if self.agent.mirror else None
+        subject = issue.get("subject", "") if issue else ""
+        update_user_preference(user_id, watch_key(issue_id), {
+            "subject": subject,
+            "since": datetime.datetime.now().isoformat(timespec="seconds")
+        })
+        label = f"#{issue_id}「{subject}」" if subject else f"#{issue_id}"
+        return f"✅ チケット {label} の更新を通知します。"
+
+    def _handle_unwatch_command(self, args: str, user_id: str) -> str:
+        """チケットの更新通知の購読を解除"""
+        # 構文: <チケットID>
+        try:
+            issue_id = int(args.strip().lstrip("#"))
+        except ValueError:
+            return "チケットIDを正しく指定してください。例: /unwatch 123"
+        delete_user_preference(user_id, watch_key(issue_id))
+        return f"✅ チケット #{issue_id} の更新通知を解除しました。"
+
     def _handle_report_command(self, args: str, user_id: str) -> str:
         """レポート生成"""
         # 構文: <レポートタイプ> [パラメータ]
@@ -365,30 +559,106 @@ class LineBotAdapter:
         report_type = parts[0] if parts else "help"
         params = parts[1] if len(parts) > 1 else ""
         
-        if report_type == "today":
-            # 本日の作業
-            today = datetime.date.today().isoformat()
-            time_entries = self.agent.get_time_entries(
-                from_date=today,
-                to_date=today
-            )
-            completed_tasks = []
-            
-            return self.agent.format_evening_report(completed_tasks, time_entries)
-            
-        elif report_type == "week":
-            # 週間レポート
-            return self.agent.generate_weekly_summary()
-        else:
+        if report_type not in ("today", "week"):
             return (
                 "使用可能なレポート:\n"
                 "/report today - 今日の作業レポート\n"
                 "/report week - 週間サマリーレポート"
             )
+        
+        # 本日の作業 / 週間レポート
+        today = datetime.date.today()
+        from_date = today if report_type == "today" else today - datetime.timedelta(days=6)
+        time_entries = self.agent.get_time_entries(
+            from_date=from_date.isoformat(),
+            to_date=today.isoformat()
+        )
+        title = f"今日の作業レポート ({today.isoformat()})" if report_type == "today" else \
+            f"週間サマリーレポート ({from_date.isoformat()} ～ {today.isoformat()})"
+        report = self._format_work_report(title, time_entries)
+        
+        # LLMが有効な場合は、振り返りのコメントを生成しながら送信
+        if self.llm_assistant and time_entries:
+            entries_text = "\n".join(
+                f"{entry.get('spent_on')}|#{(entry.get('issue') or {}).get('id', '-')}|{entry.get('hours')}h|"
+                f"{truncate_to_budget(entry.get('comments'), 40) or '-'}"
+                for entry in time_entries
+            )
+            prompt = (
+                f"以下はRedmineに記録された{'今日' if report_type == 'today' else '今週'}の作業時間です（日付|チケット|時間|コメント）。"
+                "作業内容の振り返りと、時間の使い方についての気づきや改善点を簡潔に述べてください。"
+                "Markdownの記号は使わず、LINEでそのまま読める日本語のプレーンテキストで出力してください。\n\n"
+                f"{entries_text}"
+            )
+            self.push_stream(
+                user_id,
+                self.llm_assistant.stream_text(prompt, 0.5),
+                header=report + "\n\n■ AIによる振り返り:"
+            )
+            return ""
+        
+        return report
+    
+    @staticmethod
+    def _format_work_report(title: str, time_entries: List[Dict[str, Any]]) -> str:
+        """作業時間をチケットごとに集計したレポート"""
+        if not time_entries:
+            return f"■ {title}\n作業時間の記録はありません。"
+        
+        by_issue: Dict[Any, Dict[str, Any]] = {}
+        for entry in time_entries:
+            issue_id = (entry.get("issue") or {}).get("id")
+            item = by_issue.setdefault(issue_id, {"hours": 0.0, "comments": []})
+            item["hours"] += entry.get("hours") or 0
+            if entry.get("comments") and entry["comments"] not in item["comments"]:
+                item["comments"].append(entry["comments"])
+        
+        total_hours = sum(item["hours"] for item in by_issue.values())
+        result = f"■ {title}\n合計作業時間: {total_hours:.1f}時間\n"
+        for issue_id, item in sorted(by_issue.items(), key=lambda pair: -pair[1]["hours"]):
+            label = f"#{issue_id}" if issue_id else "チケットなし"
+            comments = "、".join(item["comments"][:2])
+            result += f"\n{label}: {item['hours']:.1f}時間" + (f" ({comments[:40]})" if comments else "")
+        return result
     
     def _handle_optimize_command(self, args: str, user_id: str) -> str:
-        """タスク最適化の提案"""
-        return self.agent.suggest_task_consolidation()
+        """タスク最適化の提案（優先して取り組むべきタスクの一覧）"""
+        tasks = {task["id"]: task for task in self.agent.get_daily_tasks()}
+        for task in self.agent.get_upcoming_tasks(days=30):
+            tasks.setdefault(task["id"], task)
+        
+        if not tasks:
+            return "未完了のタスクはありません。"
+        
+        limit = get_config("line.max_listed_tasks", 20)
+        ranked = get_priority_scorer(f"{user_id}:optimize").rank(list(tasks.values()), limit=limit)
+        
+        result = "優先して取り組むべきタスク（期限・優先度・進捗率による評価）:\n\n"
+        for i, (task, score) in enumerate(ranked, 1):
+            subject = task.get("subject", "無題")
+            due_date = task.get("due_date") or "期限なし"
+            result += f"{i}. #{task['id']} {subject} (期限:{due_date}, 進捗:{task.get('done_ratio', 0)}%, スコア:{score:.0f})\n"
+        
+        if len(tasks) > len(ranked):
+            result += f"\n他 {len(tasks) - len(ranked)}件"
+        
+        # LLMが有効な場合は、上位のタスクへの取り組み方の提案を生成しながら送信
+        if self.llm_assistant:
+            top_tasks = [task for task, _ in ranked[:10]]
+            prompt = (
+                "以下は優先度の高い順に並べたRedmineのタスクです。"
+                "まとめて進められるタスク、分割や後回しを検討すべきタスクなど、効率的な取り組み方を簡潔に提案してください。"
+                "Markdownの記号は使わず、LINEでそのまま読める日本語のプレーンテキストで出力してください。\n\n"
+                f"{render_issue_table(top_tasks, OPTIMIZE_COLUMNS, description_tokens=40)}"
+            )
+            self.push_stream(
+                user_id,
+                self.llm_assistant.stream_text(prompt, 0.5),
+                header=result.rstrip() + "\n\n■ AIからの提案:"
+            )
+            return ""
+        
+        return result
         
     def _handle_mode_command(self, args: str, user_id: str) -> str:
         """動作モードの切り替え (開発・本番)"""
@@ -467,7 +737,10 @@ class LineBotAdapter:
             "/log <チケットID> <時間> <コメント> - 作業時間を記録\n"
             "/status <チケットID> <ステータスID> [コメント] - ステータスを更新\n"
             "/update <チケットID> <進捗率> [コメント] - 進捗率を更新\n"
+            "/bulk - 複数の記録・更新をまとめて実行（改行区切りで log/status/update を指定）\n"
             "/summary <チケットID> - チケットの要約を表示\n"
+            "/watch [チケットID] - チケットの更新通知を購読（省略時は購読中の一覧）\n"
+            "/unwatch <チケットID> - チケットの更新通知を解除\n"
             "/report today - 今日の作業レポート\n"
             "/report week - 週間サマリーレポート\n"
             "/optimize - タスク効率化の提案\n"
@@ -497,6 +770,43 @@ class LineBotAdapter:
                 "「週間レポートを見せて」\n\n"                "LLM支援機能ステータス: " + llm_status
             )
     
+    def push_stream(self, user_id: str, chunks: Iterable[str], header: Optional[str] = None) -> int:
+        """
+        LLMのストリーミング応答をLINEメッセージに分割して順次送信
+        
+        最初のメッセージは生成の途中でも文が区切れた時点で送信し、
+        合計の送信数は `line.stream_max_messages`（既定: 5）件までに抑えます。
+        
+        Args:
+            user_id: LINE ユーザーID
+            chunks: テキストの断片（RedmineAssistant.stream_text の結果）
+            header: 生成を待たずに最初に送信するメッセージ
+            
+        Returns:
+            送信したメッセージ数
+        """
+        max_messages = get_config("line.stream_max_messages", 5)
+        sent = 0
+        with span("line.push_stream") as stream_span:
+            if header:
+                self.send_message(user_id, header)
+                sent += 1
+                stream_span.set(first_message_ms=round((time.perf_counter() - stream_span.started) * 1000, 1))
+            
+            for message in iter_stream_messages(
+                chunks,
+                first_chars=get_config("line.stream_first_chars", 80),
+                chunk_chars=get_config("line.stream_chunk_chars", 1000),
+                max_messages=max(1, max_messages - sent)
+            ):
+                self.send_message(user_id, message)
+                sent += 1
+                if sent == 1:
+                    stream_span.set(first_message_ms=round((time.perf_counter() - stream_span.started) * 1000, 1))
+            stream_span.set(messages=sent)
+        return sent
+    
+    @traced("line.send_message")
     def send_message(self, user_id: str, message: str) -> bool:
         """
         LINEにメッセージを送信（簡易版：実際には送信せずにログに記録）
@@ -521,19 +831,22 @@ class LineBotAdapter:
             if is_dev_mode:
                 display_message = f"[開発環境] {message}"
                 
+            # 文字数の上限を超える場合は複数のメッセージに分割
+            messages = split_message(display_message, max_messages=get_config("line.max_push_messages", 5))
+                
             # 実際のLINE APIの呼び出し
             # 本番モードでは実際にAPIを呼び出す実装に置き換え
             if environment == "production" and self.line_token != "dummy_line_token_for_development":
-                logger.info(f"[PRODUCTION] Sending LINE message to {user_id}, length: {len(display_message)}")
+                logger.info(f"[PRODUCTION] Sending LINE message to {user_id}, length: {len(display_message)}, parts: {len(messages)}")
                 # TODO: 実際のLINE APIコール実装
                 # from linebot import LineBotApi
                 # line_bot_api = LineBotApi(self.line_token)
-                # line_bot_api.push_message(user_id, TextSendMessage(text=display_message))
+                # line_bot_api.push_message(user_id, [TextSendMessage(text=part) for part in messages])
             
             # シミュレーションモード (開発環境または本番環境でもAPIなし)
             # Unicode文字をエスケープ処理してログに出力
             safe_message = display_message.encode('unicode_escape').decode('ascii')
-            logger.info(f"[SIMULATED LINE MESSAGE] To: {user_id}, Message length: {len(display_message)}")
+            logger.info(f"[SIMULATED LINE MESSAGE] To: {user_id}, Message length: {len(display_message)}, parts: {len(messages)}")
             # 別途デバッグログとして内容を出力（長すぎる場合は省略）
             if len(display_message) > 500:
                 logger.debug(f"Message content (truncated): {display_message[:500]}...")
@@ -0,0 +1,272 @@
+"""
+Redmineチケット管理エージェント - LLMレスポンスキャッシュ
+
+モデル・プロンプト・温度から計算したハッシュをキーにGemini APIのレスポンスを
+ディスクに保存し、同一リクエストの再送を省略します。
+同時に発生した同一リクエストは1回のAPI呼び出しにまとめます。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+from .config import get_config
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# キャッシュファイルの保存先
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "data" / "llm_cache"
+
+
+class LLMResponseCache:
+    """TTLとサイズ上限付きのLLMレスポンスキャッシュ（ディスク保存）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl_seconds: int = 600,
+                 max_entries: int = 500, max_bytes: int = 20 * 1024 * 1024,
+                 max_temperature: float = 0.3):
+        """
+        初期化
+
+        Args:
+            cache_dir: キャッシュファイルの保存ディレクトリ
+            ttl_seconds: キャッシュの有効期間（秒）
+            max_entries: 保持する最大エントリ数
+            max_bytes: キャッシュファイルの合計サイズ上限（バイト）
+            max_temperature: キャッシュ対象とする温度の上限（これより高い温度の呼び出しはキャッシュしない）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_temperature = max_temperature
+
+        self._lock = threading.Lock()
+        # キー -> (ファイルサイズ, 最終アクセス時刻)。古いアクセス順に並ぶ
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        # 実行中のリクエスト（キー -> 完了通知用イベントと結果）
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "tokens_saved": 0,
+            "latency_saved_seconds": 0.0
+        }
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float) -> str:
+        """モデル・プロンプト・温度からキャッシュキーを計算"""
+        payload = json.dumps([model, prompt, round(float(temperature), 3)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """指定温度の呼び出しがキャッシュ対象かどうか"""
+        return temperature <= self.max_temperature
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self) -> None:
+        """既存のキャッシュファイルからインデックスを構築"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for path in self.cache_dir.glob("*.json"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            for mtime, key, size in sorted(entries):
+                self._index[key] = (size, mtime)
+                self._total_bytes += size
+            self._evict()
+            logger.info(f"LLMキャッシュを読み込みました: {len(self._index)}件 ({self.cache_dir})")
+        except Exception as e:
+            logger.error(f"LLMキャッシュの読み込み中にエラー: {str(e)}")
+
+    def _remove(self, key: str) -> None:
+        """エントリを削除（ロック取得済みで呼び出すこと）"""
+        size, _ = self._index.pop(key, (0, 0))
+        self._total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        """サイズ上限を超えた分を最終アクセスの古い順に削除（ロック取得済みで呼び出すこと）"""
+        while self._index and (len(self._index) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest_key = next(iter(self._index))
+            self._remove(oldest_key)
+            self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュからエントリを取得
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            キャッシュエントリ（存在しないか期限切れの場合はNone）
+        """
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except Exception as e:
+                logger.warning(f"LLMキャッシュの読み込みに失敗しました ({key[:12]}): {str(e)}")
+                self._remove(key)
+                return None
+
+            if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+                self._remove(key)
+                return None
+
+            size, _ = self._index.pop(key)
+            self._index[key] = (size, time.time())
+            return entry
+
+    def put(self, key: str, response: Dict[str, Any], latency: float) -> None:
+        """
+        レスポンスをキャッシュに保存
+
+        Args:
+            key: キャッシュキー
+            response: Gemini APIのレスポンス
+            latency: API呼び出しにかかった時間（秒）
+        """
+        entry = {
+            "created_at": time.time(),
+            "latency": latency,
+            "tokens": response.get("usageMetadata", {}).get("totalTokenCount", 0),
+            "response": response
+        }
+        data = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            try:
+                if key in self._index:
+                    self._remove(key)
+                tmp_path = self._path(key).with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._path(key))
+                size = len(data.encode("utf-8"))
+                self._index[key] = (size, time.time())
+                self._total_bytes += size
+                self._evict()
+            except Exception as e:
+                logger.error(f"LLMキャッシュの保存中にエラー: {str(e)}")
+
+    def _record_saving(self, entry: Dict[str, Any], counter: str) -> None:
+        with self._lock:
+            self.stats[counter] += 1
+            self.stats["tokens_saved"] += entry.get("tokens", 0) or 0
+            self.stats["latency_saved_seconds"] += entry.get("latency", 0.0) or 0.0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュを参照し、なければ計算して保存
+
+        同じキーの計算が実行中の場合は、その完了を待って結果を共有します。
+
+        Args:
+            key: キャッシュキー
+            compute: レスポンスを取得する関数（失敗時はNoneを返す）
+
+        Returns:
+            Gemini APIのレスポンス（失敗時はNone）
+        """
+        entry = self.get(key)
+        if entry:
+            self._record_saving(entry, "hits")
+            logger.info(f"LLMキャッシュにヒットしました ({key[:12]})")
+            return entry["response"]
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = {"event": threading.Event(), "entry": None}
+                self._in_flight[key] = in_flight
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            logger.info(f"実行中の同一LLMリクエストの完了を待機します ({key[:12]})")
+            in_flight["event"].wait()
+            if in_flight["entry"]:
+                self._record_saving(in_flight["entry"], "coalesced")
+                return in_flight["entry"]["response"]
+            return None
+
+        try:
+            with self._lock:
+                self.stats["misses"] += 1
+            started = time.monotonic()
+            response = compute()
+            latency = time.monotonic() - started
+            if response and "demo" not in response:
+                self.put(key, response, latency)
+                in_flight["entry"] = {
+                    "latency": latency,
+                    "tokens": response.get("usageMetadata", {}).get("totalTokenCount", 0),
+                    "response": response
+                }
+            return response
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight["event"].set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報を取得"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total_bytes
+            stats["in_flight"] = len(self._in_flight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0
+        stats["latency_saved_seconds"] = round(stats["latency_saved_seconds"], 3)
+        return stats
+
+
+# プロセス全体で共有するキャッシュ
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    共有のLLMレスポンスキャッシュを取得
+
+    Returns:
+        キャッシュ（`llm.cache.enabled` がfalseの場合はNone）
+    """
+    global _response_cache
+    if get_config("llm.cache.enabled", True) is False:
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache(
+                cache_dir=get_config("llm.cache.dir"),
+                ttl_seconds=get_config("llm.cache.ttl_seconds", 600),
+                max_entries=get_config("llm.cache.max_entries", 500),
+                max_bytes=get_config("llm.cache.max_bytes", 20 * 1024 * 1024),
+                max_temperature=get_config("llm.cache.max_temperature", 0.3)
+            )
+        return _response_cache
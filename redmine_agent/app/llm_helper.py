@@ -5,20 +5,83 @@ Gemini APIを活用して、Redmineチケットの分析や提案を行う機能
 """
 
 import os
+import re
 import json
 import logging
 import time
 import random
+import asyncio
+import datetime
+import threading
+import concurrent.futures
 import requests
-from typing import Dict, List, Any, Optional, Tuple, Union
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterator
 from dotenv import load_dotenv
 
+from .config import get_config
+from .llm_cache import get_response_cache
+from .gemini_client import AsyncGeminiClient
+from .prompt_compactor import (
+    render_issue_table, truncate_to_budget,
+    PRIORITIZE_COLUMNS, OPTIMIZE_COLUMNS
+)
+from .priority_scorer import PriorityScorer
+from .telemetry import span
+
 # 共通ロガー設定
 logger = logging.getLogger(__name__)
 
 # 環境変数のロード
 load_dotenv()
 
+class CircuitBreaker:
+    """連続した失敗でAPI呼び出しを一時停止するサーキットブレーカー"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        """
+        初期化
+        
+        Args:
+            failure_threshold: OPENに遷移する連続失敗回数
+            reset_timeout: OPENからHALF_OPEN（試行再開）に遷移するまでの秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """リクエストを送信してよいかどうか"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info("サーキットブレーカーをHALF_OPENに変更しました")
+            return self.state != self.OPEN
+    
+    def record_success(self) -> None:
+        """成功を記録"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("サーキットブレーカーをCLOSEDに戻しました")
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self) -> None:
+        """失敗を記録"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Gemini APIの失敗が続いたためサーキットブレーカーをOPENにしました (失敗 {self.failures}回)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
 class RedmineAssistant:
     """GeminiモデルによるRedmineチケット管理アシスタント"""
     
@@ -34,19 +97,21 @@ class RedmineAssistant:
             self.api_keys = [api_key]
             logger.info("指定されたAPIキーを使用します")
         else:
-            # 複数のAPIキーをロード（ローテーション用）
-            keys_to_try = ["GEMINI_API_KEY", "GOOGLE_API_KEY", "GEMINI_API_KEY1", "GEMINI_API_KEY2"]
+            # 複数のAPIキーをロード（GEMINI_API_KEY, GOOGLE_API_KEY, GEMINI_API_KEY1, GEMINI_API_KEY2, ...）
+            numbered = sorted(
+                (name for name in os.environ if re.fullmatch(r'GEMINI_API_KEY\d+', name)),
+                key=lambda name: int(name[len("GEMINI_API_KEY"):])
+            )
             self.api_keys = []
-            for key_name in keys_to_try:
+            for key_name in ["GEMINI_API_KEY", "GOOGLE_API_KEY"] + numbered:
                 key_value = os.getenv(key_name)
-                if key_value:
+                if key_value and key_value not in self.api_keys:
                     self.api_keys.append(key_value)
                     logger.info(f"環境変数 {key_name} からAPIキーをロードしました")
             
             if not self.api_keys:
                 logger.warning("有効なGemini APIキーが見つかりません。デモモードで動作します")
         
-        self.current_key_index = 0
         self.api_key = self.api_keys[0] if self.api_keys else None
         
         # APIエンドポイントとモデル設定
@@ -57,90 +122,144 @@ class RedmineAssistant:
         self.max_retries = 3
         self.retry_delay = 2  # 秒
         
-        # API接続テスト
-        if self.api_key:
-            self._test_api_connection()
+        # キーごとのレート制限を考慮してリクエストを振り分けるクライアント
+        self.client = AsyncGeminiClient(
+            self.api_keys, self.base_url, self.model,
+            requests_per_minute=get_config("llm.key_requests_per_minute", 15),
+            max_retries=self.max_retries,
+            retry_delay=self.retry_delay,
+            max_wait=get_config("llm.max_wait_seconds", 60)
+        )
+        
+        # レスポンスキャッシュ（低温度の呼び出しのみ対象）
+        self.response_cache = get_response_cache()
+        
+        # 接続状態（接続テストはバックグラウンドの probe() で行う）
+        self.circuit = CircuitBreaker()
+        self.last_probe: Optional[Dict[str, Any]] = None
     
     def _test_api_connection(self) -> bool:
-        """API接続テスト"""
+        """API接続テスト（いずれかのAPIキーで接続できれば成功）"""
         if not self.api_key:
             return False
         
-        try:
-            logger.info("Gemini API接続テスト実行中...")
-            response = requests.post(
-                f"{self.base_url}/{self.model}:generateContent?key={self.api_key}",
-                json={"contents": [{"parts": [{"text": "Test"}]}]},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.info("Gemini API接続テスト成功")
-                return True
-            else:
-                logger.error(f"Gemini API接続テスト失敗: ステータス {response.status_code}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Gemini API接続テスト中に例外発生: {str(e)}")
-            return False
-    
-    def _rotate_api_key(self) -> bool:
-        """次のAPIキーに切り替え"""
-        if len(self.api_keys) <= 1:
-            return False
-            
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        self.api_key = self.api_keys[self.current_key_index]
-        logger.info(f"APIキーをローテーション: インデックス {self.current_key_index} に切り替え")
-        return True
-    
-    def _make_api_request(self, prompt: str, temperature: float = 0.7) -> Optional[Dict[str, Any]]:
-        """Gemini APIリクエスト実行（リトライロジック含む）"""
-        if not self.api_key:
-            logger.warning("APIキーがないため、デモモードでレスポンス生成")
-            return {"demo": True, "text": f"APIキーがないためデモレスポンス: {prompt[:30]}..."}
-            
-        retries = 0
-        while retries < self.max_retries:
+        logger.info("Gemini API接続テスト実行中...")
+        for index, api_key in enumerate(self.api_keys):
             try:
-                logger.info(f"Gemini APIリクエスト実行 (試行 {retries+1}/{self.max_retries})")
-                
                 response = requests.post(
-                    f"{self.base_url}/{self.model}:generateContent?key={self.api_key}",
-                    json={
-                        "contents": [{"parts": [{"text": prompt}]}],
-                        "generationConfig": {"temperature": temperature}
-                    },
-                    timeout=30
+                    f"{self.base_url}/{self.model}:generateContent?key={api_key}",
+                    json={"contents": [{"parts": [{"text": "Test"}]}]},
+                    timeout=10
                 )
                 
                 if response.status_code == 200:
-                    return response.json()
-                elif response.status_code in [401, 403, 429]:
-                    # 認証エラーやレート制限の場合はAPIキーをローテーション
-                    logger.warning(f"APIエラー ({response.status_code}). キーローテーション試行...")
-                    if self._rotate_api_key():
-                        # キーを切り替えて少し待機
-                        time.sleep(self.retry_delay)
-                    else:
-                        # ローテーションできなければ通常の再試行
-                        logger.error("APIキーのローテーションができません")
-                        retries += 1
-                        time.sleep(self.retry_delay * (2 ** retries))
-                else:
-                    # その他のエラーは通常の再試行
-                    logger.error(f"APIエラー: {response.status_code} - {response.text[:200]}")
-                    retries += 1
-                    time.sleep(self.retry_delay * (2 ** retries))
-                    
+                    logger.info(f"Gemini API接続テスト成功 (キー{index})")
+                    return True
+                # レート制限中・無効なキーがあっても、他のキーで接続できれば成功とする
+                logger.warning(f"Gemini API接続テスト失敗 (キー{index}): ステータス {response.status_code}")
+                
             except Exception as e:
-                logger.error(f"APIリクエスト中に例外発生: {str(e)}")
-                retries += 1
-                time.sleep(self.retry_delay * (2 ** retries))
+                logger.warning(f"Gemini API接続テスト中に例外発生 (キー{index}): {str(e)}")
+        
+        logger.error("Gemini API接続テスト失敗: すべてのAPIキーで接続できません")
+        return False
+    
+    def probe(self) -> bool:
+        """
+        API接続テストを実行し、結果を接続状態に反映
         
-        logger.error(f"Gemini APIリクエストが{self.max_retries}回の再試行後に失敗")
-        return None
+        Returns:
+            接続に成功したかどうか
+        """
+        connected = self._test_api_connection()
+        if connected:
+            self.circuit.record_success()
+        elif self.api_key:
+            self.circuit.record_failure()
+        self.last_probe = {
+            "connected": connected,
+            "checked_at": datetime.datetime.now().isoformat()
+        }
+        return connected
+    
+    def health(self) -> Dict[str, Any]:
+        """
+        接続状態を取得（APIは呼び出さない）
+        
+        Returns:
+            サーキットブレーカーの状態と直近の接続テスト結果
+        """
+        return {
+            "circuit_state": self.circuit.state,
+            "consecutive_failures": self.circuit.failures,
+            "last_probe": self.last_probe,
+            "api_connected": self.circuit.state == CircuitBreaker.CLOSED and bool(self.api_key)
+                             and (self.last_probe is None or self.last_probe["connected"])
+        }
+    
+    def _make_api_request(self, prompt: str, temperature: float = 0.7) -> Optional[Dict[str, Any]]:
+        """Gemini APIリクエスト実行（キャッシュ・リトライロジック含む）"""
+        with span("llm.request") as request_span:
+            if not self.api_key:
+                request_span.set(status="demo")
+                logger.warning("APIキーがないため、デモモードでレスポンス生成")
+                return {"demo": True, "text": f"APIキーがないためデモレスポンス: {prompt[:30]}..."}
+            
+            if not self.circuit.allow_request():
+                request_span.set(status="circuit_open")
+                logger.warning("サーキットブレーカーがOPENのため、Gemini APIリクエストを省略します")
+                return None
+            
+            if self.response_cache and self.response_cache.is_cacheable(temperature):
+                key = self.response_cache.make_key(self.model, prompt, temperature)
+                response = self.response_cache.get_or_compute(
+                    key, lambda: self._request_with_retry(prompt, temperature)
+                )
+            else:
+                response = self._request_with_retry(prompt, temperature)
+            if response is None:
+                request_span.set(status="failed")
+            return response
+    
+    def _request_with_retry(self, prompt: str, temperature: float) -> Optional[Dict[str, Any]]:
+        """Gemini APIリクエストをリトライ付きで送信（キーの選択と待機はクライアントが行う）"""
+        response = self.client.request(prompt, temperature)
+        if response is None:
+            self.circuit.record_failure()
+        else:
+            self.circuit.record_success()
+        return response
+    
+    def stream_text(self, prompt: str, temperature: float = 0.7) -> Iterator[str]:
+        """
+        Gemini APIの応答をストリーミングで取得（キャッシュは使用しない）
+        
+        Args:
+            prompt: プロンプト
+            temperature: 生成温度
+            
+        Yields:
+            生成されたテキストの断片
+        """
+        if not self.api_key:
+            logger.warning("APIキーがないため、デモモードでレスポンス生成")
+            yield f"APIキーがないためデモレスポンス: {prompt[:30]}..."
+            return
+        
+        if not self.circuit.allow_request():
+            logger.warning("サーキットブレーカーがOPENのため、Gemini APIリクエストを省略します")
+            return
+        
+        received = False
+        try:
+            for text in self.client.stream(prompt, temperature):
+                if not received:
+                    received = True
+                    self.circuit.record_success()
+                yield text
+        finally:
+            if not received:
+                self.circuit.record_failure()
     
     def extract_text_from_response(self, response: Dict[str, Any]) -> str:
         """Gemini APIレスポンスからテキスト部分を抽出"""
@@ -287,7 +406,7 @@ class RedmineAssistant:
         今日の日付: {today}
         
         説明:
-        {issue_data.get("description", "説明なし")}
+        {truncate_to_budget(issue_data.get("description"), get_config("llm.prompt.issue_description_tokens", 400)) or "説明なし"}
         
         以下のJSON形式で応答してください:
         {{
@@ -351,10 +470,38 @@ class RedmineAssistant:
                 "recommended_action": "チケットの詳細を確認してください" 
             }
 
+    def _make_api_requests(self, prompts: List[str], temperature: float) -> List[Optional[Dict[str, Any]]]:
+        """複数のGemini APIリクエストを並行に実行（結果はプロンプトと同じ順）"""
+        max_workers = min(len(prompts), get_config("llm.max_concurrency", 4)) or 1
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda prompt: self._make_api_request(prompt, temperature), prompts))
+    
+    def _score_task_chunk(self, response: Optional[Dict[str, Any]], chunk: List[Dict[str, Any]]) -> Dict[str, Tuple[float, str]]:
+        """チャンクのLLM応答からタスクIDごとの(スコア, 理由)を取得（解析できない場合は空）"""
+        if not response or "demo" in response:
+            return {}
+        try:
+            text = self.extract_text_from_response(response)
+            cleaned_text = re.sub(r'```(?:json)?\n?|\n?```', '', text).strip()
+            chunk_ids = {str(task.get("id")) for task in chunk}
+            scores = {}
+            for item in json.loads(cleaned_text):
+                task_id = str(item.get("id"))
+                if task_id in chunk_ids:
+                    scores[task_id] = (max(0.0, min(100.0, float(item["score"]))), str(item.get("reason", "")))
+            return scores
+        except Exception as e:
+            logger.error(f"タスクのスコア解析中にエラー: {str(e)}")
+            return {}
+    
     def prioritize_tasks(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         タスクリストの最適な優先順位付け
         
+        タスクをチャンクに分けてLLMで並行に0～100のスコアを付け、
+        期限・優先度・進捗率による基本スコアと合わせて並べ替えます。
+        LLMのスコアが得られなかったチャンクは基本スコアのみで評価します。
+        
         Args:
             tasks: タスクのリスト
             
@@ -363,101 +510,59 @@ class RedmineAssistant:
         """
         if not tasks:
             return []
-            
-        tasks_str = json.dumps(tasks, ensure_ascii=False)
-        
-        prompt = f"""
-        以下のタスクリストを、最適な優先順位で並べ替えてください。
-        重要度、緊急度、依存関係、作業効率を考慮してください。
         
-        タスク:
-        {tasks_str}
+        today = datetime.date.today()
+        chunk_size = max(1, get_config("llm.prioritize.chunk_size", 25))
+        chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
         
-        以下のJSON形式で、優先順に並べ替えたタスクリストを返してください。
-        各タスクに「priority_reason」フィールドを追加して、優先度の理由を説明してください。
-        """
-        
-        response = self._make_api_request(prompt, temperature=0.2)
-        if not response:
-            # 基本的な優先順位付けを行う
-            # 期限、優先度、進捗率に基づいてソート
-            try:
-                import datetime
-                today = datetime.date.today()
-                
-                # 基本スコアの計算
-                for task in tasks:
-                    score = 0
-                    
-                    # 期限に基づくスコア
-                    due_date = task.get("due_date")
-                    if due_date:
-                        try:
-                            due_date_obj = datetime.date.fromisoformat(due_date)
-                            days_until_due = (due_date_obj - today).days
-                            if days_until_due < 0:
-                                score += 100  # 期限切れ
-                            elif days_until_due == 0:
-                                score += 90   # 今日期限
-                            elif days_until_due <= 3:
-                                score += 80   # 3日以内
-                            elif days_until_due <= 7:
-                                score += 70   # 1週間以内
-                        except:
-                            pass
-                    
-                    # 優先度に基づくスコア
-                    priority = task.get("priority", {}).get("name", "")
-                    priority_score = {
-                        "低": 0,
-                        "通常": 10,
-                        "高": 20,
-                        "急いで": 30,
-                        "今すぐ": 40
-                    }.get(priority, 10)
-                    score += priority_score
-                    
-                    # 進捗率に基づくスコア（進捗率が高いものを優先）
-                    done_ratio = task.get("done_ratio", 0)
-                    if done_ratio >= 80:
-                        score += 15  # ほぼ完了したものを優先
-                    
-                    # スコアを保存
-                    task["_priority_score"] = score
-                    task["priority_reason"] = "期限、優先度、進捗率に基づく自動評価"
-                
-                # スコアでソート
-                sorted_tasks = sorted(tasks, key=lambda t: t.get("_priority_score", 0), reverse=True)
-                
-                # 一時フィールドを削除
-                for task in sorted_tasks:
-                    if "_priority_score" in task:
-                        del task["_priority_score"]
-                
-                return sorted_tasks
-                
-            except Exception as e:
-                logger.error(f"基本優先順位付けでエラー: {str(e)}")
-                # エラー時は元のリストを返す
-                for task in tasks:
-                    task["priority_reason"] = "元の順序を維持（処理エラー）"
-                return tasks
-        
-        try:
-            text = self.extract_text_from_response(response)
-            # "```json" などのマークダウン記法を除去
-            import re
-            cleaned_text = re.sub(r'```(?:json)?\n?|\n?```', '', text).strip()
-            prioritized_tasks = json.loads(cleaned_text)
-            logger.info(f"{len(prioritized_tasks)}件のタスクを優先順位付けしました")
-            return prioritized_tasks
-            
-        except Exception as e:
-            logger.error(f"タスク優先順位付け中にエラー: {str(e)}")
-            # エラー時は元のリストを返す
-            for task in tasks:
-                task["priority_reason"] = "元の順序を維持（処理エラー）"
-            return tasks
+        prompts = []
+        for chunk in chunks:
+            tasks_table = render_issue_table(
+                chunk, PRIORITIZE_COLUMNS,
+                description_tokens=get_config("llm.prompt.description_tokens", 60),
+                total_tokens=get_config("llm.prompt.max_table_tokens", 6000)
+            )
+            prompts.append(f"""
+        以下の各タスクについて、今取り組むべき度合いを0～100のスコアで評価してください。
+        重要度、緊急度、依存関係、作業効率を考慮してください。
+        スコアの目安: 100=今すぐ対応が必要、70=今週中に対応、40=通常の順序で対応、10=急ぐ必要なし
+        今日の日付: {today.isoformat()}
+        
+        タスク（1行1タスク、| 区切り、- は未設定）:
+        {tasks_table}
+        
+        以下のJSON形式で、すべてのタスクのスコアを返してください（タスクの他の項目は含めないでください）:
+        [{{"id": タスクID, "score": スコア, "reason": "理由（最大40文字）"}}]
+        """)
+        
+        llm_scores: Dict[str, Tuple[float, str]] = {}
+        failed_chunks = 0
+        for chunk, response in zip(chunks, self._make_api_requests(prompts, temperature=0.2)):
+            scores = self._score_task_chunk(response, chunk)
+            if not scores:
+                failed_chunks += 1
+            llm_scores.update(scores)
+        
+        if failed_chunks:
+            logger.warning(f"{len(chunks)}チャンク中{failed_chunks}チャンクはLLMのスコアを取得できず、基本スコアで評価します")
+        
+        # LLMのスコアを優先し、同点の場合は基本スコアで並べる
+        # （LLMのスコアがないタスクは基本スコアを0～100に換算して使う）
+        heuristics = PriorityScorer().load(tasks).scores(today)
+        ranked = []
+        for index, (task, heuristic) in enumerate(zip(tasks, heuristics)):
+            llm_score = llm_scores.get(str(task.get("id")))
+            if llm_score:
+                score, reason = llm_score
+            else:
+                score, reason = min(100.0, heuristic * 100 / 155), "期限、優先度、進捗率に基づく自動評価"
+            task["priority_reason"] = reason or "LLMによる評価"
+            task["priority_score"] = round(score, 1)
+            ranked.append((-score, -heuristic, index, task))
+        
+        ranked.sort(key=lambda item: item[:3])
+        logger.info(f"{len(tasks)}件のタスクを優先順位付けしました (LLMスコア {len(llm_scores)}件)")
+        return [item[3] for item in ranked]
 
     def generate_daily_summary(self, completed_tasks: List[Dict[str, Any]], time_entries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -686,14 +791,19 @@ class RedmineAssistant:
                 "suggestions": []
             }
             
-        tasks_str = json.dumps(tasks, ensure_ascii=False)
+        tasks_table = render_issue_table(
+            tasks, OPTIMIZE_COLUMNS,
+            description_tokens=get_config("llm.prompt.description_tokens", 60),
+            total_tokens=get_config("llm.prompt.max_table_tokens", 6000)
+        )
         
         prompt = f"""
         以下のタスクリストを分析し、タスク管理の効率化のための提案を行ってください。
         重要度、緊急度、類似性、時間管理の視点から分析してください。
+        今日の日付: {datetime.date.today().isoformat()}
         
-        タスク:
-        {tasks_str}
+        タスク（1行1タスク、| 区切り、- は未設定）:
+        {tasks_table}
         
         以下のJSON形式で応答してください:
         {{
@@ -756,3 +866,64 @@ class RedmineAssistant:
                     "継続的にタスクの進捗を更新し、チームと共有してください"
                 ]
             }
+
+
+# プロセス全体で共有するアシスタント
+_assistant: Optional[RedmineAssistant] = None
+_assistant_lock = threading.Lock()
+
+# 作り直した後に古いアシスタントのクライアントを停止するまでの猶予（秒）
+_CLIENT_CLOSE_GRACE_SECONDS = 300.0
+
+def get_assistant() -> RedmineAssistant:
+    """
+    共有のRedmineAssistantを取得（初回呼び出し時に生成）
+    
+    Returns:
+        RedmineAssistantインスタンス
+    """
+    global _assistant
+    with _assistant_lock:
+        if _assistant is None:
+            _assistant = RedmineAssistant()
+        return _assistant
+
+def reset_assistant(api_key: Optional[str] = None) -> RedmineAssistant:
+    """
+    共有のRedmineAssistantを作り直す（APIキー変更時など）
+    
+    古いアシスタントを使用中の呼び出しがあるため、古いクライアントはすぐには停止しない。
+    共有のアシスタントは保持せず、呼び出しのたびに get_assistant() で取得すること
+    
+    Args:
+        api_key: GeminiのAPIキー（指定がなければ環境変数から取得）
+        
+    Returns:
+        新しいRedmineAssistantインスタンス
+    """
+    global _assistant
+    with _assistant_lock:
+        previous = _assistant
+        _assistant = RedmineAssistant(api_key=api_key)
+    if previous is not None:
+        # 実行中のリクエスト（ストリーミングを含む）が終わるのを待ってから古いクライアントを停止する
+        timer = threading.Timer(_CLIENT_CLOSE_GRACE_SECONDS, previous.client.close)
+        timer.daemon = True
+        timer.start()
+    return _assistant
+
+async def run_health_probe(interval: float = 300.0) -> None:
+    """
+    共有アシスタントの接続テストを定期的にバックグラウンドで実行
+    
+    Args:
+        interval: 接続テストの間隔（秒）
+    """
+    while True:
+        try:
+            assistant = get_assistant()
+            if assistant.api_key:
+                await asyncio.to_thread(assistant.probe)
+        except Exception as e:
+            logger.error(f"Gemini API接続テストの定期実行中にエラー: {str(e)}")
+        await asyncio.sleep(interval)
@@ -5,6 +5,7 @@ Redmineチケット管理エージェントのWebアプリケーションエン
 """
 
 import os
+import hmac
 import json
 import logging
 import asyncio
@@ -14,7 +15,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, time
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Body, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -28,8 +29,12 @@ setup_logging(log_file="logs/redmine_agent.log", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from .core import RedmineAgent
+from .redmine_mirror import RedmineMirror
+from .redmine_webhook import RedmineWebhookProcessor
+from .daily_digest import DailyDigestPipeline
 from .linebot_adapter import LineBotAdapter
-from .scheduler import start_scheduler, schedule_daily_tasks
+from .scheduler import start_scheduler, schedule_daily_tasks, get_job_scheduler
+from .telemetry import span, get_registry
 
 # LLMのインポート状態をチェック
 import importlib.util
@@ -39,7 +44,7 @@ LLM_READY = False
 if importlib.util.find_spec("google.generativeai") is not None:
     LLM_AVAILABLE = True
     try:
-        from .llm_helper import RedmineAssistant
+        from .llm_helper import get_assistant, reset_assistant, run_health_probe
         LLM_READY = True
     except (ImportError, ModuleNotFoundError) as e:
         LLM_READY = False
@@ -57,6 +62,9 @@ REDMINE_URL = os.getenv("REDMINE_URL", "http://localhost:3000")
 REDMINE_API_KEY = os.getenv("REDMINE_API_KEY", "dummy_api_key_for_development")
 LINE_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN", "dummy_line_token_for_development")
 USER_ID_MAPPING = json.loads(os.getenv("USER_ID_MAPPING", '{"1": "U0082f5630775769cb2655fb503e958bb"}'))
+REDMINE_WEBHOOK_SECRET = os.getenv("REDMINE_WEBHOOK_SECRET", "")
+# シークレットなしでRedmine Webhookを受け付ける（信頼できるネットワーク内でのみ使用すること）
+REDMINE_WEBHOOK_ALLOW_UNAUTHENTICATED = os.getenv("REDMINE_WEBHOOK_ALLOW_UNAUTHENTICATED", "false").lower() in ("true", "1", "yes")
 
 # 初期化
 redmine_agent = RedmineAgent(
@@ -64,6 +72,13 @@ redmine_agent = RedmineAgent(
     api_key=REDMINE_API_KEY
 )
 
+# 読み取り用のローカルミラー（同期はスケジューラのジョブで行う）
+if get_config("mirror.enabled", True) is not False:
+    try:
+        redmine_agent.mirror = RedmineMirror(REDMINE_URL, redmine_agent.headers)
+    except Exception as e:
+        logger.error(f"Redmineミラーの初期化に失敗しました: {e}")
+
 # LINE adapterを初期化
 # 本番環境ではLINE BOT SDKのインストールが必要
 try:
@@ -76,20 +91,49 @@ except Exception as e:
     logger.error(f"Failed to initialize LINE Bot adapter: {e}")
     line_adapter = None
 
+# Redmine Webhookの受信（ミラーの更新と購読者への通知）
+webhook_processor = RedmineWebhookProcessor(
+    mirror=redmine_agent.mirror,
+    notify=line_adapter.send_message if line_adapter else None,
+    user_id_mapping=USER_ID_MAPPING,
+    fetch_issue=None if redmine_agent.mirror else redmine_agent.fetch_issue
+)
+
+# 朝・夕方のレポートの事前生成（チケットの変更を受けて該当ユーザー分を作り直す）
+digest_pipeline = None
+if get_config("digest.enabled", True) is not False:
+    try:
+        digest_pipeline = DailyDigestPipeline(redmine_agent, USER_ID_MAPPING)
+        webhook_processor.listeners.append(digest_pipeline.on_issue_changed)
+        # LINEやAPIからの更新はミラーに直接反映されるため、同期を待たずに作り直し対象にする
+        if redmine_agent.mirror:
+            redmine_agent.mirror.listeners.append(digest_pipeline.mark_dirty)
+    except Exception as e:
+        logger.error(f"日次レポートの事前生成の初期化に失敗しました: {e}")
+
 # スケジューラータスクのハンドル
 scheduler_task = None
+# LLM接続テストタスクのハンドル
+llm_probe_task = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """アプリケーションのライフサイクルを管理"""
     # Startup
-    global scheduler_task
+    global scheduler_task, llm_probe_task
+    if LLM_READY:
+        llm_probe_task = asyncio.create_task(
+            run_health_probe(interval=get_config("llm.health_check_interval", 300))
+        )
+        logger.info("Started LLM health probe task")
+    
     if line_adapter:
         scheduler_task = asyncio.create_task(
             start_scheduler(
                 line_adapter=line_adapter,
                 redmine_agent=redmine_agent,
-                user_id_mapping=USER_ID_MAPPING
+                user_id_mapping=USER_ID_MAPPING,
+                digest_pipeline=digest_pipeline
             )
         )
         logger.info("Started scheduler task")
@@ -104,6 +148,13 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
         logger.info("Shutdown: Scheduler task cancelled")
+    
+    if llm_probe_task:
+        llm_probe_task.cancel()
+        try:
+            await llm_probe_task
+        except asyncio.CancelledError:
+            pass
 
 app = FastAPI(
     title="Redmine Agent",
@@ -121,6 +172,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """各リクエストの処理時間をエンドポイントごとに計測"""
+    with span("http.request", method=request.method) as request_span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        request_span.set(status=response.status_code, endpoint=route.path if route else "unmatched")
+        return response
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus形式のメトリクス"""
+    return PlainTextResponse(get_registry().render(), media_type="text/plain; version=0.0.4")
+
 class LineWebhookRequest(BaseModel):
     user: str
     type: str
@@ -153,15 +218,16 @@ async def line_webhook(request: LineWebhookRequest, background_tasks: Background
     if not request.message:
         raise HTTPException(status_code=400, detail="Message content is required for text messages")
     
-    # 応答メッセージを生成
-    response_text = line_adapter.handle_message(request.message, user_id)
+    # 応答メッセージを生成（ストリーミング応答のコマンドは処理中に送信済みで、空文字列を返す）
+    response_text = await asyncio.to_thread(line_adapter.handle_message, request.message, user_id)
     
     # 非同期でメッセージを送信
-    background_tasks.add_task(
-        line_adapter.send_message,
-        user_id,
-        response_text
-    )
+    if response_text:
+        background_tasks.add_task(
+            line_adapter.send_message,
+            user_id,
+            response_text
+        )
     
     return {"status": "ok", "message": "Message processed"}
 
@@ -195,15 +261,16 @@ async def receive_message(request: Request, background_tasks: BackgroundTasks):
             logger.error("LINE adapter is not initialized")
             raise HTTPException(status_code=500, detail="LINE integration not configured")
         
-        # メッセージを処理
-        response_text = line_adapter.handle_message(message_text, user_id)
+        # メッセージを処理（ストリーミング応答のコマンドは処理中に送信済みで、空文字列を返す）
+        response_text = await asyncio.to_thread(line_adapter.handle_message, message_text, user_id)
         
         # 応答を送信
-        background_tasks.add_task(
-            line_adapter.send_message,
-            user_id,
-            response_text
-        )
+        if response_text:
+            background_tasks.add_task(
+                line_adapter.send_message,
+                user_id,
+                response_text
+            )
         
         return {"status": "ok", "message": "Message processed successfully"}
         
@@ -219,8 +286,11 @@ async def send_morning_report(background_tasks: BackgroundTasks):
     
     for redmine_user_id, line_user_id in USER_ID_MAPPING.items():
         try:
-            tasks = redmine_agent.get_daily_tasks(user_id=int(redmine_user_id))
-            report = redmine_agent.format_morning_report(tasks)
+            if digest_pipeline:
+                report = await asyncio.to_thread(digest_pipeline.get_report, redmine_user_id, "morning")
+            else:
+                tasks = redmine_agent.get_daily_tasks(user_id=int(redmine_user_id))
+                report = redmine_agent.format_morning_report(tasks)
             
             background_tasks.add_task(
                 line_adapter.send_message,
@@ -244,17 +314,20 @@ async def send_evening_report(background_tasks: BackgroundTasks):
     
     for redmine_user_id, line_user_id in USER_ID_MAPPING.items():
         try:
-            # 今日の作業時間を取得
-            time_entries = redmine_agent.get_time_entries(
-                user_id=int(redmine_user_id),
-                from_date=today,
-                to_date=today
-            )
-            
-            # 完了したタスク
-            completed_tasks = []
-            
-            report = redmine_agent.format_evening_report(completed_tasks, time_entries)
+            if digest_pipeline:
+                report = await asyncio.to_thread(digest_pipeline.get_report, redmine_user_id, "evening")
+            else:
+                # 今日の作業時間を取得
+                time_entries = redmine_agent.get_time_entries(
+                    user_id=int(redmine_user_id),
+                    from_date=today,
+                    to_date=today
+                )
+
+                # 完了したタスク
+                completed_tasks = redmine_agent.get_completed_issues(today, user_id=int(redmine_user_id))
+
+                report = redmine_agent.format_evening_report(completed_tasks, time_entries)
             
             background_tasks.add_task(
                 line_adapter.send_message,
@@ -268,6 +341,76 @@ async def send_evening_report(background_tasks: BackgroundTasks):
     
     return {"status": "ok", "message": "Evening reports scheduled"}
 
+@app.get("/api/scheduler/jobs")
+async def get_scheduler_jobs():
+    """スケジュール済みジョブと次回実行時刻を取得"""
+    job_scheduler = get_job_scheduler()
+    if not job_scheduler:
+        raise HTTPException(status_code=503, detail="Scheduler is not running")
+    return {"jobs": job_scheduler.get_jobs()}
+
+@app.get("/api/mirror/status")
+async def get_mirror_status():
+    """Redmineローカルミラーの同期状態を取得"""
+    if not redmine_agent.mirror:
+        raise HTTPException(status_code=503, detail="Redmine mirror is disabled")
+    return redmine_agent.mirror.status()
+
+@app.post("/api/mirror/sync")
+async def sync_mirror(full: bool = False):
+    """Redmineローカルミラーを今すぐ同期"""
+    if not redmine_agent.mirror:
+        raise HTTPException(status_code=503, detail="Redmine mirror is disabled")
+    sync = redmine_agent.mirror.sync_full if full else redmine_agent.mirror.sync_incremental
+    result = await asyncio.to_thread(sync)
+    return {"synced": result, "status": redmine_agent.mirror.status()}
+
+@app.get("/api/digest/status")
+async def get_digest_status():
+    """事前生成した日次レポートの状態を取得"""
+    if not digest_pipeline:
+        raise HTTPException(status_code=503, detail="Daily digest is disabled")
+    return digest_pipeline.status()
+
+@app.post("/api/digest/refresh")
+async def refresh_digest(force: bool = False):
+    """日次レポートを今すぐ作り直す"""
+    if not digest_pipeline:
+        raise HTTPException(status_code=503, detail="Daily digest is disabled")
+    refreshed = await asyncio.to_thread(digest_pipeline.refresh, force)
+    return {"refreshed": refreshed, "status": digest_pipeline.status()}
+
+@app.post("/api/webhook/redmine")
+async def redmine_webhook(request: Request):
+    """Redmine Webhookエンドポイント（チケットの作成・更新の通知を受け取る）"""
+    if REDMINE_WEBHOOK_SECRET:
+        token = request.headers.get("X-Redmine-Webhook-Token") or request.query_params.get("token", "")
+        if not hmac.compare_digest(token, REDMINE_WEBHOOK_SECRET):
+            raise HTTPException(status_code=401, detail="Invalid webhook token")
+    elif not REDMINE_WEBHOOK_ALLOW_UNAUTHENTICATED:
+        raise HTTPException(status_code=503, detail="Redmine webhook secret is not configured")
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    issue_id = webhook_processor.submit(payload)
+    if issue_id is None:
+        raise HTTPException(status_code=422, detail="Issue id not found in payload")
+    return {"status": "accepted", "issue_id": issue_id}
+
+@app.get("/api/webhook/redmine/stats")
+async def get_redmine_webhook_stats():
+    """Redmine Webhookの受信・処理の統計情報を取得"""
+    return webhook_processor.get_stats()
+
+@app.get("/api/intent/stats")
+async def get_intent_stats():
+    """意図判定の段ごとの判定率と処理時間を取得"""
+    if not line_adapter:
+        raise HTTPException(status_code=503, detail="LINE adapter is not configured")
+    return line_adapter.intent_pipeline.get_stats()
+
 @app.get("/api/tasks/daily")
 async def get_daily_tasks(user_id: Optional[int] = None):
     """本日のタスクを取得"""
@@ -320,7 +463,7 @@ async def analyze_ticket_urgency(issue_id: int):
             raise HTTPException(status_code=400, detail="LLM機能が利用できません")
         
         # 緊急度分析
-        llm_assistant = RedmineAssistant()
+        llm_assistant = get_assistant()
         urgency_data = llm_assistant.evaluate_ticket_urgency(issue_data)
         
         # 基本情報を追加
@@ -409,6 +552,28 @@ async def update_issue(issue_id: int, request: UpdateIssueRequest):
         logger.error(f"Error updating issue: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+class BulkOperationsRequest(BaseModel):
+    time_entries: List[TimeEntryRequest] = []
+    issue_updates: List[UpdateIssueRequest] = []
+    atomic: bool = False
+
+@app.post("/api/bulk")
+async def bulk_operations(request: BulkOperationsRequest):
+    """作業時間の登録とチケットの更新を一括実行"""
+    max_items = get_config("redmine.bulk_max_items", 100)
+    if len(request.time_entries) + len(request.issue_updates) > max_items:
+        raise HTTPException(status_code=400, detail=f"Too many operations (max {max_items})")
+    try:
+        return await asyncio.to_thread(
+            redmine_agent.bulk_update,
+            time_entries=[entry.dict() for entry in request.time_entries],
+            issue_updates=[update.dict() for update in request.issue_updates],
+            atomic=request.atomic
+        )
+    except Exception as e:
+        logger.error(f"Error in bulk operations: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # LLM設定用のモデル
 class LlmConfigRequest(BaseModel):
     api_key: Optional[str] = None
@@ -425,10 +590,13 @@ async def get_llm_status():
         
         if LLM_READY:
             try:
-                # LLM機能がインポートされていれば、APIキーの状態も確認
-                llm_assistant = RedmineAssistant()
-                result["api_connected"] = llm_assistant._test_api_connection()
+                # 接続状態はバックグラウンドの接続テストとサーキットブレーカーから判定
+                llm_assistant = get_assistant()
+                result.update(llm_assistant.health())
                 result["api_keys_count"] = len(llm_assistant.api_keys)
+                result["api_keys"] = llm_assistant.client.get_stats()
+                if llm_assistant.response_cache:
+                    result["cache"] = llm_assistant.response_cache.get_stats()
             except Exception as e:
                 result["api_connected"] = False
                 result["error"] = str(e)
@@ -460,8 +628,8 @@ async def configure_llm(config: LlmConfigRequest):
             
             # 動作確認
             try:
-                llm_assistant = RedmineAssistant(api_key=config.api_key)
-                if llm_assistant._test_api_connection():
+                llm_assistant = reset_assistant(api_key=config.api_key)
+                if llm_assistant.probe():
                     result = {"status": "success", "message": "APIキーの設定と接続テストに成功しました"}
                 else:
                     result = {"status": "warning", "message": "APIキーを設定しましたが、接続テストに失敗しました"}
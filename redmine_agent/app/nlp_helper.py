@@ -7,10 +7,76 @@ NLPヘルパー
 
 import re
 import logging
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, List
 
 logger = logging.getLogger(__name__)
 
+# コマンドごとのキーワード（extract_command_intent の判定順）
+TODAY_KEYWORDS = ["今日のタスク", "今日の予定", "本日のタスク", "本日の予定"]
+UPCOMING_KEYWORDS = ["今後のタスク", "予定", "スケジュール", "今後"]
+LOG_KEYWORDS = ["記録", "時間", "ログ", "作業"]
+STATUS_KEYWORDS = ["ステータス", "状態"]
+PROGRESS_KEYWORDS = ["進捗", "完了率", "進度"]
+SUMMARY_KEYWORDS = ["要約", "サマリー", "詳細"]
+REPORT_KEYWORDS = ["レポート", "報告"]
+WEEKLY_KEYWORDS = ["週間", "ウィーク", "週次"]
+OPTIMIZE_KEYWORDS = ["効率", "最適", "統合", "まとめ"]
+HELP_KEYWORDS = ["ヘルプ", "使い方", "help", "コマンド"]
+
+COMMENT_PATTERNS = [
+    r'内容[はが：:]\s*「?([^」]+)」?',
+    r'コメント[はが：:]\s*「?([^」]+)」?',
+    r'「([^」]+)」',
+]
+
+# 作業時間・進捗率・日数・時刻・日付など、単位が付いた数値（チケット番号とはみなさない）
+_QUANTITY_SUFFIX = r'\s*(?:時間|hours?(?![a-z])|h(?![a-z])|[%％]|分|日|days?(?![a-z])|時|月|年|[:：]\d)'
+
+# 明示されたチケット番号（「#12」「チケット12」）
+_EXPLICIT_TICKET = re.compile(r'(?:#|チケット\s*#?)\s*(\d+)')
+
+def extract_explicit_ticket_id(text: str) -> Optional[str]:
+    """テキストから「#12」「チケット12」の形で明示されたチケット番号だけを抽出"""
+    match = _EXPLICIT_TICKET.search(text)
+    return match.group(1) if match else None
+
+def extract_ticket_id(text: str) -> Optional[str]:
+    """テキストからチケット番号を抽出（明示された番号を優先し、単位が付いた数値や日付・時刻は除く）"""
+    explicit = extract_explicit_ticket_id(text)
+    if explicit:
+        return explicit
+    match = re.search(r'(?<![\d.])(?<!月)(?<!\d[:：])(\d+)(?![\d.])(?!' + _QUANTITY_SUFFIX + r')', text)
+    return match.group(1) if match else None
+
+def extract_hours(text: str) -> Optional[str]:
+    """テキストから作業時間（時間単位）を抽出"""
+    match = re.search(r'(\d+\.?\d*)\s*(時間|hours?|h)', text)
+    return match.group(1) if match else None
+
+def extract_progress(text: str) -> Optional[str]:
+    """テキストから進捗率（%）を抽出"""
+    match = re.search(r'(\d+)\s*[%％]', text)
+    return match.group(1) if match else None
+
+def extract_status_id(text: str) -> Optional[str]:
+    """テキストからステータスIDを抽出（ステータス名からの推測を含む）"""
+    status_match = re.search(r'ステータス\s*[を]?\s*(\d+)', text)
+    if status_match:
+        return status_match.group(1)
+    if "完了" in text or "done" in text:
+        return "5"  # 5 = 完了 (要確認)
+    if "進行中" in text or "in progress" in text:
+        return "2"  # 2 = 進行中 (要確認)
+    return None
+
+def extract_comment(text: str, patterns: Optional[List[str]] = None) -> Optional[str]:
+    """テキストからコメント部分を抽出"""
+    for pattern in patterns or COMMENT_PATTERNS:
+        comment_match = re.search(pattern, text)
+        if comment_match:
+            return comment_match.group(1)
+    return None
+
 def extract_command_intent(text: str) -> Tuple[str, str]:
     """
     メッセージテキストからコマンドの意図とパラメータを抽出
@@ -24,11 +90,11 @@ def extract_command_intent(text: str) -> Tuple[str, str]:
     text = text.lower()
     
     # 今日のタスクを確認
-    if any(keyword in text for keyword in ["今日のタスク", "今日の予定", "本日のタスク", "本日の予定"]):
+    if any(keyword in text for keyword in TODAY_KEYWORDS):
         return "today", ""
     
     # 今後のタスクを確認
-    if any(keyword in text for keyword in ["今後のタスク", "予定", "スケジュール", "今後"]):
+    if any(keyword in text for keyword in UPCOMING_KEYWORDS):
         # 日数を抽出
         days_match = re.search(r'(\d+)\s*(日|days)', text)
         if days_match:
@@ -37,99 +103,74 @@ def extract_command_intent(text: str) -> Tuple[str, str]:
         return "tasks", ""
     
     # 作業時間記録
-    if any(keyword in text for keyword in ["記録", "時間", "ログ", "作業"]):
+    if any(keyword in text for keyword in LOG_KEYWORDS):
         # チケット番号を抽出
-        ticket_match = re.search(r'[#]?(\d+)', text)
-        if not ticket_match:
+        issue_id = extract_ticket_id(text)
+        if not issue_id:
             return "help", "チケット番号が見つかりません"
-            
-        issue_id = ticket_match.group(1)
         
         # 時間数を抽出
-        hours_match = re.search(r'(\d+\.?\d*)\s*(時間|hours?|h)', text)
-        if not hours_match:
+        hours = extract_hours(text)
+        if not hours:
             return "help", "作業時間が見つかりません"
-            
-        hours = hours_match.group(1)
         
         # コメント部分を抽出
-        for pattern in [
-            r'内容[はが：:]\s*「?([^」]+)」?',
-            r'コメント[はが：:]\s*「?([^」]+)」?',
-            r'「([^」]+)」',
-        ]:
-            comment_match = re.search(pattern, text)
-            if comment_match:
-                comment = comment_match.group(1)
-                return "log", f"{issue_id} {hours} {comment}"
+        comment = extract_comment(text)
+        if comment:
+            return "log", f"{issue_id} {hours} {comment}"
         
         # コメント部分が見つからない場合
         return "log", f"{issue_id} {hours}"
     
     # ステータス更新
-    if any(keyword in text for keyword in ["ステータス", "状態"]):
+    if any(keyword in text for keyword in STATUS_KEYWORDS):
         # チケット番号を抽出
-        ticket_match = re.search(r'[#]?(\d+)', text)
-        if not ticket_match:
+        issue_id = extract_ticket_id(text)
+        if not issue_id:
             return "help", "チケット番号が見つかりません"
-            
-        issue_id = ticket_match.group(1)
         
-        # ステータスIDを抽出 (簡易的に数字を検索)
-        status_match = re.search(r'ステータス\s*[を]?\s*(\d+)', text)
-        if status_match:
-            status_id = status_match.group(1)
+        # ステータスIDを抽出 (数字またはステータス名から推測)
+        status_id = extract_status_id(text)
+        if status_id:
             return "status", f"{issue_id} {status_id}"
         
-        # ステータス名から推測
-        if "完了" in text or "done" in text:
-            return "status", f"{issue_id} 5"  # 5 = 完了 (要確認)
-        elif "進行中" in text or "in progress" in text:
-            return "status", f"{issue_id} 2"  # 2 = 進行中 (要確認)
-        
         return "help", "ステータスが特定できません"
     
     # 進捗更新
-    if any(keyword in text for keyword in ["進捗", "完了率", "進度"]):
+    if any(keyword in text for keyword in PROGRESS_KEYWORDS):
         # チケット番号を抽出
-        ticket_match = re.search(r'[#]?(\d+)', text)
-        if not ticket_match:
+        issue_id = extract_ticket_id(text)
+        if not issue_id:
             return "help", "チケット番号が見つかりません"
-            
-        issue_id = ticket_match.group(1)
         
         # 進捗率を抽出
-        progress_match = re.search(r'(\d+)\s*[%％]', text)
-        if progress_match:
-            progress = progress_match.group(1)
-            
+        progress = extract_progress(text)
+        if progress:
             # コメント部分を抽出
-            comment_match = re.search(r'内容[はが：:]\s*「?([^」]+)」?', text)
-            comment = comment_match.group(1) if comment_match else ""
+            comment = extract_comment(text, COMMENT_PATTERNS[:1]) or ""
             
             return "update", f"{issue_id} {progress} {comment}".strip()
         
         return "help", "進捗率が特定できません"
     
     # チケット要約
-    if any(keyword in text for keyword in ["要約", "サマリー", "詳細"]):
+    if any(keyword in text for keyword in SUMMARY_KEYWORDS):
         # チケット番号を抽出
-        ticket_match = re.search(r'[#]?(\d+)', text)
-        if ticket_match:
-            issue_id = ticket_match.group(1)
+        issue_id = extract_ticket_id(text)
+        if issue_id:
             return "summary", issue_id
         
         return "help", "チケット番号が見つかりません"
     
     # レポート
-    if any(keyword in text for keyword in ["レポート", "報告"]):
-        if any(keyword in text for keyword in ["週間", "ウィーク", "週次"]):
+    if any(keyword in text for keyword in REPORT_KEYWORDS):
+        if any(keyword in text for keyword in WEEKLY_KEYWORDS):
             return "report", "week"
         else:
             return "report", "today"
     
     # 効率化提案
-    if any(keyword in text for keyword in ["効率", "最適", "統合", "まとめ"]):
+    if any(keyword in text for keyword in OPTIMIZE_KEYWORDS):
         return "optimize", ""
     
     # コマンドが特定できない場合
@@ -0,0 +1,296 @@
+"""
+Redmineチケット管理エージェント - 優先度スコア計算
+
+タスクリストを列（期限までの日数・優先度・進捗率）ごとの配列に変換し、
+期限・優先度・進捗率に基づく重み付きスコアを一括で計算します。
+NumPyがインストールされていればベクトル演算で、なければ純Pythonで計算します。
+タスクリストごとにインスタンスを保持し（`get_priority_scorer`）、前回から変わったチケットの行だけを再計算します。
+"""
+
+import logging
+import datetime
+import threading
+import importlib.util
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+from .config import get_config
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+if HAS_NUMPY:
+    import numpy as np
+
+# 優先度名から段階への対応（Redmineの既定の優先度）
+PRIORITY_LEVELS = {"低": 0, "通常": 1, "高": 2, "急いで": 3, "今すぐ": 4}
+
+# スコアの重み（`priority_scorer.weights` で上書き可能）
+DEFAULT_WEIGHTS = {
+    "overdue": 100,    # 期限切れ
+    "due_today": 90,   # 今日期限
+    "due_3days": 80,   # 3日以内
+    "due_week": 70,    # 1週間以内
+    "priority": 10,    # 優先度1段階あたり
+    "near_done": 15,   # 進捗率80%以上
+}
+
+# 期限なしを表す値
+NO_DUE = -(2 ** 31)
+
+
+@lru_cache(maxsize=4096)
+def _due_ordinal(due_date: Optional[str]) -> int:
+    if not due_date:
+        return NO_DUE
+    try:
+        return datetime.date.fromisoformat(due_date).toordinal()
+    except ValueError:
+        return NO_DUE
+
+
+def _priority_level(priority: Optional[Dict[str, Any]]) -> int:
+    priority = priority or {}
+    level = PRIORITY_LEVELS.get(priority.get("name", ""))
+    if level is None:
+        # 名前が不明な場合はRedmineの既定のID（1=低 ～ 5=今すぐ）から推定
+        priority_id = priority.get("id")
+        level = min(4, max(0, priority_id - 1)) if isinstance(priority_id, int) else 1
+    return level
+
+
+class PriorityScorer:
+    """列指向の優先度スコア計算エンジン"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        """
+        初期化
+
+        Args:
+            weights: スコアの重み（指定がなければ設定 `priority_scorer.weights` と既定値を使用）
+        """
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights if weights is not None else get_config("priority_scorer.weights", {}) or {})
+
+        self._lock = threading.RLock()
+        self._tasks: List[Dict[str, Any]] = []
+        self._rows: Dict[Any, int] = {}
+        self._due: List[int] = []
+        self._priority: List[int] = []
+        self._done: List[int] = []
+        # 計算済みスコア（計算日ごと）
+        self._scores = None
+        self._scored_on: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @staticmethod
+    def _columns(task: Dict[str, Any]) -> Tuple[int, int, int]:
+        return _due_ordinal(task.get("due_date")), _priority_level(task.get("priority")), task.get("done_ratio") or 0
+
+    def load(self, tasks: List[Dict[str, Any]]) -> "PriorityScorer":
+        """
+        タスクリストを読み込む（既存の内容は置き換える）
+
+        Args:
+            tasks: Redmineのチケットのリスト
+
+        Returns:
+            自身（メソッドチェーン用）
+        """
+        columns = [self._columns(task) for task in tasks]
+        with self._lock:
+            self._tasks = list(tasks)
+            self._rows = {task.get("id"): row for row, task in enumerate(self._tasks)}
+            self._due = [column[0] for column in columns]
+            self._priority = [column[1] for column in columns]
+            self._done = [column[2] for column in columns]
+            self._scores = None
+        return self
+
+    def update(self, task: Dict[str, Any]) -> None:
+        """
+        1件のチケットを追加または更新（計算済みのスコアはその行だけ再計算）
+
+        Args:
+            task: Redmineのチケット
+        """
+        due, priority, done = self._columns(task)
+        with self._lock:
+            row = self._rows.get(task.get("id"))
+            if row is None:
+                self._rows[task.get("id")] = len(self._tasks)
+                self._tasks.append(task)
+                self._due.append(due)
+                self._priority.append(priority)
+                self._done.append(done)
+                if self._scores is not None:
+                    score = self._score_one(due, priority, done, self._scored_on)
+                    self._scores = np.append(self._scores, score) if HAS_NUMPY else self._scores + [score]
+                return
+
+            self._tasks[row] = task
+            self._due[row] = due
+            self._priority[row] = priority
+            self._done[row] = done
+            if self._scores is not None:
+                self._scores[row] = self._score_one(due, priority, done, self._scored_on)
+
+    def remove(self, task_id: Any) -> None:
+        """
+        チケットを削除
+
+        Args:
+            task_id: チケットID
+        """
+        self._drop({task_id})
+
+    def _drop(self, task_ids: set) -> None:
+        """指定したチケットの行を削除（計算済みのスコアは残りの行の分をそのまま使う）"""
+        with self._lock:
+            keep = [row for row, task in enumerate(self._tasks) if task.get("id") not in task_ids]
+            if len(keep) == len(self._tasks):
+                return
+            self._tasks = [self._tasks[row] for row in keep]
+            self._due = [self._due[row] for row in keep]
+            self._priority = [self._priority[row] for row in keep]
+            self._done = [self._done[row] for row in keep]
+            self._rows = {task.get("id"): row for row, task in enumerate(self._tasks)}
+            if self._scores is not None:
+                self._scores = (self._scores[np.asarray(keep, dtype=np.int64)] if HAS_NUMPY
+                                else [self._scores[row] for row in keep])
+
+    def sync(self, tasks: List[Dict[str, Any]]) -> "PriorityScorer":
+        """
+        タスクリストとの差分を反映（なくなったチケットを削除し、追加・変更されたチケットの行だけ再計算）
+
+        Args:
+            tasks: Redmineのチケットのリスト
+
+        Returns:
+            自身（メソッドチェーン用）
+        """
+        with self._lock:
+            self._drop(set(self._rows) - {task.get("id") for task in tasks})
+            for task in tasks:
+                row = self._rows.get(task.get("id"))
+                if row is None or self._tasks[row] != task:
+                    self.update(task)
+        return self
+
+    def _score_one(self, due: int, priority: int, done: int, today: int) -> float:
+        w = self.weights
+        score = 0.0
+        if due != NO_DUE:
+            days = due - today
+            if days < 0:
+                score += w["overdue"]
+            elif days == 0:
+                score += w["due_today"]
+            elif days <= 3:
+                score += w["due_3days"]
+            elif days <= 7:
+                score += w["due_week"]
+        score += priority * w["priority"]
+        if done >= 80:
+            score += w["near_done"]
+        return score
+
+    def _score_all(self, today: int):
+        if not HAS_NUMPY:
+            return [self._score_one(*columns, today) for columns in zip(self._due, self._priority, self._done)]
+
+        w = self.weights
+        due = np.asarray(self._due, dtype=np.int64)
+        days = due - today
+        due_score = np.select(
+            [days < 0, days == 0, days <= 3, days <= 7],
+            [w["overdue"], w["due_today"], w["due_3days"], w["due_week"]],
+            default=0
+        ).astype(np.float64)
+        due_score[due == NO_DUE] = 0.0
+        return (due_score
+                + np.asarray(self._priority, dtype=np.float64) * w["priority"]
+                + (np.asarray(self._done, dtype=np.int64) >= 80) * w["near_done"])
+
+    def scores(self, today: Optional[datetime.date] = None) -> List[float]:
+        """
+        全タスクのスコアを取得（読み込み順）
+
+        Args:
+            today: 基準日（省略時は今日）
+
+        Returns:
+            スコアのリスト
+        """
+        today_ordinal = (today or datetime.date.today()).toordinal()
+        with self._lock:
+            if self._scores is None or self._scored_on != today_ordinal:
+                self._scores = self._score_all(today_ordinal)
+                self._scored_on = today_ordinal
+            return [float(score) for score in self._scores]
+
+    def rank(self, tasks: List[Dict[str, Any]], today: Optional[datetime.date] = None,
+             limit: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        タスクリストとの差分を反映してからスコアの高い順に取得（反映と取得の間に他のスレッドの反映は入らない）
+
+        Args:
+            tasks: Redmineのチケットのリスト
+            today: 基準日（省略時は今日）
+            limit: 取得する件数（省略時はすべて）
+
+        Returns:
+            (タスク, スコア)のリスト
+        """
+        with self._lock:
+            return self.sync(tasks).ranked(today, limit)
+
+    def ranked(self, today: Optional[datetime.date] = None, limit: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        スコアの高い順にタスクを取得（同点の場合は追加順）
+
+        Args:
+            today: 基準日（省略時は今日）
+            limit: 取得する件数（省略時はすべて）
+
+        Returns:
+            (タスク, スコア)のリスト
+        """
+        with self._lock:
+            self.scores(today)
+            scores = self._scores
+            count = len(self._tasks)
+            if not count:
+                return []
+            if HAS_NUMPY:
+                order = np.argsort(-scores, kind="stable")
+                if limit is not None:
+                    order = order[:limit]
+                return [(self._tasks[row], float(scores[row])) for row in order]
+            order = sorted(range(count), key=lambda row: -scores[row])
+            return [(self._tasks[row], scores[row]) for row in order[:limit]]
+
+
+# タスクリストごとのスコア計算エンジン（LINEコマンド用）
+_priority_scorers: Dict[str, PriorityScorer] = {}
+_priority_scorers_lock = threading.Lock()
+
+
+def get_priority_scorer(key: str) -> PriorityScorer:
+    """
+    タスクリストごとのPriorityScorerを取得（前回の計算結果を引き継いで差分だけを再計算するために使う）
+
+    Args:
+        key: タスクリストのキー（LINEユーザーIDとコマンドなど）
+
+    Returns:
+        PriorityScorerインスタンス
+    """
+    with _priority_scorers_lock:
+        scorer = _priority_scorers.get(key)
+        if scorer is None:
+            scorer = _priority_scorers[key] = PriorityScorer()
+        return scorer
@@ -0,0 +1,112 @@
+"""
+Redmineチケット管理エージェント - プロンプト圧縮
+
+LLMに渡すチケット情報を、プロンプトで使うフィールドだけに絞り込み、
+区切り文字による表形式で出力します。説明文はトークン予算に合わせて切り詰めます。
+"""
+
+import re
+import logging
+from typing import Dict, List, Any, Optional
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# 表の列名とチケットからの取得方法
+COLUMNS = {
+    "id": lambda issue: issue.get("id"),
+    "subject": lambda issue: issue.get("subject"),
+    "project": lambda issue: (issue.get("project") or {}).get("name"),
+    "tracker": lambda issue: (issue.get("tracker") or {}).get("name"),
+    "status": lambda issue: (issue.get("status") or {}).get("name"),
+    "priority": lambda issue: (issue.get("priority") or {}).get("name"),
+    "assignee": lambda issue: (issue.get("assigned_to") or {}).get("name"),
+    "start": lambda issue: issue.get("start_date"),
+    "due": lambda issue: issue.get("due_date"),
+    "done": lambda issue: issue.get("done_ratio"),
+    "est": lambda issue: issue.get("estimated_hours"),
+    "desc": lambda issue: issue.get("description"),
+}
+
+# 用途ごとの列
+PRIORITIZE_COLUMNS = ["id", "subject", "status", "priority", "due", "done", "est", "desc"]
+OPTIMIZE_COLUMNS = ["id", "subject", "project", "tracker", "status", "priority", "due", "done", "est", "desc"]
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数を概算（ASCIIは約4文字で1トークン、それ以外は1文字1トークン）
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        推定トークン数
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def truncate_to_budget(text: Optional[str], max_tokens: int) -> str:
+    """
+    空白を詰めたうえでトークン予算に収まるよう切り詰める
+
+    Args:
+        text: 対象テキスト
+        max_tokens: トークン予算
+
+    Returns:
+        切り詰めたテキスト（切り詰めた場合は末尾に「…」）
+    """
+    if not text or max_tokens <= 0:
+        return ""
+    text = _WHITESPACE.sub(" ", str(text)).strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    used = 0.0
+    for end, char in enumerate(text):
+        used += 0.25 if ord(char) < 128 else 1
+        if used > max_tokens - 1:
+            return text[:end].rstrip() + "…"
+    return text
+
+
+def _cell(value: Any) -> str:
+    if value is None or value == "":
+        return "-"
+    return _WHITESPACE.sub(" ", str(value)).replace("|", "/")
+
+
+def render_issue_table(issues: List[Dict[str, Any]], columns: List[str],
+                       description_tokens: int = 60, total_tokens: Optional[int] = None) -> str:
+    """
+    チケットのリストを表形式（1行1チケット、| 区切り）で出力
+
+    Args:
+        issues: Redmineのチケットのリスト
+        columns: 出力する列（COLUMNS のキー）
+        description_tokens: チケットごとの説明文のトークン予算
+        total_tokens: 表全体のトークン予算（超える場合は説明文を短くする）
+
+    Returns:
+        表形式のテキスト
+    """
+    if total_tokens and "desc" in columns:
+        base = render_issue_table(issues, [c for c in columns if c != "desc"])
+        remaining = total_tokens - estimate_tokens(base)
+        description_tokens = max(0, min(description_tokens, remaining // max(1, len(issues))))
+
+    lines = ["|".join(columns)]
+    for issue in issues:
+        cells = []
+        for column in columns:
+            value = COLUMNS[column](issue)
+            if column == "desc":
+                value = truncate_to_budget(value, description_tokens)
+            cells.append(_cell(value))
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
@@ -0,0 +1,622 @@
+"""
+Redmineチケット管理エージェント - Redmineローカルミラー
+
+チケット・ジャーナル・作業時間をSQLiteに複製し、読み取り系の処理をローカルで行います。
+同期は `updated_on>=` による差分取得と、夜間の全件照合で行います。
+Redmineが停止・遅延している間も、最後に同期した内容で読み取りを継続できます。
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import datetime
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Set, Tuple, Callable
+
+import requests
+
+from .config import get_config
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# ミラーの保存先
+DEFAULT_DB_PATH = Path(__file__).parent.parent / "data" / "redmine_mirror.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER,
+    status_id INTEGER,
+    is_closed INTEGER NOT NULL DEFAULT 0,
+    priority_id INTEGER,
+    assigned_to_id INTEGER,
+    start_date TEXT,
+    due_date TEXT,
+    done_ratio INTEGER,
+    updated_on TEXT,
+    closed_on TEXT,
+    journals_synced_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_issues_open_assignee ON issues (is_closed, assigned_to_id, due_date);
+CREATE INDEX IF NOT EXISTS idx_issues_open_due ON issues (is_closed, due_date);
+CREATE INDEX IF NOT EXISTS idx_issues_closed_on ON issues (closed_on);
+CREATE INDEX IF NOT EXISTS idx_issues_updated_on ON issues (updated_on);
+
+CREATE TABLE IF NOT EXISTS journals (
+    id INTEGER PRIMARY KEY,
+    issue_id INTEGER NOT NULL,
+    created_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_journals_issue ON journals (issue_id, created_on);
+
+CREATE TABLE IF NOT EXISTS time_entries (
+    id INTEGER PRIMARY KEY,
+    issue_id INTEGER,
+    user_id INTEGER,
+    spent_on TEXT,
+    hours REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_time_entries_issue ON time_entries (issue_id, spent_on);
+CREATE INDEX IF NOT EXISTS idx_time_entries_user ON time_entries (user_id, spent_on);
+CREATE INDEX IF NOT EXISTS idx_time_entries_spent_on ON time_entries (spent_on);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class RedmineMirror:
+    """RedmineのチケットをSQLiteに複製するローカルミラー"""
+
+    def __init__(self, redmine_url: str, headers: Dict[str, str], db_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            redmine_url: RedmineのベースURL
+            headers: Redmine APIのリクエストヘッダー
+            db_path: SQLiteファイルのパス
+        """
+        self.redmine_url = redmine_url
+        self.headers = headers
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.max_staleness = get_config("mirror.max_staleness_seconds", 900)
+        self.time_entry_window_days = get_config("mirror.time_entry_window_days", 7)
+        self.full_sync_days = get_config("mirror.full_sync_days", 90)
+        self.timeout = get_config("mirror.request_timeout", 30)
+
+        # 個別の再取得（更新系APIの実行後など）で変わったデータに関係するユーザーIDを受け取る関数
+        self.listeners: List[Callable[[List[str]], None]] = []
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def _get_state(self, resource: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE resource = ?", (resource,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_state(self, resource: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO sync_state (resource, value) VALUES (?, ?) "
+            "ON CONFLICT(resource) DO UPDATE SET value = excluded.value",
+            (resource, value)
+        )
+
+    @property
+    def ready(self) -> bool:
+        """一度でも同期に成功しているかどうか"""
+        return self._get_state("last_sync_at") is not None
+
+    @property
+    def fresh(self) -> bool:
+        """最後の同期から `mirror.max_staleness_seconds` 以内かどうか"""
+        last_sync = self._get_state("last_sync_at")
+        return last_sync is not None and time.time() - float(last_sync) <= self.max_staleness
+
+    def status(self) -> Dict[str, Any]:
+        """ミラーの状態と件数を取得"""
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("issues", "journals", "time_entries")
+            }
+        last_sync = self._get_state("last_sync_at")
+        last_full_sync = self._get_state("last_full_sync_at")
+        return {
+            "ready": last_sync is not None,
+            "fresh": self.fresh,
+            "last_sync_at": datetime.datetime.fromtimestamp(float(last_sync)).isoformat() if last_sync else None,
+            "last_full_sync_at": datetime.datetime.fromtimestamp(float(last_full_sync)).isoformat() if last_full_sync else None,
+            "issues_updated_on": self._get_state("issues_updated_on"),
+            "last_error": self._get_state("last_error"),
+            **counts
+        }
+
+    def _fetch_all(self, path: str, key: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """ページングしながら全件取得（失敗時は例外）"""
+        items = []
+        offset = 0
+        while True:
+            response = requests.get(
+                f"{self.redmine_url}/{path}",
+                headers=self.headers,
+                params={**params, "limit": 100, "offset": offset},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+            page = data.get(key, [])
+            items.extend(page)
+            offset += len(page)
+            if not page or offset >= data.get("total_count", 0):
+                return items
+
+    def _fetch_closed_status_ids(self) -> set:
+        """完了扱いのステータスIDを取得"""
+        response = requests.get(f"{self.redmine_url}/issue_statuses.json", headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return {status["id"] for status in response.json().get("issue_statuses", []) if status.get("is_closed")}
+
+    def _upsert_issues(self, issues: Iterable[Dict[str, Any]], closed_status_ids: Optional[set] = None) -> None:
+        if closed_status_ids is None:
+            closed_status_ids = set(json.loads(self._get_state("closed_status_ids") or "[]"))
+
+        def is_closed(issue: Dict[str, Any]) -> int:
+            status = issue.get("status") or {}
+            if "is_closed" in status:
+                return 1 if status["is_closed"] else 0
+            return 1 if status.get("id") in closed_status_ids else 0
+
+        self._conn.executemany(
+            "INSERT INTO issues (id, project_id, status_id, is_closed, priority_id, assigned_to_id, "
+            "start_date, due_date, done_ratio, updated_on, closed_on, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET project_id = excluded.project_id, status_id = excluded.status_id, "
+            "is_closed = excluded.is_closed, priority_id = excluded.priority_id, "
+            "assigned_to_id = excluded.assigned_to_id, start_date = excluded.start_date, "
+            "due_date = excluded.due_date, done_ratio = excluded.done_ratio, "
+            "updated_on = excluded.updated_on, closed_on = excluded.closed_on, data = excluded.data",
+            [(
+                issue["id"],
+                (issue.get("project") or {}).get("id"),
+                (issue.get("status") or {}).get("id"),
+                is_closed(issue),
+                (issue.get("priority") or {}).get("id"),
+                (issue.get("assigned_to") or {}).get("id"),
+                issue.get("start_date"),
+                issue.get("due_date"),
+                issue.get("done_ratio", 0),
+                issue.get("updated_on"),
+                issue.get("closed_on"),
+                json.dumps({k: v for k, v in issue.items() if k != "journals"}, ensure_ascii=False)
+            ) for issue in issues]
+        )
+
+    def _replace_journals(self, issue_id: int, journals: List[Dict[str, Any]], updated_on: Optional[str]) -> None:
+        self._conn.execute("DELETE FROM journals WHERE issue_id = ?", (issue_id,))
+        self._conn.executemany(
+            "INSERT INTO journals (id, issue_id, created_on, data) VALUES (?, ?, ?, ?)",
+            [(j["id"], issue_id, j.get("created_on"), json.dumps(j, ensure_ascii=False)) for j in journals]
+        )
+        self._conn.execute("UPDATE issues SET journals_synced_on = ? WHERE id = ?", (updated_on, issue_id))
+
+    def _upsert_time_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO time_entries (id, issue_id, user_id, spent_on, hours, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(
+                entry["id"],
+                (entry.get("issue") or {}).get("id"),
+                (entry.get("user") or {}).get("id"),
+                entry.get("spent_on"),
+                entry.get("hours", 0),
+                json.dumps(entry, ensure_ascii=False)
+            ) for entry in entries]
+        )
+
+    def _stored_rows(self, table: str, columns: str, ids: List[int]) -> Dict[int, sqlite3.Row]:
+        """保存済みの行をIDで取得（_lock を保持した状態で呼び出す）"""
+        rows: Dict[int, sqlite3.Row] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.update({row["id"]: row for row in self._conn.execute(
+                f"SELECT id, {columns} FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )})
+        return rows
+
+    def _changed_issues(self, issues: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Set[str]]:
+        """
+        保存済みの内容から updated_on が進んだチケットと、その担当者（変更前の担当者を含む）を取得
+        （_lock を保持した状態で呼び出す）
+
+        `updated_on>=` の差分取得では前回最後に取得したチケットが毎回含まれるため、それは除かれます。
+        """
+        stored = self._stored_rows("issues", "updated_on, assigned_to_id", [issue["id"] for issue in issues])
+        changed, user_ids = [], set()
+        for issue in issues:
+            row = stored.get(issue["id"])
+            if row is not None and row["updated_on"] == issue.get("updated_on"):
+                continue
+            changed.append(issue)
+            for user_id in ((issue.get("assigned_to") or {}).get("id"), row["assigned_to_id"] if row else None):
+                if user_id is not None:
+                    user_ids.add(str(user_id))
+        return changed, user_ids
+
+    def _changed_time_entries(self, entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Set[str]]:
+        """保存済みの内容から追加・変更された作業時間と、その記録者を取得（_lock を保持した状態で呼び出す）"""
+        stored = self._stored_rows("time_entries", "user_id, data", [entry["id"] for entry in entries])
+        changed, user_ids = [], set()
+        for entry in entries:
+            row = stored.get(entry["id"])
+            if row is not None and row["data"] == json.dumps(entry, ensure_ascii=False):
+                continue
+            changed.append(entry)
+            for user_id in ((entry.get("user") or {}).get("id"), row["user_id"] if row else None):
+                if user_id is not None:
+                    user_ids.add(str(user_id))
+        return changed, user_ids
+
+    def _notify(self, user_ids: Set[str]) -> None:
+        """個別の再取得で変わったデータに関係するユーザーIDをlistenersに渡す"""
+        if not user_ids:
+            return
+        for listener in self.listeners:
+            try:
+                listener(sorted(user_ids))
+            except Exception as e:
+                logger.error(f"ミラーの変更の通知中にエラー: {str(e)}")
+
+    def _record_error(self, error: Exception) -> None:
+        with self._lock:
+            self._set_state("last_error", f"{datetime.datetime.now().isoformat()} {error}")
+            self._conn.commit()
+
+    def sync_incremental(self) -> Dict[str, Any]:
+        """
+        前回の同期以降に更新されたチケットと、直近の作業時間を取得
+
+        ジャーナルは読み取り時に必要に応じて取得します。
+
+        Returns:
+            変更があったチケット・作業時間の件数と、影響するユーザーID（user_ids）
+        """
+        if not self.ready:
+            return self.sync_full()
+
+        with self._sync_lock:
+            try:
+                since = self._get_state("issues_updated_on")
+                params = {"status_id": "*", "sort": "updated_on:asc"}
+                if since:
+                    params["updated_on"] = f">={since}"
+                closed_status_ids = self._fetch_closed_status_ids()
+                issues = self._fetch_all("issues.json", "issues", params)
+                entries_from = (datetime.date.today() - datetime.timedelta(days=self.time_entry_window_days)).isoformat()
+                entries = self._fetch_all("time_entries.json", "time_entries", {"from": entries_from})
+
+                with self._lock:
+                    changed, user_ids = self._changed_issues(issues)
+                    changed_entries, entry_user_ids = self._changed_time_entries(entries)
+                    self._set_state("closed_status_ids", json.dumps(sorted(closed_status_ids)))
+                    self._upsert_issues(changed, closed_status_ids)
+                    self._upsert_time_entries(changed_entries)
+                    if issues:
+                        self._set_state("issues_updated_on", max(issue.get("updated_on") or "" for issue in issues))
+                    self._set_state("last_sync_at", str(time.time()))
+                    self._set_state("last_error", None)
+                    self._conn.commit()
+            except Exception as e:
+                logger.error(f"Redmineミラーの差分同期中にエラー: {str(e)}")
+                self._record_error(e)
+                return {"issues": 0, "time_entries": 0, "user_ids": []}
+
+        logger.info(f"Redmineミラーを差分同期しました (チケット {len(changed)}件, 作業時間 {len(changed_entries)}件)")
+        return {"issues": len(changed), "time_entries": len(changed_entries),
+                "user_ids": sorted(user_ids | entry_user_ids)}
+
+    def sync_full(self) -> Dict[str, Any]:
+        """
+        全チケットと直近 `mirror.full_sync_days` 日分の作業時間を取得し、削除されたものを取り除く
+
+        ジャーナルは読み取り時に必要に応じて取得します。
+
+        Returns:
+            取得件数と、変更・削除があったチケット・作業時間に関係するユーザーID（user_ids）
+        """
+        with self._sync_lock:
+            try:
+                closed_status_ids = self._fetch_closed_status_ids()
+                issues = self._fetch_all("issues.json", "issues", {"status_id": "*", "sort": "updated_on:asc"})
+                entries_from = (datetime.date.today() - datetime.timedelta(days=self.full_sync_days)).isoformat()
+                entries = self._fetch_all("time_entries.json", "time_entries", {"from": entries_from})
+
+                with self._lock:
+                    _, user_ids = self._changed_issues(issues)
+                    _, entry_user_ids = self._changed_time_entries(entries)
+                    user_ids |= entry_user_ids
+                    self._set_state("closed_status_ids", json.dumps(sorted(closed_status_ids)))
+                    self._upsert_issues(issues, closed_status_ids)
+                    issue_ids = [issue["id"] for issue in issues]
+                    self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_ids (id INTEGER PRIMARY KEY)")
+                    self._conn.execute("DELETE FROM seen_ids")
+                    self._conn.executemany("INSERT INTO seen_ids (id) VALUES (?)", [(i,) for i in issue_ids])
+                    user_ids.update(str(row[0]) for row in self._conn.execute(
+                        "SELECT DISTINCT assigned_to_id FROM issues "
+                        "WHERE id NOT IN (SELECT id FROM seen_ids) AND assigned_to_id IS NOT NULL"
+                    ))
+                    self._conn.execute("DELETE FROM issues WHERE id NOT IN (SELECT id FROM seen_ids)")
+                    self._conn.execute("DELETE FROM journals WHERE issue_id NOT IN (SELECT id FROM seen_ids)")
+
+                    self._conn.execute("DELETE FROM seen_ids")
+                    self._conn.executemany("INSERT INTO seen_ids (id) VALUES (?)", [(e["id"],) for e in entries])
+                    user_ids.update(str(row[0]) for row in self._conn.execute(
+                        "SELECT DISTINCT user_id FROM time_entries "
+                        "WHERE spent_on >= ? AND id NOT IN (SELECT id FROM seen_ids) AND user_id IS NOT NULL",
+                        (entries_from,)
+                    ))
+                    self._conn.execute(
+                        "DELETE FROM time_entries WHERE spent_on >= ? AND id NOT IN (SELECT id FROM seen_ids)",
+                        (entries_from,)
+                    )
+                    self._upsert_time_entries(entries)
+
+                    if issues:
+                        self._set_state("issues_updated_on", max(issue.get("updated_on") or "" for issue in issues))
+                    now = str(time.time())
+                    self._set_state("last_sync_at", now)
+                    self._set_state("last_full_sync_at", now)
+                    self._set_state("time_entries_from", entries_from)
+                    self._set_state("last_error", None)
+                    self._conn.commit()
+            except Exception as e:
+                logger.error(f"Redmineミラーの全件同期中にエラー: {str(e)}")
+                self._record_error(e)
+                return {"issues": 0, "time_entries": 0, "user_ids": []}
+
+        logger.info(f"Redmineミラーを全件同期しました (チケット {len(issues)}件, 作業時間 {len(entries)}件)")
+        return {"issues": len(issues), "time_entries": len(entries), "user_ids": sorted(user_ids)}
+
+    def refresh_issue(self, issue_id: int) -> Optional[Dict[str, Any]]:
+        """
+        1件のチケット（ジャーナル含む）を再取得（更新系APIの実行後や通知の受信時に呼び出す）
+
+        Redmineで削除されたチケットはミラーからも削除します。
+        更新日時が変わった場合は、担当者（変更前の担当者を含む）のIDを listeners に渡します。
+
+        Args:
+            issue_id: チケットID
+
+        Returns:
+            取得したチケット（失敗した場合や削除された場合はNone）
+        """
+        try:
+            response = requests.get(
+                f"{self.redmine_url}/issues/{issue_id}.json",
+                headers=self.headers,
+                params={"include": "journals"},
+                timeout=self.timeout
+            )
+            if response.status_code == 404:
+                with self._lock:
+                    user_ids = {str(row[0]) for row in self._conn.execute(
+                        "SELECT assigned_to_id FROM issues WHERE id = ? AND assigned_to_id IS NOT NULL", (issue_id,)
+                    )}
+                    self._conn.execute("DELETE FROM issues WHERE id = ?", (issue_id,))
+                    self._conn.execute("DELETE FROM journals WHERE issue_id = ?", (issue_id,))
+                    self._conn.commit()
+                self._notify(user_ids)
+                return None
+            response.raise_for_status()
+            issue = response.json().get("issue", {})
+            with self._lock:
+                _, user_ids = self._changed_issues([issue])
+                self._upsert_issues([issue])
+                self._replace_journals(issue_id, issue.get("journals", []), issue.get("updated_on"))
+                self._conn.commit()
+            self._notify(user_ids)
+            return issue
+        except Exception as e:
+            logger.warning(f"チケット #{issue_id} のミラー更新に失敗しました: {str(e)}")
+            return None
+
+    def refresh_time_entries(self, issue_id: int) -> None:
+        """
+        1件のチケットの作業時間を再取得
+
+        追加・変更・削除された作業時間があれば、記録者のIDを listeners に渡します。
+
+        Args:
+            issue_id: チケットID
+        """
+        try:
+            entries = self._fetch_all("time_entries.json", "time_entries", {"issue_id": issue_id})
+            with self._lock:
+                _, user_ids = self._changed_time_entries(entries)
+                entry_ids = {entry["id"] for entry in entries}
+                user_ids.update(
+                    str(row["user_id"]) for row in self._conn.execute(
+                        "SELECT id, user_id FROM time_entries WHERE issue_id = ? AND user_id IS NOT NULL", (issue_id,)
+                    ) if row["id"] not in entry_ids
+                )
+                self._conn.execute("DELETE FROM time_entries WHERE issue_id = ?", (issue_id,))
+                self._upsert_time_entries(entries)
+                self._conn.commit()
+            self._notify(user_ids)
+        except Exception as e:
+            logger.warning(f"チケット #{issue_id} の作業時間のミラー更新に失敗しました: {str(e)}")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def open_issues(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        未完了のチケットを優先度の高い順・期限の近い順に取得
+
+        Args:
+            user_id: 担当者のユーザーID（省略時はすべて）
+
+        Returns:
+            チケットのリスト
+        """
+        sql = "SELECT data FROM issues WHERE is_closed = 0"
+        params: tuple = ()
+        if user_id:
+            sql += " AND assigned_to_id = ?"
+            params = (user_id,)
+        sql += " ORDER BY priority_id DESC, due_date IS NULL, due_date ASC"
+        return self._query(sql, params)
+
+    def open_issues_by_user(self, user_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        複数ユーザーの未完了チケットを1回のクエリで取得
+
+        Args:
+            user_ids: 担当者のユーザーIDのリスト
+
+        Returns:
+            ユーザーIDとチケットのリストの対応
+        """
+        result: Dict[int, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return result
+        placeholders = ",".join("?" * len(user_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT assigned_to_id, data FROM issues WHERE is_closed = 0 AND assigned_to_id IN ({placeholders}) "
+                "ORDER BY priority_id DESC, due_date IS NULL, due_date ASC",
+                tuple(user_ids)
+            ).fetchall()
+        for row in rows:
+            result[row["assigned_to_id"]].append(json.loads(row["data"]))
+        return result
+
+    def upcoming_issues(self, from_date: str, to_date: str, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        期限が期間内で開始日が期間の終わり以前の未完了チケットを期限順に取得
+
+        Args:
+            from_date: 期限の下限（YYYY-MM-DD）
+            to_date: 開始日の上限（YYYY-MM-DD）
+            user_id: 担当者のユーザーID（省略時はすべて）
+
+        Returns:
+            チケットのリスト
+        """
+        sql = ("SELECT data FROM issues WHERE is_closed = 0 AND due_date >= ? "
+               "AND (start_date IS NULL OR start_date <= ?)")
+        params: tuple = (from_date, to_date)
+        if user_id:
+            sql += " AND assigned_to_id = ?"
+            params += (user_id,)
+        sql += " ORDER BY due_date ASC"
+        return self._query(sql, params)
+
+    def closed_issues(self, on_date: str, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        指定日に完了したチケットを取得
+
+        Args:
+            on_date: 完了日（YYYY-MM-DD）
+            user_id: 担当者のユーザーID（省略時はすべて）
+
+        Returns:
+            チケットのリスト
+        """
+        # closed_on はUTC（例: 2025-01-01T00:00:00Z）で保存されているため、ローカル日付の範囲をUTCに変換する
+        day = datetime.date.fromisoformat(on_date)
+        params: tuple = tuple(
+            datetime.datetime.combine(d, datetime.time()).astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            for d in (day, day + datetime.timedelta(days=1))
+        )
+        sql = "SELECT data FROM issues WHERE closed_on >= ? AND closed_on < ?"
+        if user_id:
+            sql += " AND assigned_to_id = ?"
+            params += (user_id,)
+        return self._query(sql + " ORDER BY closed_on", params)
+
+    def get_issue(self, issue_id: int, with_journals: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        チケットを取得
+
+        ジャーナルが最後の更新より古い場合はRedmineから取得し直します
+        （Redmineに接続できない場合は保存済みのジャーナルを返します）。
+
+        Args:
+            issue_id: チケットID
+            with_journals: ジャーナルを含めるかどうか
+
+        Returns:
+            チケット（ミラーにない場合はNone）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_on, journals_synced_on FROM issues WHERE id = ?", (issue_id,)
+            ).fetchone()
+        if not row:
+            return None
+        issue = json.loads(row["data"])
+        if with_journals:
+            if row["journals_synced_on"] != row["updated_on"]:
+                self.refresh_issue(issue_id)
+            issue["journals"] = self._query(
+                "SELECT data FROM journals WHERE issue_id = ? ORDER BY created_on, id", (issue_id,)
+            )
+        return issue
+
+    def covers_time_entries(self, from_date: Optional[str]) -> bool:
+        """
+        指定日以降の作業時間がすべてミラーにあるかどうか（全件同期で取得した範囲に含まれるか）
+
+        Args:
+            from_date: 開始日 (YYYY-MM-DD形式、省略時は全期間)
+
+        Returns:
+            ミラーから読み取れる場合はTrue
+        """
+        covered_from = self._get_state("time_entries_from")
+        return bool(from_date and covered_from and from_date >= covered_from)
+
+    def time_entries(self, issue_id: Optional[int] = None, from_date: Optional[str] = None,
+                     to_date: Optional[str] = None, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        作業時間記録を取得
+
+        Args:
+            issue_id: チケットID (省略可)
+            from_date: 開始日 (YYYY-MM-DD形式、省略可)
+            to_date: 終了日 (YYYY-MM-DD形式、省略可)
+            user_id: ユーザーID (省略可)
+
+        Returns:
+            作業時間記録リスト
+        """
+        conditions = []
+        params: tuple = ()
+        for column, op, value in (("issue_id", "=", issue_id), ("spent_on", ">=", from_date),
+                                  ("spent_on", "<=", to_date), ("user_id", "=", user_id)):
+            if value:
+                conditions.append(f"{column} {op} ?")
+                params += (value,)
+        sql = "SELECT data FROM time_entries"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return self._query(sql + " ORDER BY spent_on DESC, id DESC", params)
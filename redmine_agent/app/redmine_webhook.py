@@ -0,0 +1,329 @@
+"""
+Redmineチケット管理エージェント - Redmine Webhookの受信
+
+Redmineのwebhookプラグイン（またはJSONを送信する任意の仕組み）からの通知を受け取り、
+チケットごとに一定時間まとめてから、ローカルミラーを更新し、
+チケットを購読しているLINEユーザーと担当者に変更を通知します。
+
+通知の内容は受信したJSONではなく、Redmineから取得し直したチケットとジャーナルだけから作成します。
+"""
+
+import time
+from datetime import datetime, timezone
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Callable
+
+from .config import get_config, find_users_with_preference
+from .redmine_mirror import RedmineMirror
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# 購読を保存するユーザー設定のキーの接頭辞（watch:<チケットID>）
+WATCH_KEY_PREFIX = "watch:"
+
+# イベントIDのないwebhookで、最初の受信よりこの秒数前までに作成されたジャーナルを今回の変更とみなす
+JOURNAL_WINDOW_SECONDS = 120
+
+# 変更内容の項目名
+DETAIL_LABELS = {
+    "status_id": "ステータス",
+    "done_ratio": "進捗率",
+    "assigned_to_id": "担当者",
+    "priority_id": "優先度",
+    "due_date": "期日",
+    "start_date": "開始日",
+    "subject": "題名",
+    "estimated_hours": "予定工数",
+}
+
+
+def watch_key(issue_id: int) -> str:
+    """チケットの購読を保存するユーザー設定のキー"""
+    return f"{WATCH_KEY_PREFIX}{issue_id}"
+
+
+def parse_webhook_payload(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    webhookの内容をイベントに変換
+
+    redmine_webhookプラグインの形式（{"payload": {"action", "issue", "journal"}}）のほか、
+    {"issue": {...}} や {"issue_id": 123} も受け付けます。
+
+    Args:
+        payload: 受信したJSON
+
+    Returns:
+        イベント（issue_id, action, issue, journal）、チケットIDがない場合はNone
+    """
+    body = payload.get("payload", payload) if isinstance(payload, dict) else {}
+    issue = body.get("issue") if isinstance(body.get("issue"), dict) else None
+    issue_id = (issue or {}).get("id") or body.get("issue_id")
+    try:
+        issue_id = int(issue_id)
+    except (TypeError, ValueError):
+        return None
+    return {
+        "issue_id": issue_id,
+        "action": body.get("action", "updated"),
+        "issue": issue,
+        "journal": body.get("journal") if isinstance(body.get("journal"), dict) else None,
+        "received_at": time.time(),
+    }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """RedmineのISO 8601形式の日時をUNIX時刻に変換"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def verified_events(issue: Dict[str, Any], events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    受信したイベントを、Redmineから取得したチケットのジャーナルに置き換える
+
+    受信したJSONのジャーナルはIDで照合するだけに使い、内容（コメント・更新者・変更項目）は使いません。
+    IDがない場合は、受信時刻の少し前以降に作成されたジャーナルを今回の変更とみなします。
+
+    Args:
+        issue: Redmineから取得したチケット（journals を含む）
+        events: 受信したイベントのリスト
+
+    Returns:
+        イベント（action, journal）のリスト
+    """
+    journals = issue.get("journals") or []
+    journal_ids = {str((event["journal"] or {}).get("id")) for event in events
+                   if (event["journal"] or {}).get("id") is not None}
+    window_start = min(event["received_at"] for event in events) - JOURNAL_WINDOW_SECONDS
+    if journal_ids:
+        matched = [journal for journal in journals if str(journal.get("id")) in journal_ids]
+    else:
+        matched = [journal for journal in journals if (_timestamp(journal.get("created_on")) or 0) >= window_start]
+
+    created = (_timestamp(issue.get("created_on")) or 0) >= window_start
+    verified = [{"action": "updated", "journal": journal} for journal in matched]
+    if created or not verified:
+        verified.insert(0, {"action": "opened" if created else "updated", "journal": None})
+    return verified
+
+
+def _user_id(user: Optional[Dict[str, Any]]) -> Optional[str]:
+    return str(user["id"]) if user and user.get("id") is not None else None
+
+
+def _user_name(user: Optional[Dict[str, Any]]) -> str:
+    if not user:
+        return "不明"
+    if user.get("name"):
+        return user["name"]
+    name = f"{user.get('lastname', '')} {user.get('firstname', '')}".strip()
+    return name or user.get("login") or "不明"
+
+
+class RedmineWebhookProcessor:
+    """Redmine Webhookのイベントをチケットごとにまとめて処理"""
+
+    def __init__(self, mirror: Optional[RedmineMirror] = None,
+                 notify: Optional[Callable[[str, str], Any]] = None,
+                 user_id_mapping: Optional[Dict[str, str]] = None,
+                 fetch_issue: Optional[Callable[[int], Optional[Dict[str, Any]]]] = None):
+        """
+        初期化
+
+        Args:
+            mirror: 更新するローカルミラー
+            notify: LINEへの送信関数（LINEユーザーID, メッセージ）
+            user_id_mapping: RedmineユーザーIDとLINEユーザーIDの対応
+            fetch_issue: Redmineからチケット（ジャーナル含む）を取得する関数（省略時はミラーで再取得する）
+        """
+        self.mirror = mirror
+        self.fetch_issue = fetch_issue or (mirror.refresh_issue if mirror else None)
+        self.notify = notify
+        self.user_id_mapping = {str(k): v for k, v in (user_id_mapping or {}).items()}
+        # 最後のイベントからこの秒数だけ待ってまとめて処理する（最初のイベントからは最大 max_delay 秒）
+        self.debounce = get_config("webhook.debounce_seconds", 5)
+        self.max_delay = get_config("webhook.max_delay_seconds", 30)
+        # チケットの処理後に呼び出す関数（チケットID, 最新のチケット, イベントのリスト）
+        self.listeners: List[Callable[[int, Optional[Dict[str, Any]], List[Dict[str, Any]]], None]] = []
+
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.stats = {"received": 0, "coalesced": 0, "processed": 0, "skipped": 0, "notifications": 0, "errors": 0}
+
+    def submit(self, payload: Dict[str, Any]) -> Optional[int]:
+        """
+        webhookを受け付ける（処理は待ち時間の後にバックグラウンドで行う）
+
+        Args:
+            payload: 受信したJSON
+
+        Returns:
+            チケットID（内容を解釈できない場合はNone）
+        """
+        event = parse_webhook_payload(payload)
+        if event is None:
+            return None
+
+        now = time.monotonic()
+        with self._condition:
+            self.stats["received"] += 1
+            entry = self._pending.get(event["issue_id"])
+            if entry is None:
+                entry = self._pending[event["issue_id"]] = {"events": [], "first": now}
+            else:
+                self.stats["coalesced"] += 1
+            entry["events"].append(event)
+            entry["deadline"] = min(now + self.debounce, entry["first"] + self.max_delay)
+            self._ensure_worker()
+            self._condition.notify()
+        return event["issue_id"]
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="redmine-webhook", daemon=True)
+            self._worker.start()
+
+    def _take_due(self, force: bool = False) -> Dict[int, List[Dict[str, Any]]]:
+        """処理時刻になったチケットを取り出す（_condition を保持した状態で呼び出す）"""
+        now = time.monotonic()
+        due = {issue_id: entry["events"] for issue_id, entry in self._pending.items()
+               if force or entry["deadline"] <= now}
+        for issue_id in due:
+            del self._pending[issue_id]
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                due = self._take_due()
+                if not due:
+                    next_deadline = min(entry["deadline"] for entry in self._pending.values())
+                    self._condition.wait(max(0.0, next_deadline - time.monotonic()))
+                    continue
+            for issue_id, events in due.items():
+                self._process(issue_id, events)
+
+    def flush(self) -> int:
+        """
+        待機中のイベントをすぐに処理
+
+        Returns:
+            処理したチケット数
+        """
+        with self._condition:
+            due = self._take_due(force=True)
+        for issue_id, events in due.items():
+            self._process(issue_id, events)
+        return len(due)
+
+    def _process(self, issue_id: int, events: List[Dict[str, Any]]) -> None:
+        """1件のチケットのイベントをまとめて処理"""
+        try:
+            # Redmineから最新の状態を取得し（ミラーにも反映される）、その内容だけを使う
+            issue = self.fetch_issue(issue_id) if self.fetch_issue else None
+            if issue is None:
+                # 削除されたチケットや取得できないチケットは通知しない
+                for listener in self.listeners:
+                    listener(issue_id, None, [])
+                self.stats["skipped"] += 1
+                logger.warning(f"チケット #{issue_id} をRedmineから取得できないため通知しません")
+                return
+
+            events = verified_events(issue, events)
+            for listener in self.listeners:
+                listener(issue_id, issue, events)
+
+            if self.notify:
+                message = self.format_notification(issue_id, issue, events)
+                for line_user_id in self._recipients(issue_id, issue, events):
+                    self.notify(line_user_id, message)
+                    self.stats["notifications"] += 1
+            self.stats["processed"] += 1
+            logger.info(f"チケット #{issue_id} の通知を処理しました (イベント {len(events)}件)")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"チケット #{issue_id} の通知の処理中にエラー: {str(e)}", exc_info=True)
+
+    def _recipients(self, issue_id: int, issue: Optional[Dict[str, Any]], events: List[Dict[str, Any]]) -> List[str]:
+        """通知先のLINEユーザー（購読者と担当者、変更した本人は除く）"""
+        recipients = set(find_users_with_preference(watch_key(issue_id)))
+        if issue and get_config("webhook.notify_assignee", True):
+            assignee = _user_id(issue.get("assigned_to") or issue.get("assignee"))
+            if assignee in self.user_id_mapping:
+                recipients.add(self.user_id_mapping[assignee])
+
+        authors = {_user_id((event["journal"] or {}).get("user") or (event["journal"] or {}).get("author"))
+                   for event in events}
+        if None not in authors and len(authors) == 1:
+            author_line_id = self.user_id_mapping.get(authors.pop())
+            recipients.discard(author_line_id)
+        return sorted(recipients)
+
+    @staticmethod
+    def format_notification(issue_id: int, issue: Optional[Dict[str, Any]], events: List[Dict[str, Any]]) -> str:
+        """
+        通知メッセージを作成
+
+        Args:
+            issue_id: チケットID
+            issue: Redmineから取得した最新のチケット
+            events: Redmineのジャーナルに置き換えたイベントのリスト（verified_events）
+
+        Returns:
+            通知メッセージ
+        """
+        issue = issue or {}
+        created = any(event["action"] == "opened" for event in events)
+        verb = "作成されました" if created else "更新されました"
+        lines = [f"🔔 チケット #{issue_id}「{issue.get('subject', '')}」が{verb}"]
+        if len(events) > 1:
+            lines[0] += f"（{len(events)}件の変更）"
+
+        status = (issue.get("status") or {}).get("name")
+        if status:
+            lines.append(f"ステータス: {status} / 進捗: {issue.get('done_ratio', 0)}%")
+
+        changes = []
+        authors = []
+        notes = None
+        for event in events:
+            journal = event["journal"] or {}
+            author = journal.get("user") or journal.get("author")
+            if author and _user_name(author) not in authors:
+                authors.append(_user_name(author))
+            for detail in journal.get("details") or []:
+                label = DETAIL_LABELS.get(detail.get("prop_key") or detail.get("name"))
+                if label and label not in changes:
+                    changes.append(label)
+            if journal.get("notes"):
+                notes = journal["notes"]
+
+        if changes:
+            lines.append(f"変更: {'、'.join(changes)}")
+        if authors:
+            lines.append(f"更新者: {'、'.join(authors)}")
+        if notes:
+            lines.append(f"コメント: {notes[:100]}{'...' if len(notes) > 100 else ''}")
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        受信・処理の統計情報を取得
+
+        Returns:
+            統計情報
+        """
+        with self._condition:
+            return {**self.stats, "pending": len(self._pending)}
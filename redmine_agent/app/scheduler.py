@@ -2,89 +2,477 @@
 Redmineチケット管理エージェント - スケジューラ
 
 定期的なタスクの実行を管理するスケジューラコンポーネント。
+ジョブはcron形式の式で定義し、単一のタイマーヒープで次回実行時刻を管理します。
 """
 
 import asyncio
 import datetime
-import logging
-import pytz
-from typing import Dict, Any, List
+import heapq
 import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Set
 
 from .core import RedmineAgent
 from .linebot_adapter import LineBotAdapter
-from .config import get_config
+from .daily_digest import DailyDigestPipeline
+from .config import get_config, get_config_version
 
 # 共通ロガー設定
 logger = logging.getLogger(__name__)
 
-async def schedule_daily_tasks(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent, 
-                               user_id_mapping: Dict[str, str]):
+# 実行状態（最終実行時刻）の保存先
+STATE_PATH = Path(__file__).parent.parent / "data" / "scheduler_state.json"
+
+# 設定の再読み込み間隔（秒）。これより長くは連続して待機しない
+MAX_SLEEP_SECONDS = 60
+
+# 取りこぼした実行を後から実行する猶予（秒）のデフォルト
+DEFAULT_CATCH_UP_SECONDS = 6 * 60 * 60
+
+
+class CronExpression:
+    """cron形式（分 時 日 月 曜日）の実行スケジュール"""
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        """
+        初期化
+
+        Args:
+            expression: "30 18 * * 1-5" のようなcron式（曜日は0,7=日曜）
+        """
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron式は5フィールドで指定してください: '{expression}'")
+
+        self.expression = expression
+        fields = [self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        self._day_restricted = parts[2] != "*"
+        self._weekday_restricted = parts[4] != "*"
+        self._sorted_hours = sorted(self.hours)
+        self._sorted_minutes = sorted(self.minutes)
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        """cronの1フィールドを値の集合に変換"""
+        values = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_str = item.split("/", 1)
+                step = int(step_str)
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start_str, end_str = item.split("-", 1)
+                start, end = int(start_str), int(end_str)
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"cronフィールドの値が範囲外です: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _matches_day(self, day: datetime.date) -> bool:
+        """日付が日・月・曜日の条件に一致するか（日と曜日は標準cronと同じくOR）"""
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime.datetime) -> Optional[datetime.datetime]:
+        """
+        指定時刻より後の最初の実行時刻を取得
+
+        Args:
+            after: 基準時刻
+
+        Returns:
+            次回実行時刻（1年以内に見つからない場合はNone）
+        """
+        start = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 4):
+            if self._matches_day(day):
+                for hour in self._sorted_hours:
+                    for minute in self._sorted_minutes:
+                        candidate = datetime.datetime.combine(day, datetime.time(hour, minute))
+                        if candidate >= start:
+                            return candidate
+            day += datetime.timedelta(days=1)
+        return None
+
+
+class ScheduledJob:
+    """スケジュール実行されるジョブ"""
+
+    def __init__(self, name: str, cron: str, task: str, enabled: bool = True,
+                 jitter: int = 0, catch_up: int = DEFAULT_CATCH_UP_SECONDS):
+        """
+        初期化
+
+        Args:
+            name: ジョブ名（状態ファイルのキー）
+            cron: cron式
+            task: 実行するタスク名（JobSchedulerに登録したタスクのキー）
+            enabled: 有効かどうか
+            jitter: 実行時刻に加える最大ランダム遅延（秒）
+            catch_up: 取りこぼした実行を後から実行する猶予（秒、0で無効）
+        """
+        self.name = name
+        self.cron = CronExpression(cron)
+        self.task = task
+        self.enabled = enabled
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.next_run: Optional[datetime.datetime] = None
+        self.planned_run: Optional[datetime.datetime] = None
+
+    def signature(self) -> tuple:
+        """設定変更の検出に使う値"""
+        return (self.name, self.cron.expression, self.task, self.enabled, self.jitter, self.catch_up)
+
+    def to_dict(self, last_run: Optional[str] = None) -> Dict[str, Any]:
+        """ジョブ情報を辞書形式に変換"""
+        return {
+            "name": self.name,
+            "cron": self.cron.expression,
+            "task": self.task,
+            "enabled": self.enabled,
+            "jitter": self.jitter,
+            "catch_up": self.catch_up,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "planned_run": self.planned_run.isoformat() if self.planned_run else None,
+            "last_run": last_run
+        }
+
+
+def _time_to_cron(time_str: str, weekdays: str = "*") -> str:
+    """HH:MM形式の時刻をcron式に変換"""
+    hour, minute = map(int, time_str.split(":"))
+    return f"{minute} {hour} * * {weekdays}"
+
+
+def load_job_definitions() -> List[ScheduledJob]:
+    """
+    設定からジョブ一覧を構築
+
+    `scheduler.jobs` が設定されていればそれを使い、なければ
+    `notification.*` の設定から朝・夜レポートと金曜の最適化提案を生成します。
+
+    Returns:
+        ジョブのリスト
+    """
+    configured = get_config("scheduler.jobs")
+    default_jitter = get_config("scheduler.default_jitter", 60)
+    jobs = []
+
+    if configured:
+        for item in configured:
+            try:
+                jobs.append(ScheduledJob(
+                    name=item["name"],
+                    cron=item["cron"],
+                    task=item.get("task", item["name"]),
+                    enabled=item.get("enabled", True) is not False,
+                    jitter=int(item.get("jitter", default_jitter)),
+                    catch_up=int(item.get("catch_up", DEFAULT_CATCH_UP_SECONDS))
+                ))
+            except (KeyError, ValueError) as e:
+                logger.error(f"スケジューラのジョブ定義が不正です: {item} ({e})")
+        return jobs
+
+    morning_time = get_config("notification.morning_report_time") or "09:00"
+    evening_time = get_config("notification.evening_report_time") or "18:30"
+    evening_enabled = get_config("notification.evening_report_enabled") is not False
+
+    jobs.append(ScheduledJob(
+        name="morning_report",
+        cron=_time_to_cron(morning_time),
+        task="morning_report",
+        enabled=get_config("notification.morning_report_enabled") is not False,
+        jitter=default_jitter
+    ))
+    jobs.append(ScheduledJob(
+        name="evening_report",
+        cron=_time_to_cron(evening_time),
+        task="evening_report",
+        enabled=evening_enabled,
+        jitter=default_jitter
+    ))
+    jobs.append(ScheduledJob(
+        name="weekly_optimization",
+        cron=_time_to_cron(evening_time, "5"),
+        task="weekly_optimization",
+        enabled=evening_enabled,
+        jitter=default_jitter
+    ))
+    mirror_enabled = get_config("mirror.enabled", True) is not False
+    jobs.append(ScheduledJob(
+        name="mirror_sync",
+        cron=get_config("mirror.sync_cron", "*/5 * * * *"),
+        task="mirror_sync",
+        enabled=mirror_enabled,
+        jitter=0,
+        catch_up=0
+    ))
+    jobs.append(ScheduledJob(
+        name="mirror_full_sync",
+        cron=get_config("mirror.full_sync_cron", "30 2 * * *"),
+        task="mirror_full_sync",
+        enabled=mirror_enabled,
+        jitter=default_jitter
+    ))
+    # 送信時刻に集中しないよう、業務時間中にレポートを少しずつ作り直す
+    jobs.append(ScheduledJob(
+        name="digest_refresh",
+        cron=get_config("digest.refresh_cron", "*/10 6-20 * * *"),
+        task="digest_refresh",
+        enabled=get_config("digest.enabled", True) is not False,
+        jitter=0,
+        catch_up=0
+    ))
+    return jobs
+
+
+class JobScheduler:
+    """タイマーヒープによるジョブスケジューラ"""
+
+    def __init__(self, tasks: Dict[str, Callable[[], Awaitable[None]]],
+                 state_path: Optional[Path] = None):
+        """
+        初期化
+
+        Args:
+            tasks: タスク名と実行する非同期関数の対応
+            state_path: 最終実行時刻を保存するファイルのパス
+        """
+        self.tasks = tasks
+        self.state_path = Path(state_path) if state_path else STATE_PATH
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.last_runs: Dict[str, str] = self._load_state()
+        self._heap: List[tuple] = []
+        self._signature: Optional[tuple] = None
+        self._config_version: Optional[int] = None
+        self._seq = 0
+
+    def _load_state(self) -> Dict[str, str]:
+        """最終実行時刻の読み込み"""
+        try:
+            if self.state_path.exists():
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"スケジューラ状態の読み込み中にエラー: {str(e)}")
+        return {}
+
+    def _save_state(self) -> None:
+        """最終実行時刻の保存"""
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump(self.last_runs, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"スケジューラ状態の保存中にエラー: {str(e)}")
+
+    def reload_jobs(self, now: Optional[datetime.datetime] = None) -> bool:
+        """
+        設定からジョブを再読み込みし、変更があればヒープを再構築
+
+        Args:
+            now: 基準時刻（省略時は現在時刻）
+
+        Returns:
+            ジョブ定義が変更されたかどうか
+        """
+        # 設定が変わっていなければジョブ定義を作り直さない
+        config_version = get_config_version()
+        if config_version == self._config_version:
+            return False
+        self._config_version = config_version
+
+        jobs = load_job_definitions()
+        signature = tuple(job.signature() for job in jobs)
+        if signature == self._signature:
+            return False
+
+        self._signature = signature
+        self.jobs = {job.name: job for job in jobs}
+        self._heap = []
+        now = now or datetime.datetime.now()
+        for job in jobs:
+            if job.enabled and job.task in self.tasks:
+                self._schedule(job, self._first_run(job, now))
+            elif job.enabled:
+                logger.error(f"ジョブ {job.name} のタスク '{job.task}' は登録されていません")
+        logger.info(f"スケジューラのジョブを読み込みました: {[job.name for job in jobs]}")
+        return True
+
+    def _first_run(self, job: ScheduledJob, now: datetime.datetime) -> Optional[datetime.datetime]:
+        """起動時の初回実行時刻（取りこぼしがあれば即時）"""
+        if job.catch_up > 0:
+            window_start = now - datetime.timedelta(seconds=job.catch_up)
+            last_run = self.last_runs.get(job.name)
+            if last_run:
+                window_start = max(window_start, datetime.datetime.fromisoformat(last_run))
+            missed = job.cron.next_after(window_start)
+            if missed and missed <= now:
+                logger.info(f"ジョブ {job.name} の {missed.isoformat()} の実行を取りこぼしたため、すぐに実行します")
+                return missed
+        return job.cron.next_after(now)
+
+    def _schedule(self, job: ScheduledJob, next_run: Optional[datetime.datetime]) -> None:
+        """ジョブをヒープに登録"""
+        job.next_run = next_run
+        job.planned_run = None
+        if next_run is None:
+            return
+        planned = next_run + datetime.timedelta(seconds=random.uniform(0, job.jitter)) if job.jitter else next_run
+        job.planned_run = planned
+        self._seq += 1
+        heapq.heappush(self._heap, (planned.timestamp(), self._seq, job.name, job.signature()))
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        """ジョブを実行し、最終実行時刻を記録"""
+        logger.info(f"ジョブ {job.name} を実行します (予定時刻: {job.next_run})")
+        started = time.monotonic()
+        try:
+            await self.tasks[job.task]()
+        except Exception as e:
+            logger.error(f"ジョブ {job.name} の実行中にエラー: {e}", exc_info=True)
+        logger.info(f"ジョブ {job.name} が完了しました ({time.monotonic() - started:.2f}秒)")
+        self.last_runs[job.name] = (job.next_run or datetime.datetime.now()).isoformat()
+        self._save_state()
+
+    async def run(self) -> None:
+        """スケジューラのメインループ"""
+        while True:
+            self.reload_jobs()
+            now_ts = time.time()
+
+            while self._heap and self._heap[0][0] <= now_ts:
+                _, _, name, signature = heapq.heappop(self._heap)
+                job = self.jobs.get(name)
+                if not job or job.signature() != signature:
+                    continue
+                await self._run_job(job)
+                self._schedule(job, job.cron.next_after(max(job.next_run, datetime.datetime.now())))
+
+            if self._heap:
+                wait_seconds = min(max(self._heap[0][0] - time.time(), 0), MAX_SLEEP_SECONDS)
+            else:
+                wait_seconds = MAX_SLEEP_SECONDS
+            await asyncio.sleep(wait_seconds)
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        """
+        ジョブ一覧と次回実行時刻を取得
+
+        Returns:
+            ジョブ情報のリスト（次回実行時刻順）
+        """
+        jobs = [job.to_dict(self.last_runs.get(job.name)) for job in self.jobs.values()]
+        return sorted(jobs, key=lambda j: j["next_run"] or "9999")
+
+
+# 実行中のスケジューラ（start_schedulerで設定）
+current_scheduler: Optional[JobScheduler] = None
+
+
+def get_job_scheduler() -> Optional[JobScheduler]:
+    """実行中のスケジューラを取得"""
+    return current_scheduler
+
+
+async def schedule_daily_tasks(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent,
+                               user_id_mapping: Dict[str, str],
+                               digest_pipeline: Optional[DailyDigestPipeline] = None):
     """
     毎日のタスクをスケジュール
-    
+
     Args:
         line_adapter: LINE Botアダプター
         redmine_agent: Redmineエージェント
         user_id_mapping: RedmineユーザーIDとLINE ユーザーIDのマッピング
+        digest_pipeline: 日次レポートの事前生成（省略時は送信時に生成）
     """
-    while True:
-        now = datetime.datetime.now()
-        
-        # 設定から時間を取得
-        morning_time = get_config("notification.morning_report_time") or "09:00"
-        evening_time = get_config("notification.evening_report_time") or "18:30"
-        morning_enabled = get_config("notification.morning_report_enabled")
-        evening_enabled = get_config("notification.evening_report_enabled")
-        
-        # 文字列の時間を時間と分に分解
-        morning_hour, morning_minute = map(int, morning_time.split(":"))
-        evening_hour, evening_minute = map(int, evening_time.split(":"))
-        
-        # 朝レポート
-        morning_target = now.replace(hour=morning_hour, minute=morning_minute, second=0, microsecond=0)
-        if morning_enabled is not False and now < morning_target:
-            # 朝のレポート時間前の場合
-            wait_seconds = (morning_target - now).total_seconds()
-            logger.info(f"朝レポートまで {wait_seconds:.2f} 秒待機します")
-            await asyncio.sleep(wait_seconds)
-            await send_morning_reports(line_adapter, redmine_agent, user_id_mapping)
-        
-        # 夜レポート
-        evening_target = now.replace(hour=evening_hour, minute=evening_minute, second=0, microsecond=0)
-        if evening_enabled is not False and now < evening_target:
-            # 夜のレポート時間前の場合
-            wait_seconds = (evening_target - now).total_seconds()
-            logger.info(f"夕方レポートまで {wait_seconds:.2f} 秒待機します")
-            await asyncio.sleep(wait_seconds)
-            await send_evening_reports(line_adapter, redmine_agent, user_id_mapping)
-        
-        # 次の日の朝まで待機
-        tomorrow = now + datetime.timedelta(days=1)
-        next_morning = tomorrow.replace(hour=morning_hour, minute=morning_minute, second=0, microsecond=0)
-        wait_seconds = (next_morning - now).total_seconds()
-        logger.info(f"Waiting {wait_seconds:.2f} seconds until next day's schedule")
-        await asyncio.sleep(wait_seconds)
+    global current_scheduler
+
+    tasks = {
+        "morning_report": lambda: send_morning_reports(line_adapter, redmine_agent, user_id_mapping, digest_pipeline),
+        "evening_report": lambda: send_evening_reports(line_adapter, redmine_agent, user_id_mapping, digest_pipeline),
+        "weekly_optimization": lambda: send_optimization_reports(line_adapter, redmine_agent, user_id_mapping),
+    }
+    if redmine_agent.mirror:
+        tasks["mirror_sync"] = lambda: _sync_mirror(redmine_agent.mirror.sync_incremental, digest_pipeline)
+        tasks["mirror_full_sync"] = lambda: _sync_mirror(redmine_agent.mirror.sync_full, digest_pipeline)
+    if digest_pipeline:
+        tasks["digest_refresh"] = lambda: asyncio.to_thread(digest_pipeline.refresh)
+    current_scheduler = JobScheduler(tasks)
+    await current_scheduler.run()
+
+async def _sync_mirror(sync: Callable[[], Dict[str, Any]], digest_pipeline: Optional[DailyDigestPipeline]):
+    """ミラーを同期し、変更に関係するユーザーの日次レポートを作り直し対象にする"""
+    result = await asyncio.to_thread(sync)
+    if digest_pipeline:
+        digest_pipeline.on_mirror_synced(result)
+
+async def _send_digests(line_adapter: LineBotAdapter, digest_pipeline: DailyDigestPipeline,
+                        user_id_mapping: Dict[str, str], kind: str):
+    """事前生成したレポートを送信"""
+    for redmine_user_id, line_user_id in user_id_mapping.items():
+        try:
+            report = await asyncio.to_thread(digest_pipeline.get_report, redmine_user_id, kind)
+            if line_adapter.send_message(line_user_id, report):
+                logger.info(f"{kind} report sent to LINE user {line_user_id}")
+            else:
+                logger.error(f"Failed to send {kind} report to LINE user {line_user_id}")
+        except Exception as e:
+            logger.error(f"Error sending {kind} report: {e}", exc_info=True)
 
 async def send_morning_reports(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent,
-                               user_id_mapping: Dict[str, str]):
+                               user_id_mapping: Dict[str, str],
+                               digest_pipeline: Optional[DailyDigestPipeline] = None):
     """
     朝のレポートを送信
-    
+
     Args:
         line_adapter: LINE Botアダプター
         redmine_agent: Redmineエージェント
         user_id_mapping: RedmineユーザーIDとLINE ユーザーIDのマッピング
+        digest_pipeline: 日次レポートの事前生成
     """
     logger.info("Sending morning reports")
-    
+    if digest_pipeline:
+        await _send_digests(line_adapter, digest_pipeline, user_id_mapping, "morning")
+        return
+
+    # ミラーが利用できれば全ユーザー分を1回のクエリで取得
+    try:
+        tasks_by_user = await asyncio.to_thread(
+            redmine_agent.get_daily_tasks_for_users, [int(user_id) for user_id in user_id_mapping]
+        )
+    except Exception as e:
+        logger.error(f"Error getting daily tasks: {e}", exc_info=True)
+        return
+
     for redmine_user_id, line_user_id in user_id_mapping.items():
         try:
-            tasks = redmine_agent.get_daily_tasks(user_id=int(redmine_user_id))
+            tasks = tasks_by_user.get(int(redmine_user_id), [])
             report = redmine_agent.format_morning_report(tasks)
-            
+
             success = line_adapter.send_message(line_user_id, report)
-            
+
             if success:
                 logger.info(f"Morning report sent to LINE user {line_user_id}")
             else:
@@ -93,18 +481,23 @@ async def send_morning_reports(line_adapter: LineBotAdapter, redmine_agent: Redm
             logger.error(f"Error sending morning report: {e}", exc_info=True)
 
 async def send_evening_reports(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent,
-                               user_id_mapping: Dict[str, str]):
+                               user_id_mapping: Dict[str, str],
+                               digest_pipeline: Optional[DailyDigestPipeline] = None):
     """
     夜のレポートを送信
-    
+
     Args:
         line_adapter: LINE Botアダプター
         redmine_agent: Redmineエージェント
         user_id_mapping: RedmineユーザーIDとLINE ユーザーIDのマッピング
+        digest_pipeline: 日次レポートの事前生成
     """
     logger.info("Sending evening reports")
+    if digest_pipeline:
+        await _send_digests(line_adapter, digest_pipeline, user_id_mapping, "evening")
+        return
     today = datetime.date.today().isoformat()
-    
+
     for redmine_user_id, line_user_id in user_id_mapping.items():
         try:
             # 今日の作業時間を取得
@@ -113,36 +506,53 @@ async def send_evening_reports(line_adapter: LineBotAdapter, redmine_agent: Redm
                 from_date=today,
                 to_date=today
             )
-            
-            # 完了したタスク（ステータスが変わったチケットを取得する拡張が必要）
-            completed_tasks = []
-            
+
+            # 今日完了したタスク
+            completed_tasks = redmine_agent.get_completed_issues(today, user_id=int(redmine_user_id))
+
             report = redmine_agent.format_evening_report(completed_tasks, time_entries)
-            
+
             success = line_adapter.send_message(line_user_id, report)
-            
+
             if success:
                 logger.info(f"Evening report sent to LINE user {line_user_id}")
             else:
                 logger.error(f"Failed to send evening report to LINE user {line_user_id}")
-                
-            # 効率化提案も送信（週1回、金曜日）
-            if datetime.date.today().weekday() == 4:  # 金曜日
-                optimization = redmine_agent.suggest_task_consolidation()
-                if optimization:
-                    line_adapter.send_message(line_user_id, optimization)
         except Exception as e:
             logger.error(f"Error sending evening report: {e}", exc_info=True)
 
+async def send_optimization_reports(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent,
+                                    user_id_mapping: Dict[str, str]):
+    """
+    タスク効率化の提案を送信（デフォルトでは毎週金曜日）
+
+    Args:
+        line_adapter: LINE Botアダプター
+        redmine_agent: Redmineエージェント
+        user_id_mapping: RedmineユーザーIDとLINE ユーザーIDのマッピング
+    """
+    logger.info("Sending optimization suggestions")
+
+    for redmine_user_id, line_user_id in user_id_mapping.items():
+        try:
+            suggestions = await asyncio.to_thread(redmine_agent.suggest_task_consolidation, int(redmine_user_id))
+            if suggestions:
+                message = "【今週のタスク効率化の提案】\n\n" + "\n".join(f"・{suggestion}" for suggestion in suggestions)
+                line_adapter.send_message(line_user_id, message)
+        except Exception as e:
+            logger.error(f"Error sending optimization suggestions: {e}", exc_info=True)
+
 async def start_scheduler(line_adapter: LineBotAdapter, redmine_agent: RedmineAgent,
-                          user_id_mapping: Dict[str, str]):
+                          user_id_mapping: Dict[str, str],
+                          digest_pipeline: Optional[DailyDigestPipeline] = None):
     """
     スケジューラを開始
-    
+
     Args:
         line_adapter: LINE Botアダプター
         redmine_agent: Redmineエージェント
         user_id_mapping: RedmineユーザーIDとLINE ユーザーIDのマッピング
+        digest_pipeline: 日次レポートの事前生成
     """
     logger.info("Starting scheduler")
-    await schedule_daily_tasks(line_adapter, redmine_agent, user_id_mapping)
+    await schedule_daily_tasks(line_adapter, redmine_agent, user_id_mapping, digest_pipeline)
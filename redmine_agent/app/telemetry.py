@@ -0,0 +1,308 @@
+"""
+Redmineチケット管理エージェント - 計測
+
+処理区間（スパン）の所要時間・結果をプロセス内のヒストグラムに集計し、
+Prometheusのテキスト形式で出力します。各スパンは構造化ログ（JSON）としても記録します。
+計測するのはこのエージェントの処理のみです（lineweb・gemini-blog-processor は対象外）。
+
+使い方:
+    @traced("redmine.get_daily_tasks")
+    def get_daily_tasks(...): ...
+
+    with span("gemini.attempt", key=0) as s:
+        ...
+        s.set(status=429, retries=1)
+"""
+
+import re
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator
+
+# 共通ロガー設定
+logger = logging.getLogger(__name__)
+
+# ヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# スパンの属性のうち、メトリクスのラベルにするもの（それ以外はログのみ）
+LABEL_ATTRIBUTES = ("method", "endpoint", "key")
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|\.|$)")
+
+
+def normalize_path(path: str) -> str:
+    """
+    URLパスの数値部分を置き換えてラベルの種類を抑える（/issues/123.json → /issues/:id.json）
+
+    Args:
+        path: URLパス
+
+    Returns:
+        正規化したパス
+    """
+    return _NUMERIC_SEGMENT.sub("/:id", path.split("?", 1)[0])
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    # 値が空のラベルは省略（Prometheusではラベルなしと同じ扱い）
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value != ""]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """ラベルごとのカウンター"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Dict[str, Any], amount: float = 1.0) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """ラベルごとの累積ヒストグラム"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # ラベル → [バケットごとの件数..., 合計, 件数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Dict[str, Any]) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """ラベルごとの件数・合計・平均を取得"""
+        with self._lock:
+            return {
+                key: {"count": series[-1], "sum": series[-2], "avg": series[-2] / series[-1] if series[-1] else 0.0}
+                for key, series in self._values.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative:g}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {series[-1]:g}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """メトリクスの登録と出力"""
+
+    def __init__(self, namespace: str = "app"):
+        """
+        初期化
+
+        Args:
+            namespace: メトリクス名の接頭辞
+        """
+        self.namespace = namespace
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        label_names = ("span", "status") + LABEL_ATTRIBUTES
+        self.span_duration = self.histogram("span_duration_seconds", "Duration of traced spans", label_names)
+        self.span_retries = self.counter("span_retries_total", "Retries recorded by traced spans", ("span",) + LABEL_ATTRIBUTES)
+
+    def _register(self, name: str, factory: Callable[[str], Any]) -> Any:
+        full_name = f"{self.namespace}_{name}"
+        with self._lock:
+            if full_name not in self._metrics:
+                self._metrics[full_name] = factory(full_name)
+            return self._metrics[full_name]
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        """カウンターを取得（未登録なら作成）"""
+        return self._register(name, lambda full_name: Counter(full_name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """ヒストグラムを取得（未登録なら作成）"""
+        return self._register(name, lambda full_name: Histogram(full_name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        """
+        Prometheusのテキスト形式で出力
+
+        Returns:
+            テキスト形式のメトリクス
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(namespace: str = "redmine_agent") -> MetricsRegistry:
+    """
+    共有のMetricsRegistryを取得（名前空間は最初の呼び出しで決まる）
+
+    Returns:
+        MetricsRegistryインスタンス
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(namespace)
+        return _registry
+
+
+class Span:
+    """計測中の処理区間"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.status: Any = "ok"
+        self.parent: Optional[str] = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def set(self, status: Any = None, **attributes: Any) -> None:
+        """
+        結果と属性を設定
+
+        Args:
+            status: 結果（HTTPステータスコードなど）
+            attributes: 追加の属性（retries を指定すると再試行回数として集計）
+        """
+        if status is not None:
+            self.status = status
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    処理区間を計測するコンテキストマネージャー
+
+    例外が発生した場合の結果は "error"、ジェネレーターが途中で閉じられた場合は "cancelled" になります。
+
+    Args:
+        name: スパン名（例: "redmine.request"）
+        attributes: 属性（method, endpoint, key はメトリクスのラベルにもなる）
+
+    Yields:
+        Spanオブジェクト
+    """
+    current = Span(name, attributes)
+    parent = _current_span.get()
+    current.parent = parent.name if parent else None
+    token = _current_span.set(current)
+    try:
+        yield current
+    except GeneratorExit:
+        # ジェネレーターの途中で呼び出し元が受信をやめた場合
+        current.status = "cancelled"
+        raise
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.started
+        _record(current)
+
+
+def _record(current: Span) -> None:
+    registry = get_registry()
+    labels = {"span": current.name, "status": current.status}
+    labels.update({name: current.attributes[name] for name in LABEL_ATTRIBUTES if current.attributes.get(name) is not None})
+    registry.span_duration.observe(current.duration, labels)
+    retries = current.attributes.get("retries")
+    if retries:
+        registry.span_retries.inc(labels, retries)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({
+            "span": current.name,
+            "parent": current.parent,
+            "status": current.status,
+            "duration_ms": round(current.duration * 1000, 2),
+            **current.attributes
+        }, ensure_ascii=False, default=str))
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """
+    関数の実行をスパンとして計測するデコレーター（同期・非同期関数の両方に対応）
+
+    Args:
+        name: スパン名（省略時は "モジュール名.関数名"）
+        attributes: スパンの属性
+
+    Returns:
+        デコレーター
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+プロンプト圧縮のベンチマークスクリプト
+
+Redmineのチケット形式のダミーデータから、従来の json.dumps によるプロンプトと
+表形式に圧縮したプロンプトを生成し、トークン数と処理時間を比較します。
+--live を指定するとGemini APIに実際に送信し、countTokens によるトークン数と応答時間も計測します。
+
+使い方:
+    python benchmark_prompt.py [--tasks 100] [--live]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+from pathlib import Path
+
+# アプリケーションのパスを追加
+app_path = str(Path(__file__).parent)
+if app_path not in sys.path:
+    sys.path.insert(0, app_path)
+
+import requests
+from dotenv import load_dotenv
+
+from app.prompt_compactor import render_issue_table, estimate_tokens, PRIORITIZE_COLUMNS
+
+# 環境変数の読み込み
+load_dotenv()
+
+SUBJECTS = ["ログイン画面の不具合修正", "月次レポートの作成", "APIレスポンスの高速化", "デザインレビュー",
+            "ドキュメント更新", "顧客打ち合わせの準備", "テスト環境の構築", "検索機能の改善"]
+PRIORITIES = [(1, "低"), (2, "通常"), (3, "高"), (4, "急いで"), (5, "今すぐ")]
+STATUSES = [(1, "新規"), (2, "進行中"), (3, "解決"), (4, "フィードバック")]
+
+
+def make_issue(issue_id: int) -> dict:
+    """Redmine APIの /issues.json と同じ形式のダミーチケットを生成"""
+    today = datetime.date.today()
+    priority = random.choice(PRIORITIES)
+    status = random.choice(STATUSES)
+    created = datetime.datetime.now() - datetime.timedelta(days=random.randint(1, 60))
+    return {
+        "id": issue_id,
+        "project": {"id": 1, "name": "社内システム"},
+        "tracker": {"id": 2, "name": "機能"},
+        "status": {"id": status[0], "name": status[1], "is_closed": False},
+        "priority": {"id": priority[0], "name": priority[1]},
+        "author": {"id": 1, "name": "Redmine Admin"},
+        "assigned_to": {"id": 5, "name": "山田 太郎"},
+        "subject": f"{random.choice(SUBJECTS)} ({issue_id})",
+        "description": ("背景と要件を以下に記載します。" * random.randint(5, 30)) +
+                       "\r\n\r\n- 対応範囲の確認\r\n- 関係者への共有\r\n- 完了条件の定義",
+        "start_date": (today - datetime.timedelta(days=random.randint(0, 30))).isoformat(),
+        "due_date": (today + datetime.timedelta(days=random.randint(-5, 30))).isoformat(),
+        "done_ratio": random.choice([0, 10, 30, 50, 80]),
+        "is_private": False,
+        "estimated_hours": random.choice([None, 2.0, 4.0, 8.0]),
+        "total_estimated_hours": None,
+        "custom_fields": [{"id": 1, "name": "顧客", "value": "A社"}, {"id": 2, "name": "リリース", "value": "v2.1"}],
+        "created_on": created.isoformat() + "Z",
+        "updated_on": datetime.datetime.now().isoformat() + "Z",
+        "closed_on": None,
+    }
+
+
+def count_tokens(assistant, prompt: str):
+    """Gemini APIの countTokens で正確なトークン数を取得"""
+    response = requests.post(
+        f"{assistant.base_url}/{assistant.model}:countTokens?key={assistant.api_key}",
+        json={"contents": [{"parts": [{"text": prompt}]}]},
+        timeout=30
+    )
+    if response.status_code != 200:
+        return None
+    return response.json().get("totalTokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="プロンプト圧縮のベンチマーク")
+    parser.add_argument("--tasks", type=int, default=100, help="チケット数")
+    parser.add_argument("--repeat", type=int, default=20, help="シリアライズ時間の計測回数")
+    parser.add_argument("--live", action="store_true", help="Gemini APIに送信して応答時間を計測")
+    args = parser.parse_args()
+
+    random.seed(0)
+    tasks = [make_issue(1000 + i) for i in range(args.tasks)]
+
+    variants = {
+        "json.dumps": lambda: json.dumps(tasks, ensure_ascii=False),
+        "compact": lambda: render_issue_table(tasks, PRIORITIZE_COLUMNS, description_tokens=60, total_tokens=6000),
+    }
+
+    print(f"チケット数: {args.tasks}\n")
+    print(f"{'形式':<12}{'文字数':>10}{'推定トークン':>14}{'生成時間(ms)':>14}")
+    prompts = {}
+    for name, build in variants.items():
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            prompts[name] = build()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / args.repeat
+        print(f"{name:<12}{len(prompts[name]):>10}{estimate_tokens(prompts[name]):>14}{elapsed_ms:>14.2f}")
+
+    ratio = estimate_tokens(prompts["compact"]) / max(1, estimate_tokens(prompts["json.dumps"]))
+    print(f"\n推定トークン削減率: {(1 - ratio) * 100:.1f}%")
+
+    if not args.live:
+        return
+
+    from app.llm_helper import RedmineAssistant
+    assistant = RedmineAssistant()
+    if not assistant.api_key:
+        print("Gemini APIキーが設定されていないため、--live の計測を省略します")
+        return
+
+    print(f"\n{'形式':<12}{'トークン':>10}{'応答時間(秒)':>14}{'結果':>8}")
+    for name, tasks_text in prompts.items():
+        prompt = (
+            "以下のタスクリストを、最適な優先順位で並べ替えてください。\n"
+            f"タスク:\n{tasks_text}\n"
+            '以下のJSON形式で、すべてのタスクのIDを優先順に並べて返してください: [{"id": タスクID, "priority_reason": "理由"}]'
+        )
+        tokens = count_tokens(assistant, prompt)
+        started = time.perf_counter()
+        response = assistant._request_with_retry(prompt, 0.2)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<12}{str(tokens):>10}{elapsed:>14.2f}{'OK' if response else 'NG':>8}")
+
+
+if __name__ == "__main__":
+    main()
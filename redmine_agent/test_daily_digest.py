@@ -0,0 +1,119 @@
+"""
+日次レポートの事前生成のテスト
+
+LINEやAPIからの更新（ミラーへの直接反映）の後、差分同期で変更が見つからなくても
+該当ユーザーのレポートが作り直し対象になり、送信時に新しい内容で作り直されることを確認します。
+
+実行方法: python -m pytest test_daily_digest.py
+"""
+
+import datetime
+
+import pytest
+
+from app.core import RedmineAgent
+from app.daily_digest import DailyDigestPipeline
+from app.redmine_mirror import RedmineMirror
+
+
+class FakeRedmine:
+    """ミラーの取得処理の代わりに使うRedmineの内容"""
+
+    def __init__(self):
+        today = datetime.date.today().isoformat()
+        self.issues = [{
+            "id": 10, "subject": "設計レビュー", "project": {"id": 1, "name": "案件"},
+            "status": {"id": 2, "name": "進行中", "is_closed": False}, "priority": {"id": 2, "name": "通常"},
+            "assigned_to": {"id": 5, "name": "山田"}, "done_ratio": 0, "updated_on": f"{today}T09:00:00Z",
+        }]
+        self.time_entries = [{
+            "id": 100, "issue": {"id": 10}, "user": {"id": 5, "name": "山田"}, "hours": 1.0,
+            "comments": "調査", "spent_on": today, "updated_on": f"{today}T09:00:00Z",
+        }]
+
+    def fetch_all(self, path, key, params):
+        if key == "issues":
+            return list(self.issues)
+        return [
+            entry for entry in self.time_entries
+            if "issue_id" not in params or entry["issue"]["id"] == params["issue_id"]
+        ]
+
+
+@pytest.fixture
+def redmine(tmp_path, monkeypatch):
+    fake = FakeRedmine()
+    mirror = RedmineMirror("http://redmine.example", {}, db_path=str(tmp_path / "mirror.db"))
+    monkeypatch.setattr(mirror, "_fetch_all", fake.fetch_all)
+    monkeypatch.setattr(mirror, "_fetch_closed_status_ids", lambda: set())
+    mirror.sync_full()
+    agent = RedmineAgent("http://redmine.example", "key", mirror=mirror)
+    return fake, mirror, agent
+
+
+def test_write_through_mirror_marks_digest_dirty(redmine, tmp_path, monkeypatch):
+    fake, mirror, agent = redmine
+    digest = DailyDigestPipeline(agent, {"5": "U5", "6": "U6"}, db_path=str(tmp_path / "digest.db"))
+    mirror.listeners.append(digest.mark_dirty)
+    digest.refresh(force=True)
+    before = {(row["user_id"], row["kind"]): row for row in digest.status()["digests"]}
+
+    # LINEから作業時間を登録（Redmineへの送信は成功したものとし、再取得で新しい作業時間が返る）
+    today = datetime.date.today().isoformat()
+    fake.time_entries.append({
+        "id": 101, "issue": {"id": 10}, "user": {"id": 5, "name": "山田"}, "hours": 2.5,
+        "comments": "実装", "spent_on": today, "updated_on": f"{today}T09:20:00Z",
+    })
+    monkeypatch.setattr(agent, "_send", lambda method, path, payload: (None, None))
+    assert agent.log_time_entry(10, 2.5, "実装")
+
+    # 書き込みで反映済みのため、その後の差分同期では変更なしになる
+    result = mirror.sync_incremental()
+    assert result["user_ids"] == []
+    digest.on_mirror_synced(result)
+
+    after = {(row["user_id"], row["kind"]): row for row in digest.status()["digests"]}
+    assert after[("5", "evening")]["dirty"] and not after[("5", "evening")]["fresh"]
+    assert not after[("6", "evening")]["dirty"]
+
+    hits = digest.stats["hits"]
+    digest.get_report("5", "evening")
+    assert digest.stats["hits"] == hits
+    after = {(row["user_id"], row["kind"]): row for row in digest.status()["digests"]}
+    assert after[("5", "evening")]["version"] == before[("5", "evening")]["version"] + 1
+    assert after[("5", "evening")]["fresh"]
+
+
+class FakeResponse:
+    """requests.get の応答の代わり"""
+
+    def __init__(self, issue):
+        self.status_code = 200 if issue else 404
+        self.issue = issue
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"issue": dict(self.issue, journals=[])}
+
+
+def test_refresh_issue_notifies_previous_and_new_assignee(redmine, monkeypatch):
+    fake, mirror, _ = redmine
+    notified = []
+    mirror.listeners.append(notified.append)
+    issue = dict(fake.issues[0])
+    monkeypatch.setattr("app.redmine_mirror.requests.get", lambda url, **kwargs: FakeResponse(issue))
+
+    # 更新日時が変わらない再取得では通知しない
+    mirror.refresh_issue(10)
+    assert notified == []
+
+    issue.update(assigned_to={"id": 6, "name": "佐藤"}, updated_on="2099-01-01T00:00:00Z")
+    mirror.refresh_issue(10)
+    assert notified == [["5", "6"]]
+
+    # 削除されたチケットは最後の担当者に通知する
+    issue.clear()
+    mirror.refresh_issue(10)
+    assert notified[-1] == ["6"]
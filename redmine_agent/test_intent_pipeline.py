@@ -0,0 +1,102 @@
+"""
+意図判定パイプラインのテスト
+
+キーワード段がRedmineを更新するコマンドを誤って判定しないことと、
+判定できないメッセージがLLM段に渡されることを確認します。
+
+実行方法: python -m pytest test_intent_pipeline.py
+"""
+
+import pytest
+
+from app import nlp_helper
+from app.intent_pipeline import IntentPipeline, classify_by_keywords
+
+# IntentPipelineがキーワード段の判定を採用する確信度（nlp.keyword_confidence_threshold の既定値）
+KEYWORD_THRESHOLD = 0.85
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("作業 2時間 #15", "15"),
+    ("チケット12に1.5時間", "12"),
+    ("12の進捗を30%に", "12"),
+    ("進捗 50%", None),
+    ("ログ 3時間 内容：会議", None),
+    ("2h 作業", None),
+    ("7日以内", None),
+    ("作業報告 明日10時から会議 2時間", None),
+    ("作業メモ: 3月5日 2時間 打ち合わせ", None),
+    ("記録 15:00 から 1時間", None),
+    ("時間 2024年 3h", None),
+    ("チケット 12 の進捗", "12"),
+])
+def test_extract_ticket_id_ignores_quantities(text, expected):
+    assert nlp_helper.extract_ticket_id(text) == expected
+
+
+def test_log_time_uses_explicit_ticket():
+    result = classify_by_keywords("作業 2時間 #15")
+    assert result["command_type"] == "log_time"
+    assert result["ticket_id"] == 15
+    assert result["hours"] == 2.0
+
+
+def test_log_time_with_ticket_word():
+    result = classify_by_keywords("作業 チケット12 1.5時間")
+    assert result["command_type"] == "log_time"
+    assert result["ticket_id"] == 12
+
+
+def test_progress_with_leading_ticket():
+    result = classify_by_keywords("#15 進捗 50%")
+    assert result["command_type"] == "update_progress"
+    assert result["ticket_id"] == 15
+    assert result["done_ratio"] == 50
+
+
+@pytest.mark.parametrize("text", [
+    "進捗 50%",
+    "ログ 3時間 内容：会議",
+    "明日のスケジュールを考える",
+    "スケジュールを考える",
+    "会議の作業時間を記録する方法を調べる #3",
+    "ステータスを確認する",
+    # 時刻・日付・単位のない番号はチケット番号として扱わない（LLM段で判定する）
+    "作業報告 明日10時から会議 2時間",
+    "作業メモ: 3月5日 2時間 打ち合わせ",
+    "記録 15:00 から 1時間",
+    "時間 2024年 3h",
+    "作業 12 2時間",
+    "進捗 12 50%",
+    "ステータス 12 完了",
+])
+def test_ambiguous_messages_are_not_classified(text):
+    result = classify_by_keywords(text)
+    assert result["command_type"] == "unknown" or result["confidence"] < KEYWORD_THRESHOLD
+
+
+def test_read_only_commands():
+    assert classify_by_keywords("今日のタスク")["command_type"] == "task_list"
+    result = classify_by_keywords("今後7日のタスク")
+    assert result["command_type"] == "task_list"
+    assert result["days"] == 7
+    assert classify_by_keywords("週間レポート")["report_type"] == "week"
+
+
+def test_pipeline_falls_through_to_llm(tmp_path):
+    calls = []
+
+    def llm(text):
+        calls.append(text)
+        return {"command_type": "create_ticket", "confidence": 0.8}
+
+    pipeline = IntentPipeline(llm_analyzer=llm, decision_log=tmp_path / "intent_log.jsonl")
+    for text in ["進捗 50%", "明日のスケジュールを考える", "記録 15:00 から 1時間"]:
+        result = pipeline.analyze(text)
+        assert result["tier"] == "llm"
+        assert result["command_type"] == "create_ticket"
+    assert calls == ["進捗 50%", "明日のスケジュールを考える", "記録 15:00 から 1時間"]
+
+    result = pipeline.analyze("作業 2時間 #15")
+    assert result["tier"] == "keyword"
+    assert len(calls) == 3
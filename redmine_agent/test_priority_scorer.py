@@ -0,0 +1,93 @@
+"""
+優先度スコア計算のテスト
+
+タスクリストの差分の反映（追加・更新・削除）で、変わった行だけが再計算され、
+全件を読み込み直した場合と同じ順位になることを確認します。
+
+実行方法: python -m pytest test_priority_scorer.py
+"""
+
+import datetime
+
+from app.priority_scorer import PriorityScorer, get_priority_scorer
+
+TODAY = datetime.date(2026, 10, 19)
+WEIGHTS = {"overdue": 100, "due_today": 90, "due_3days": 80, "due_week": 70, "priority": 10, "near_done": 15}
+
+
+def task(issue_id, due_date=None, priority="通常", done_ratio=0):
+    return {"id": issue_id, "due_date": due_date, "priority": {"name": priority}, "done_ratio": done_ratio}
+
+
+def counting(scorer):
+    """全件計算の回数を数える"""
+    calls = []
+    score_all = scorer._score_all
+
+    def wrapper(today):
+        calls.append(today)
+        return score_all(today)
+
+    scorer._score_all = wrapper
+    return calls
+
+
+def ids(ranked):
+    return [task["id"] for task, _ in ranked]
+
+
+def test_scores():
+    scorer = PriorityScorer(WEIGHTS).load([
+        task(1, "2026-10-18"),
+        task(2, "2026-10-19", "高"),
+        task(3, "2026-10-21", done_ratio=80),
+        task(4, "2026-10-25", "低"),
+        task(5),
+    ])
+    assert scorer.scores(TODAY) == [110.0, 110.0, 105.0, 70.0, 10.0]
+    assert ids(scorer.ranked(TODAY, limit=3)) == [1, 2, 3]
+
+
+def test_update_rescores_only_the_changed_row():
+    scorer = PriorityScorer(WEIGHTS).load([task(1, "2026-10-25"), task(2, "2026-10-30")])
+    calls = counting(scorer)
+    assert ids(scorer.ranked(TODAY)) == [1, 2]
+
+    scorer.update(task(2, "2026-10-19"))
+    scorer.update(task(3, "2026-10-18"))
+    assert ids(scorer.ranked(TODAY)) == [3, 2, 1]
+    assert len(calls) == 1
+
+    # 基準日が変わると全件を計算し直す
+    scorer.ranked(TODAY + datetime.timedelta(days=1))
+    assert len(calls) == 2
+
+
+def test_remove_keeps_scores_of_remaining_rows():
+    scorer = PriorityScorer(WEIGHTS).load([task(1, "2026-10-18"), task(2), task(3, "2026-10-19")])
+    calls = counting(scorer)
+    scorer.scores(TODAY)
+    scorer.remove(1)
+    scorer.remove(99)
+    assert scorer.scores(TODAY) == [10.0, 100.0]
+    assert ids(scorer.ranked(TODAY)) == [3, 2]
+    assert len(scorer) == 2
+    assert len(calls) == 1
+
+
+def test_rank_applies_differences_like_a_full_load():
+    first = [task(1, "2026-10-25"), task(2, "2026-10-30"), task(3)]
+    second = [task(2, "2026-10-19"), task(3, done_ratio=90), task(4, "2026-10-18")]
+    scorer = PriorityScorer(WEIGHTS)
+    calls = counting(scorer)
+    scorer.rank(first, TODAY)
+    ranked = scorer.rank(second, TODAY)
+
+    assert len(calls) == 1
+    assert ranked == PriorityScorer(WEIGHTS).load(second).ranked(TODAY)
+    assert scorer.rank(second, TODAY, limit=1) == [(task(4, "2026-10-18"), 110.0)]
+
+
+def test_get_priority_scorer_keeps_one_instance_per_list():
+    assert get_priority_scorer("U1:tasks") is get_priority_scorer("U1:tasks")
+    assert get_priority_scorer("U1:tasks") is not get_priority_scorer("U2:tasks")
@@ -0,0 +1,76 @@
+"""
+ジョブスケジューラのcron式のテスト
+
+フィールドの解釈（範囲・間隔・曜日の7=日曜）と、次回実行時刻の計算
+（日と曜日の両方を指定した場合は標準cronと同じくOR）を確認します。
+
+実行方法: python -m pytest test_scheduler.py
+"""
+
+import datetime
+
+import pytest
+
+from app.scheduler import CronExpression
+
+
+def at(text: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(text)
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 6, {0, 1, 2, 3, 4, 5, 6}),
+    ("1-5", 0, 7, {1, 2, 3, 4, 5}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("10/20", 0, 59, {10, 30, 50}),
+    ("6-20/7", 0, 23, {6, 13, 20}),
+    ("1,3,5", 1, 31, {1, 3, 5}),
+])
+def test_parse_field(field, low, high, expected):
+    assert CronExpression._parse_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "* * * 13 *",
+    "* * * * 8",
+    "5-1 * * * *",
+    "*/0 * * * *",
+    "a * * * *",
+])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_sunday_can_be_written_as_0_or_7():
+    assert CronExpression("0 9 * * 7").weekdays == CronExpression("0 9 * * 0").weekdays == {0}
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    # 同じ分は含まず、次の一致を返す
+    ("30 18 * * *", "2026-10-19T18:30:00", "2026-10-20T18:30:00"),
+    ("30 18 * * *", "2026-10-19T18:29:59", "2026-10-19T18:30:00"),
+    # 平日のみ（2026-10-17は土曜日）
+    ("0 9 * * 1-5", "2026-10-17T08:00:00", "2026-10-19T09:00:00"),
+    # 金曜日（週次最適化提案の既定）
+    ("30 18 * * 5", "2026-10-19T00:00:00", "2026-10-23T18:30:00"),
+    # 10分ごと（6:00〜20:59）
+    ("*/10 6-20 * * *", "2026-10-19T20:55:00", "2026-10-20T06:00:00"),
+    # 月末・年をまたぐ
+    ("0 0 1 * *", "2026-12-15T12:00:00", "2027-01-01T00:00:00"),
+    # うるう日
+    ("0 0 29 2 *", "2026-03-01T00:00:00", "2028-02-29T00:00:00"),
+    # 日と曜日の両方を指定した場合はどちらかに一致すればよい（1日または月曜日）
+    ("0 12 1 * 1", "2026-10-27T00:00:00", "2026-11-01T12:00:00"),
+    ("0 12 1 * 1", "2026-11-01T13:00:00", "2026-11-02T12:00:00"),
+])
+def test_next_after(expression, after, expected):
+    assert CronExpression(expression).next_after(at(after)) == at(expected)
+
+
+def test_next_after_returns_none_for_impossible_dates():
+    assert CronExpression("0 0 31 2 *").next_after(at("2026-10-19T00:00:00")) is None